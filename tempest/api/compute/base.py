@@ -24,6 +24,7 @@ from tempest.common import waiters
 from tempest import config
 from tempest import exceptions
 from tempest.lib.common import api_version_utils
+from tempest.lib.common import teardown
 from tempest.lib import exceptions as lib_exc
 import tempest.test
 
@@ -122,33 +123,40 @@ class BaseV2ComputeTest(api_version_utils.BaseMicroversionTest,
 
     @classmethod
     def resource_cleanup(cls):
-        cls.clear_images()
-        cls.clear_servers()
-        cls.clear_security_groups()
-        cls.clear_server_groups()
-        super(BaseV2ComputeTest, cls).resource_cleanup()
+        executor = teardown.TeardownExecutor(
+            CONF.service_clients.teardown_max_workers)
+        executor.add('images', cls.clear_images)
+        executor.add('servers', cls.clear_servers)
+        executor.add('security_groups', cls.clear_security_groups,
+                     after=['servers'])
+        executor.add('server_groups', cls.clear_server_groups,
+                     after=['servers'])
+        try:
+            executor.run()
+        finally:
+            super(BaseV2ComputeTest, cls).resource_cleanup()
 
     @classmethod
     def clear_servers(cls):
         LOG.debug('Clearing servers: %s', ','.join(
             server['id'] for server in cls.servers))
-        for server in cls.servers:
-            try:
-                cls.servers_client.delete_server(server['id'])
-            except lib_exc.NotFound:
-                # Something else already cleaned up the server, nothing to be
-                # worried about
-                pass
-            except Exception:
-                LOG.exception('Deleting server %s failed' % server['id'])
+        results = cls.servers_client.map_requests(
+            cls.servers_client.delete_server,
+            [server['id'] for server in cls.servers])
+        for result in results:
+            # NotFound means something else already cleaned up the server,
+            # nothing to be worried about
+            if (result.exception and
+                    not isinstance(result.exception, lib_exc.NotFound)):
+                LOG.error('Deleting server %s failed' % result.item,
+                          exc_info=result.exc_info)
 
-        for server in cls.servers:
-            try:
-                waiters.wait_for_server_termination(cls.servers_client,
-                                                    server['id'])
-            except Exception:
-                LOG.exception('Waiting for deletion of server %s failed'
-                              % server['id'])
+        try:
+            waiters.wait_for_servers_termination(
+                cls.servers_client, [server['id'] for server in cls.servers])
+        except Exception:
+            LOG.exception('Waiting for deletion of servers %s failed'
+                          % ','.join(server['id'] for server in cls.servers))
 
     @classmethod
     def server_check_teardown(cls):
@@ -21,6 +21,7 @@ from tempest.common import compute
 from tempest.common import waiters
 from tempest import config
 from tempest import exceptions
+from tempest.lib.common import teardown
 from tempest.lib import exceptions as lib_exc
 import tempest.test
 
@@ -86,10 +87,13 @@ class BaseConveyorTest(tempest.test.BaseTestCase):
     @classmethod
     def resource_cleanup(cls):
         super(BaseConveyorTest, cls).resource_cleanup()
-        cls.clear_servers()
-        cls.clear_volumes()
-        cls.clear_keypairs()
-        cls.clear_plan()
+        executor = teardown.TeardownExecutor(
+            CONF.service_clients.teardown_max_workers)
+        executor.add('servers', cls.clear_servers)
+        executor.add('volumes', cls.clear_volumes, after=['servers'])
+        executor.add('keypairs', cls.clear_keypairs)
+        executor.add('plans', cls.clear_plan, after=['servers', 'volumes'])
+        executor.run()
 
     @classmethod
     def load_template(cls, name, ext='yaml'):
@@ -113,17 +117,16 @@ class BaseConveyorTest(tempest.test.BaseTestCase):
         volumes = []
         volumes.extend(cls.volumes)
         volumes.extend(cls.clone_volumes)
-        for volume in volumes:
-            try:
-                cls.volumes_client.delete_volume(volume['id'])
-            except Exception:
-                pass
+        # Errors are ignored, like the ones of the wait below
+        cls.volumes_client.map_requests(
+            cls.volumes_client.delete_volume,
+            [volume['id'] for volume in volumes])
 
-        for volume in volumes:
-            try:
-                cls.volumes_client.wait_for_resource_deletion(volume['id'])
-            except Exception:
-                pass
+        try:
+            waiters.wait_for_volumes_deletion(
+                cls.volumes_client, [volume['id'] for volume in volumes])
+        except Exception:
+            pass
 
     @classmethod
     def clear_keypairs(cls):
@@ -140,23 +143,23 @@ class BaseConveyorTest(tempest.test.BaseTestCase):
         servers.extend(cls.clone_servers)
         LOG.debug('Clearing servers: %s', ','.join(
             server['id'] for server in servers))
-        for server in servers:
-            try:
-                cls.servers_client.delete_server(server['id'])
-            except lib_exc.NotFound:
-                # Something else already cleaned up the server, nothing to be
-                # worried about
-                pass
-            except Exception:
-                LOG.exception('Deleting server %s failed' % server['id'])
-
-        for server in cls.servers:
-            try:
-                waiters.wait_for_server_termination(cls.servers_client,
-                                                    server['id'])
-            except Exception:
-                LOG.exception('Waiting for deletion of server %s failed'
-                              % server['id'])
+        results = cls.servers_client.map_requests(
+            cls.servers_client.delete_server,
+            [server['id'] for server in servers])
+        for result in results:
+            # NotFound means something else already cleaned up the server,
+            # nothing to be worried about
+            if (result.exception and
+                    not isinstance(result.exception, lib_exc.NotFound)):
+                LOG.error('Deleting server %s failed' % result.item,
+                          exc_info=result.exc_info)
+
+        try:
+            waiters.wait_for_servers_termination(
+                cls.servers_client, [server['id'] for server in servers])
+        except Exception:
+            LOG.exception('Waiting for deletion of servers %s failed'
+                          % ','.join(server['id'] for server in servers))
 
     @classmethod
     def clear_plan(cls):
@@ -20,6 +20,7 @@ from tempest.common import waiters
 from tempest import config
 from tempest.lib import exceptions as lib_exc
 from tempest import exceptions
+from tempest.lib.common import teardown
 import tempest.test
 from oslo_log import log as logging
 
@@ -92,25 +93,27 @@ class BaseSGSTest(tempest.test.BaseTestCase):
     @classmethod
     def resource_cleanup(cls):
         super(BaseSGSTest, cls).resource_cleanup()
-        cls.clear_servers()
-        cls.clear_volumes()
-        cls.clear_keypairs()
+        executor = teardown.TeardownExecutor(
+            CONF.service_clients.teardown_max_workers)
+        executor.add('servers', cls.clear_servers)
+        executor.add('volumes', cls.clear_volumes, after=['servers'])
+        executor.add('keypairs', cls.clear_keypairs)
+        executor.run()
 
     @classmethod
     def clear_volumes(cls):
         volumes = []
         volumes.extend(cls.volumes)
-        for volume in volumes:
-            try:
-                cls.volumes_client.delete_volume(volume['id'])
-            except Exception:
-                pass
+        # Errors are ignored, like the ones of the wait below
+        cls.volumes_client.map_requests(
+            cls.volumes_client.delete_volume,
+            [volume['id'] for volume in volumes])
 
-        for volume in volumes:
-            try:
-                cls.volumes_client.wait_for_resource_deletion(volume['id'])
-            except Exception:
-                pass
+        try:
+            waiters.wait_for_volumes_deletion(
+                cls.volumes_client, [volume['id'] for volume in volumes])
+        except Exception:
+            pass
 
     @classmethod
     def clear_keypairs(cls):
@@ -126,23 +129,23 @@ class BaseSGSTest(tempest.test.BaseTestCase):
         servers.extend(cls.servers)
         LOG.debug('Clearing servers: %s', ','.join(
             server['id'] for server in servers))
-        for server in servers:
-            try:
-                cls.servers_client.delete_server(server['id'])
-            except lib_exc.NotFound:
-                # Something else already cleaned up the server, nothing to be
-                # worried about
-                pass
-            except Exception:
-                LOG.exception('Deleting server %s failed' % server['id'])
-
-        for server in cls.servers:
-            try:
-                waiters.wait_for_server_termination(cls.servers_client,
-                                                    server['id'])
-            except Exception:
-                LOG.exception('Waiting for deletion of server %s failed'
-                              % server['id'])
+        results = cls.servers_client.map_requests(
+            cls.servers_client.delete_server,
+            [server['id'] for server in servers])
+        for result in results:
+            # NotFound means something else already cleaned up the server,
+            # nothing to be worried about
+            if (result.exception and
+                    not isinstance(result.exception, lib_exc.NotFound)):
+                LOG.error('Deleting server %s failed' % result.item,
+                          exc_info=result.exc_info)
+
+        try:
+            waiters.wait_for_servers_termination(
+                cls.servers_client, [server['id'] for server in servers])
+        except Exception:
+            LOG.exception('Waiting for deletion of servers %s failed'
+                          % ','.join(server['id'] for server in servers))
 
     @classmethod
     def create_server(cls, validatable=False, volume_backed=False, **kwargs):
@@ -132,17 +132,16 @@ class BaseVolumeTest(tempest.test.BaseTestCase):
 
     @classmethod
     def clear_volumes(cls):
-        for volume in cls.volumes:
-            try:
-                cls.volumes_client.delete_volume(volume['id'])
-            except Exception:
-                pass
-
-        for volume in cls.volumes:
-            try:
-                cls.volumes_client.wait_for_resource_deletion(volume['id'])
-            except Exception:
-                pass
+        # Errors are ignored, like the ones of the waits below
+        cls.volumes_client.map_requests(
+            cls.volumes_client.delete_volume,
+            [volume['id'] for volume in cls.volumes])
+
+        try:
+            waiters.wait_for_volumes_deletion(
+                cls.volumes_client, [volume['id'] for volume in cls.volumes])
+        except Exception:
+            pass
 
     @classmethod
     def clear_snapshots(cls):
@@ -13,13 +13,21 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import atexit
 import copy
+import threading
 
 from oslo_log import log as logging
 
 from tempest.common import negative_rest_client
 from tempest import config
 from tempest import exceptions
+from tempest.lib.common import instrumentation
+from tempest.lib.common import jsonutils
+from tempest.lib.common import response_cache
+from tempest.lib.common import retry
+from tempest.lib.common import single_flight
+from tempest.lib.common import transitions
 from tempest.lib.services.compute.agents_client import AgentsClient
 from tempest.lib.services.compute.aggregates_client import AggregatesClient
 from tempest.lib.services.compute.availability_zone_client import \
@@ -190,6 +198,81 @@ from tempest.services.sgs.base.base_snapshot_client import \
 CONF = config.CONF
 LOG = logging.getLogger(__name__)
 
+_shared_params = None
+_shared_params_lock = threading.Lock()
+
+
+def _get_shared_params():
+    """The client params shared by all the Managers of a test worker
+
+    They are built by the first Manager, once the configuration is loaded,
+    rather than when this module is imported.
+    """
+    global _shared_params
+    with _shared_params_lock:
+        if _shared_params is None:
+            _shared_params = {
+                'response_cache': _get_response_cache(),
+                'retry_policy': _get_retry_policy(),
+                'throttle': _get_throttle(),
+                'single_flight': _get_single_flight(),
+            }
+        return _shared_params
+
+
+def _get_response_cache():
+    """The response cache shared by all the clients of a test worker"""
+    if not CONF.service_clients.response_cache_ttl:
+        return None
+    cache = response_cache.ResponseCache(
+        ttl=CONF.service_clients.response_cache_ttl,
+        maxsize=CONF.service_clients.response_cache_size)
+    atexit.register(_log_response_cache_stats, cache)
+    return cache
+
+
+def _log_response_cache_stats(cache):
+    LOG.info('Response cache statistics: %s', cache.stats())
+
+
+def _get_retry_policy():
+    if not CONF.service_clients.http_max_retries:
+        return None
+    return retry.RetryPolicy(
+        max_retries=CONF.service_clients.http_max_retries,
+        backoff=CONF.service_clients.http_retry_backoff,
+        max_backoff=CONF.service_clients.http_retry_max_backoff)
+
+
+def _get_throttle():
+    """The request rate limit shared by all the clients of a test worker"""
+    if not CONF.service_clients.http_rate_limit:
+        return None
+    return retry.Throttle(CONF.service_clients.http_rate_limit,
+                          CONF.service_clients.http_rate_limit_burst)
+
+
+def _get_single_flight():
+    """The GET coalescing group shared by all the clients of a worker"""
+    if not CONF.service_clients.coalesce_get_requests:
+        return None
+    group = single_flight.SingleFlight()
+    atexit.register(_log_single_flight_stats, group)
+    return group
+
+
+def _log_single_flight_stats(group):
+    LOG.info('GET request coalescing statistics: %s', group.stats())
+
+
+def _log_retry_stats():
+    stats = retry.STATS.as_dict()
+    if any(stats.values()):
+        LOG.info('Request retry and throttling statistics: %s', stats)
+
+
+atexit.register(_log_retry_stats)
+
 
 class Manager(manager.Manager):
     """Top level manager for OpenStack tempest clients"""
@@ -198,7 +281,16 @@ class Manager(manager.Manager):
         'disable_ssl_certificate_validation':
             CONF.identity.disable_ssl_certificate_validation,
         'ca_certs': CONF.identity.ca_certificates_file,
-        'trace_requests': CONF.debug.trace_requests
+        'trace_requests': CONF.debug.trace_requests,
+        'close_connections': CONF.service_clients.http_close_connections,
+        'pool_maxsize': CONF.service_clients.http_pool_maxsize,
+        'pool_maxsize_by_host': dict(
+            (host, int(size)) for host, size in
+            CONF.service_clients.http_pool_maxsize_by_host.items()),
+        'pool_idle_timeout': CONF.service_clients.http_pool_idle_timeout,
+        'pool_block': CONF.service_clients.http_pool_block,
+        'response_validation_sample_rate':
+            CONF.service_clients.response_validation_sample_rate
     }
 
     # NOTE: Tempest uses timeout values of compute API if project specific
@@ -217,6 +309,17 @@ class Manager(manager.Manager):
         :param service: Service name
         """
         super(Manager, self).__init__(credentials=credentials)
+        shared_params = _get_shared_params()
+        self.default_params = dict(self.default_params, **shared_params)
+        self.default_params_with_timeout_values = dict(
+            self.default_params_with_timeout_values, **shared_params)
+        jsonutils.set_backend(CONF.service_clients.json_backend)
+        if CONF.service_clients.latency_report_dir:
+            instrumentation.enable_latency_report(
+                CONF.service_clients.latency_report_dir)
+        if CONF.service_clients.transition_report_dir:
+            transitions.enable_timeline_report(
+                CONF.service_clients.transition_report_dir)
         self._set_compute_clients()
         self._set_database_clients()
         self._set_identity_clients()
@@ -0,0 +1,77 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Serve an in-memory fake of the OpenStack APIs, to load test the client side
+of tempest without a cloud.
+
+**Usage:** ``tempest fake-cloud [--port 8080] [--delay server:BUILD=2]``
+
+The identity endpoint to configure is ``http://<host>:<port>/identity/v2.0``
+or ``http://<host>:<port>/identity/v3``, any credentials are accepted. See
+tempest.lib.common.fake_cloud for the APIs and resources supported.
+"""
+
+from cliff import command
+
+from tempest.lib.common import fake_cloud
+
+
+def parse_delay(value):
+    """Parse a '<kind>:<status>=<seconds>' transition delay"""
+    try:
+        transition, seconds = value.split('=', 1)
+        kind, status = transition.split(':', 1)
+        return '%s:%s' % (kind, status), float(seconds)
+    except ValueError:
+        raise ValueError('Invalid delay %s, expected '
+                         '<kind>:<status>=<seconds>' % value)
+
+
+class TempestFakeCloud(command.Command):
+
+    def get_parser(self, prog_name):
+        parser = super(TempestFakeCloud, self).get_parser(prog_name)
+        parser.add_argument('--host', default='127.0.0.1',
+                            help='Address to listen on')
+        parser.add_argument('--port', type=int, default=8080,
+                            help='Port to listen on, 0 for any free port')
+        parser.add_argument('--delay', action='append', default=[],
+                            type=parse_delay,
+                            help='Seconds taken by a state transition, e.g. '
+                                 'server:BUILD=2 for servers to become '
+                                 'ACTIVE after 2 seconds, or '
+                                 'volume:DELETE=1. Can be repeated.')
+        parser.add_argument('--default-delay', type=float, default=0,
+                            help='Seconds taken by the other transitions')
+        return parser
+
+    def get_description(self):
+        return 'Serve an in-memory fake of the OpenStack APIs'
+
+    def take_action(self, parsed_args):
+        app = fake_cloud.FakeCloud(delays=dict(parsed_args.delay),
+                                   default_delay=parsed_args.default_delay)
+        server = fake_cloud.make_server(app, parsed_args.host,
+                                        parsed_args.port)
+        print('Serving the fake cloud at %s, identity endpoints %s/identity/'
+              'v2.0 and %s/identity/v3' % (app.url, app.url, app.url))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return 0
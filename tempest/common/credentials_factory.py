@@ -11,6 +11,8 @@
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
 
+import os
+
 from oslo_concurrency import lockutils
 
 from tempest import clients
@@ -54,8 +56,11 @@ def _get_dynamic_provider_params():
 def _get_preprov_provider_params():
     _common_params = _get_common_provider_params()
     reseller_admin_role = CONF.object_storage.reseller_admin_role
+    lock_path = lockutils.get_lock_path(CONF)
     return dict(_common_params, **dict([
-        ('accounts_lock_dir', lockutils.get_lock_path(CONF)),
+        ('accounts_lock_dir', lock_path),
+        ('accounts_cache_dir',
+         lock_path and os.path.join(lock_path, 'test_accounts_cache')),
         ('test_accounts_file', CONF.auth.test_accounts_file),
         ('object_storage_operator_role', CONF.object_storage.operator_role),
         ('object_storage_reseller_admin_role', reseller_admin_role)
@@ -159,12 +164,21 @@ def get_credentials_provider(name, network_resources=None,
     if CONF.auth.use_dynamic_credentials or force_tenant_isolation:
         admin_creds = get_configured_credentials(
             'identity_admin', fill_in=True, identity_version=identity_version)
+        params = _get_dynamic_provider_params()
+        pool = None
+        if CONF.auth.dynamic_creds_pool_size:
+            pool = dynamic_creds.get_pool(
+                identity_version, admin_creds,
+                CONF.auth.dynamic_creds_pool_size,
+                network_resources=network_resources,
+                recycle=CONF.auth.dynamic_creds_recycle, **params)
         return dynamic_creds.DynamicCredentialProvider(
             name=name,
             network_resources=network_resources,
             identity_version=identity_version,
             admin_creds=admin_creds,
-            **_get_dynamic_provider_params())
+            pool=pool,
+            **params)
     else:
         if CONF.auth.test_accounts_file:
             # Most params are not relevant for pre-created accounts
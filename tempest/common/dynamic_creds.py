@@ -12,8 +12,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import atexit
+import collections
+import threading
+
 import netaddr
 from oslo_log import log as logging
+from oslo_utils import excutils
 import six
 
 from tempest import clients
@@ -31,7 +36,8 @@ LOG = logging.getLogger(__name__)
 class DynamicCredentialProvider(cred_provider.CredentialProvider):
 
     def __init__(self, identity_version, name=None, network_resources=None,
-                 credentials_domain=None, admin_role=None, admin_creds=None):
+                 credentials_domain=None, admin_role=None, admin_creds=None,
+                 pool=None):
         """Creates credentials dynamically for tests
 
         A credential provider that, based on an initial set of
@@ -48,13 +54,20 @@ class DynamicCredentialProvider(cred_provider.CredentialProvider):
         :param dict network_resources: network resources to be created for
                                        the created credentials
         :param Credentials admin_creds: initial admin credentials
+        :param DynamicCredentialPool pool: pool of credentials provisioned
+                                           in advance, with the same
+                                           network_resources, to take the
+                                           credentials from
         """
         super(DynamicCredentialProvider, self).__init__(
             identity_version=identity_version, admin_role=admin_role,
             name=name, credentials_domain=credentials_domain,
             network_resources=network_resources)
         self.network_resources = network_resources
+        self.pool = pool
         self._creds = {}
+        # The keys of the primary credentials taken from the pool
+        self._pooled_keys = set()
         self.ports = []
         self.default_admin_creds = admin_creds
         (self.identity_admin_client,
@@ -171,17 +184,19 @@ class DynamicCredentialProvider(cred_provider.CredentialProvider):
             elif self.network_resources['dhcp']:
                 raise exceptions.InvalidConfiguration('DHCP requires a subnet')
 
-        data_utils.rand_name_root = data_utils.rand_name(self.name)
+        # NOTE: a local name rather than data_utils.rand_name_root, the
+        # credentials of a pool being provisioned from several threads
+        rand_name_root = data_utils.rand_name(self.name)
         if not self.network_resources or self.network_resources['network']:
-            network_name = data_utils.rand_name_root + "-network"
+            network_name = rand_name_root + "-network"
             network = self._create_network(network_name, tenant_id)
         try:
             if not self.network_resources or self.network_resources['subnet']:
-                subnet_name = data_utils.rand_name_root + "-subnet"
+                subnet_name = rand_name_root + "-subnet"
                 subnet = self._create_subnet(subnet_name, tenant_id,
                                              network['id'])
             if not self.network_resources or self.network_resources['router']:
-                router_name = data_utils.rand_name_root + "-router"
+                router_name = rand_name_root + "-router"
                 router = self._create_router(router_name, tenant_id)
                 self._add_router_interface(router['id'], subnet['id'])
         except Exception:
@@ -248,28 +263,69 @@ class DynamicCredentialProvider(cred_provider.CredentialProvider):
         self.routers_admin_client.add_router_interface(router_id,
                                                        subnet_id=subnet_id)
 
+    def _provision_creds(self, admin=False, roles=None, key=None):
+        """Create a set of credentials and its network resources
+
+        :param str key: key of the credentials in self._creds, for
+                        clear_creds to delete them. Without a key they are
+                        deleted if their network resources cannot be
+                        created.
+        """
+        credentials = self._create_creds(admin=admin, roles=roles)
+        if key is not None:
+            self._creds[key] = credentials
+        # Maintained until tests are ported
+        LOG.info("Acquired dynamic creds:\n credentials: %s"
+                 % credentials)
+        if (CONF.service_available.neutron and
+            not CONF.baremetal.driver_enabled and
+            CONF.auth.create_isolated_networks):
+            try:
+                network, subnet, router = self._create_network_resources(
+                    credentials.tenant_id)
+            except Exception:
+                if key is None:
+                    with excutils.save_and_reraise_exception():
+                        self._delete_creds(credentials)
+                raise
+            credentials.set_resources(network=network, subnet=subnet,
+                                      router=router)
+            LOG.info("Created isolated network resources for : \n"
+                     + " credentials: %s" % credentials)
+        return credentials
+
+    def _get_pooled_creds(self, key, admin=False, roles=None):
+        """Take a set of credentials from the pool, None if it is empty
+
+        The pool only hands out sets created with exactly these roles.
+        """
+        credentials = self.pool.get(admin=admin, roles=roles)
+        if credentials is None:
+            return None
+        self._creds[key] = credentials
+        if not admin and not roles:
+            self._pooled_keys.add(key)
+        LOG.info("Acquired pooled dynamic creds:\n credentials: %s"
+                 % credentials)
+        return credentials
+
     def get_credentials(self, credential_type):
         if self._creds.get(str(credential_type)):
             credentials = self._creds[str(credential_type)]
         else:
             if credential_type in ['primary', 'alt', 'admin']:
                 is_admin = (credential_type == 'admin')
-                credentials = self._create_creds(admin=is_admin)
+                roles = None
             else:
-                credentials = self._create_creds(roles=credential_type)
-            self._creds[str(credential_type)] = credentials
-            # Maintained until tests are ported
-            LOG.info("Acquired dynamic creds:\n credentials: %s"
-                     % credentials)
-            if (CONF.service_available.neutron and
-                not CONF.baremetal.driver_enabled and
-                CONF.auth.create_isolated_networks):
-                network, subnet, router = self._create_network_resources(
-                    credentials.tenant_id)
-                credentials.set_resources(network=network, subnet=subnet,
-                                          router=router)
-                LOG.info("Created isolated network resources for : \n"
-                         + " credentials: %s" % credentials)
+                is_admin = False
+                roles = credential_type
+            credentials = None
+            if self.pool is not None:
+                credentials = self._get_pooled_creds(
+                    str(credential_type), admin=is_admin, roles=roles)
+            if credentials is None:
+                credentials = self._provision_creds(
+                    admin=is_admin, roles=roles, key=str(credential_type))
         return credentials
 
     def get_primary_creds(self):
@@ -332,12 +388,12 @@ class DynamicCredentialProvider(cred_provider.CredentialProvider):
                             (secgroup['name'], secgroup['id']))
 
     def _clear_isolated_net_resources(self):
+        for creds in six.itervalues(self._creds):
+            self._clear_creds_net_resources(creds)
+
+    def _clear_creds_net_resources(self, creds):
         client = self.routers_admin_client
-        for cred in self._creds:
-            creds = self._creds.get(cred)
-            if (not creds or not any([creds.router, creds.network,
-                                      creds.subnet])):
-                continue
+        if creds and any([creds.router, creds.network, creds.subnet]):
             LOG.debug("Clearing network: %(network)s, "
                       "subnet: %(subnet)s, router: %(router)s",
                       {'network': creds.network, 'subnet': creds.subnet,
@@ -362,23 +418,125 @@ class DynamicCredentialProvider(cred_provider.CredentialProvider):
                 self._clear_isolated_network(creds.network['id'],
                                              creds.network['name'])
 
+    def _delete_user_and_project(self, creds):
+        try:
+            self.creds_client.delete_user(creds.user_id)
+        except lib_exc.NotFound:
+            LOG.warning("user with name: %s not found for delete" %
+                        creds.username)
+        try:
+            if CONF.service_available.neutron:
+                self._cleanup_default_secgroup(creds.tenant_id)
+            self.creds_client.delete_project(creds.tenant_id)
+        except lib_exc.NotFound:
+            LOG.warning("tenant with name: %s not found for delete" %
+                        creds.tenant_name)
+
+    def _delete_creds(self, creds):
+        """Delete a set of credentials not held in self._creds"""
+        self._clear_creds_net_resources(creds)
+        self._delete_user_and_project(creds)
+
+    def _leftover_resources(self, creds):
+        """The resources left by the tests of a set of credentials
+
+        They are the ports of the project other than the ones of the
+        isolated router and DHCP server, and the servers, keypairs,
+        volumes, volume snapshots and images of the project or user, which
+        are listed with the credentials themselves.
+        """
+        leftovers = []
+        if CONF.service_available.neutron:
+            ports = self.ports_admin_client.list_ports(
+                tenant_id=creds.tenant_id)['ports']
+            for port in ports:
+                owner = port.get('device_owner') or ''
+                if not (owner.startswith('network:router') or
+                        owner == 'network:dhcp'):
+                    leftovers.append('port %s' % port['id'])
+        os = clients.Manager(creds.credentials)
+        if CONF.service_available.nova:
+            leftovers.extend(
+                'server %s' % server['id'] for server in
+                os.servers_client.list_servers()['servers'])
+            leftovers.extend(
+                'keypair %s' % keypair['keypair']['name'] for keypair in
+                os.keypairs_client.list_keypairs()['keypairs'])
+        if CONF.service_available.cinder:
+            if CONF.volume_feature_enabled.api_v2:
+                volumes_client = os.volumes_v2_client
+                snapshots_client = os.snapshots_v2_client
+            else:
+                volumes_client = os.volumes_client
+                snapshots_client = os.snapshots_client
+            leftovers.extend(
+                'volume %s' % volume['id'] for volume in
+                volumes_client.list_volumes(detail=False)['volumes'])
+            leftovers.extend(
+                'snapshot %s' % snapshot['id'] for snapshot in
+                snapshots_client.list_snapshots()['snapshots'])
+        if (CONF.service_available.glance and
+                CONF.image_feature_enabled.api_v2):
+            leftovers.extend(
+                'image %s' % image['id'] for image in
+                os.image_client_v2.list_images(
+                    params={'owner': creds.tenant_id})['images'])
+        return leftovers
+
+    def _scrub_creds(self, creds):
+        """Make a set of credentials fit for another test class
+
+        The credentials are not recycled, and False is returned, if the
+        tests left any resource behind them, see _leftover_resources.
+        Otherwise the security groups created by the tests are deleted.
+        """
+        try:
+            leftovers = self._leftover_resources(creds)
+            if leftovers:
+                LOG.info("Not recycling the credentials of tenant %s, "
+                         "left: %s" % (creds.tenant_id,
+                                       ', '.join(leftovers)))
+                return False
+            if CONF.service_available.neutron:
+                nsg_client = self.security_groups_admin_client
+                secgroups = nsg_client.list_security_groups(
+                    tenant_id=creds.tenant_id)['security_groups']
+                for secgroup in secgroups:
+                    if secgroup['name'] != 'default':
+                        nsg_client.delete_security_group(secgroup['id'])
+        except Exception as e:
+            LOG.warning("Not recycling the credentials of tenant %s: %s" %
+                        (creds.tenant_id, e))
+            return False
+        return True
+
+    def _recycle_creds(self):
+        """Give the primary and alt credentials back to the pool
+
+        They are only scrubbed if the pool takes them back. The pool
+        replaces the ones it gave which are deleted instead.
+        """
+        for key in ('primary', 'alt'):
+            creds = self._creds.get(key)
+            if not creds:
+                continue
+            if (self.pool.wants() and self._scrub_creds(creds) and
+                    self.pool.put(creds)):
+                LOG.info("Recycled dynamic creds:\n credentials: %s"
+                         % creds)
+                del self._creds[key]
+            elif key in self._pooled_keys:
+                self.pool.discard()
+        self._pooled_keys.clear()
+
     def clear_creds(self):
         if not self._creds:
             return
+        if self.pool is not None and self.pool.recycle:
+            self._recycle_creds()
         self._clear_isolated_net_resources()
         for creds in six.itervalues(self._creds):
-            try:
-                self.creds_client.delete_user(creds.user_id)
-            except lib_exc.NotFound:
-                LOG.warning("user with name: %s not found for delete" %
-                            creds.username)
-            try:
-                if CONF.service_available.neutron:
-                    self._cleanup_default_secgroup(creds.tenant_id)
-                self.creds_client.delete_project(creds.tenant_id)
-            except lib_exc.NotFound:
-                LOG.warning("tenant with name: %s not found for delete" %
-                            creds.tenant_name)
+            self._delete_user_and_project(creds)
         self._creds = {}
 
     def is_multi_user(self):
@@ -389,3 +547,182 @@ class DynamicCredentialProvider(cred_provider.CredentialProvider):
 
     def is_role_available(self, role):
         return True
+
+
+class DynamicCredentialPool(object):
+    """Credentials provisioned in the background, ready for the tests
+
+    The pool keeps size sets of credentials of each kind, with their
+    network resources, provisioned in advance by its own
+    DynamicCredentialProvider. The kinds are the primary credentials, the
+    admin ones and the ones of each set of roles requested, so that the
+    sets have exactly the roles of the ones created on demand. Each set
+    taken by a test class is replaced from a background thread, so that
+    the classes get their credentials without waiting for the identity and
+    network APIs. The sets left at exit are deleted.
+
+    With recycle, the primary sets taken are not replaced right away: the
+    test classes give them back with put, or tell the pool they deleted
+    them with discard, and only then is a set provisioned in their place.
+
+    :param DynamicCredentialProvider provider: provider creating and
+                                               deleting the credentials of
+                                               the pool, without a pool
+    :param int size: number of sets kept ready
+    :param bool recycle: whether the primary sets taken are given back
+    """
+
+    def __init__(self, provider, size, recycle=False):
+        self.provider = provider
+        self.size = size
+        self.recycle = recycle
+        # The sets ready and being provisioned by kind, see _kind
+        self._ready = collections.defaultdict(collections.deque)
+        self._pending = collections.defaultdict(int)
+        # The primary sets taken and not given back or discarded yet, when
+        # recycling
+        self._taken = 0
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def _kind(admin=False, roles=None):
+        return bool(admin), tuple(sorted(set(roles or [])))
+
+    def _count(self, kind):
+        """The sets of a kind the pool accounts for, with _cond held"""
+        count = len(self._ready[kind]) + self._pending[kind]
+        if kind == self._kind():
+            count += self._taken
+        return count
+
+    def fill(self, admin=False, roles=None):
+        """Provision the missing sets of a kind in the background"""
+        kind = self._kind(admin, roles)
+        with self._cond:
+            missing = self.size - self._count(kind)
+            if missing <= 0:
+                return
+            self._pending[kind] += missing
+        thread = threading.Thread(target=self._provision,
+                                  args=(kind, missing))
+        thread.daemon = True
+        thread.start()
+
+    def _provision(self, kind, number):
+        admin, roles = kind
+
+        def provision(_):
+            try:
+                creds = self.provider._provision_creds(
+                    admin=admin, roles=list(roles) or None)
+            except Exception:
+                LOG.exception("Failed to provision pooled dynamic creds")
+                with self._cond:
+                    self._pending[kind] -= 1
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                self._pending[kind] -= 1
+                if self.size:
+                    self._ready[kind].append(creds)
+                    creds = None
+                self._cond.notify_all()
+            if creds is not None:
+                # The pool was drained meanwhile
+                self.provider._delete_creds(creds)
+
+        self.provider.identity_admin_client.map_requests(provision,
+                                                         range(number))
+
+    def get(self, admin=False, roles=None):
+        """Take a set of credentials, None if none can be provisioned
+
+        The sets of a kind start being provisioned on the first request
+        for it, which gets None. When all the sets of a kind are taken,
+        this waits for one being provisioned rather than creating one more
+        in parallel.
+        """
+        kind = self._kind(admin, roles)
+        with self._cond:
+            ready = self._ready[kind]
+            while not ready and self._pending[kind]:
+                self._cond.wait()
+            creds = ready.popleft() if ready else None
+            if (creds is not None and self.recycle and
+                    kind == self._kind()):
+                self._taken += 1
+        self.fill(admin, roles)
+        return creds
+
+    def wants(self):
+        """Whether put would take back a set of primary credentials"""
+        with self._cond:
+            return bool(self.size) and (
+                self._taken > 0 or self._count(self._kind()) < self.size)
+
+    def put(self, creds):
+        """Give back a set of primary credentials, False if it is full"""
+        kind = self._kind()
+        with self._cond:
+            if not self.size:
+                return False
+            if self._taken:
+                self._taken -= 1
+            elif self._count(kind) >= self.size:
+                return False
+            self._ready[kind].append(creds)
+            self._cond.notify_all()
+        return True
+
+    def discard(self):
+        """Replace a primary set taken which is not given back"""
+        with self._cond:
+            if not self._taken:
+                return
+            self._taken -= 1
+        self.fill()
+
+    def drain(self):
+        """Delete the sets of credentials ready and stop provisioning"""
+        with self._cond:
+            self.size = 0
+            ready = [creds for kind_ready in self._ready.values()
+                     for creds in kind_ready]
+            self._ready.clear()
+        for creds in ready:
+            try:
+                self.provider._delete_creds(creds)
+            except Exception:
+                LOG.exception("Failed to delete pooled dynamic creds %s"
+                              % creds)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(identity_version, admin_creds, size, network_resources=None,
+             credentials_domain=None, admin_role=None, recycle=False):
+    """The pool of the credentials provisioned with these parameters
+
+    The pool is created, and starts being filled, on the first call. The
+    test classes of a worker share the pools, one per set of parameters.
+    """
+    key = (identity_version, admin_creds.username,
+           getattr(admin_creds, 'project_name', None) or
+           getattr(admin_creds, 'tenant_name', None),
+           credentials_domain, admin_role,
+           tuple(sorted((network_resources or {}).items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            provider = DynamicCredentialProvider(
+                identity_version, name='tempest-pool',
+                network_resources=network_resources,
+                credentials_domain=credentials_domain,
+                admin_role=admin_role, admin_creds=admin_creds)
+            pool = DynamicCredentialPool(provider, size, recycle=recycle)
+            _pools[key] = pool
+            atexit.register(pool.drain)
+            pool.fill()
+    return pool
@@ -12,10 +12,19 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import errno
+try:
+    import fcntl
+except ImportError:
+    # Stale locks are not broken without flock
+    fcntl = None
 import hashlib
+import json
 import os
+import random
+import socket
+import tempfile
 
-from oslo_concurrency import lockutils
 from oslo_log import log as logging
 import six
 import yaml
@@ -29,11 +38,14 @@ from tempest.lib import exceptions as lib_exc
 
 LOG = logging.getLogger(__name__)
 
+# Version of the format of the accounts cache files
+_CACHE_FORMAT = 1
+
 
 def read_accounts_yaml(path):
     try:
         with open(path, 'r') as yaml_file:
-            accounts = yaml.load(yaml_file)
+            accounts = yaml.safe_load(yaml_file)
     except IOError:
         raise exceptions.InvalidConfiguration(
             'The path for the test accounts file: %s '
@@ -46,14 +58,17 @@ class PreProvisionedCredentialProvider(cred_provider.CredentialProvider):
     def __init__(self, identity_version, test_accounts_file,
                  accounts_lock_dir, name=None, credentials_domain=None,
                  admin_role=None, object_storage_operator_role=None,
-                 object_storage_reseller_admin_role=None):
+                 object_storage_reseller_admin_role=None,
+                 accounts_cache_dir=None):
         """Credentials provider using pre-provisioned accounts
 
         This credentials provider loads the details of pre-provisioned
         accounts from a YAML file, in the format specified by
-        `etc/accounts.yaml.sample`. It locks accounts while in use, using the
-        external locking mechanism, allowing for multiple python processes
-        to share a single account file, and thus running tests in parallel.
+        `etc/accounts.yaml.sample`. It locks accounts while in use, with a
+        lock file per account created atomically in accounts_lock_dir,
+        allowing for multiple python processes to share a single account
+        file, and thus running tests in parallel. The lock files of the
+        processes which died are reclaimed when no account is left.
 
         The accounts_lock_dir must be generated using `lockutils.get_lock_path`
         from the oslo.concurrency library. For instance:
@@ -74,23 +89,92 @@ class PreProvisionedCredentialProvider(cred_provider.CredentialProvider):
                                    (if no domain is configured)
         :param object_storage_operator_role: name of the role
         :param object_storage_reseller_admin_role: name of the role
+        :param accounts_cache_dir: directory where the accounts parsed from
+                                   the YAML file are cached, until the file
+                                   changes (optional)
         """
         super(PreProvisionedCredentialProvider, self).__init__(
             identity_version=identity_version, name=name,
             admin_role=admin_role, credentials_domain=credentials_domain)
         self.test_accounts_file = test_accounts_file
+        role_params = (admin_role, object_storage_operator_role,
+                       object_storage_reseller_admin_role)
         if test_accounts_file:
-            accounts = read_accounts_yaml(self.test_accounts_file)
+            self.hash_dict = self._read_hash_dict(role_params,
+                                                  accounts_cache_dir)
             self.use_default_creds = False
         else:
-            accounts = {}
+            self.hash_dict = self.get_hash_dict({}, *role_params)
             self.use_default_creds = True
-        self.hash_dict = self.get_hash_dict(
-            accounts, admin_role, object_storage_operator_role,
-            object_storage_reseller_admin_role)
+        # Inverted index of the accounts by role, and the accounts matching
+        # the role sets already requested
+        self._role_index = dict(
+            (role, frozenset(hashes))
+            for role, hashes in six.iteritems(self.hash_dict['roles']))
+        self._match_cache = {}
         self.accounts_dir = accounts_lock_dir
+        # The files flocked to break stale locks are kept out of the lock
+        # dir, which is removed with the last lock file
+        self._break_dir = accounts_lock_dir.rstrip(os.sep) + '.break'
         self._creds = {}
 
+    def _read_hash_dict(self, role_params, accounts_cache_dir):
+        """The hash dict of the accounts file, cached if possible
+
+        The cache is keyed by the path, mtime and size of the accounts file,
+        and by the roles the account types map to.
+        """
+        if not accounts_cache_dir:
+            return self.get_hash_dict(
+                read_accounts_yaml(self.test_accounts_file), *role_params)
+        path = os.path.abspath(self.test_accounts_file)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # Raises the InvalidConfiguration of a missing file
+            return self.get_hash_dict(read_accounts_yaml(path), *role_params)
+        key = {'format': _CACHE_FORMAT, 'path': path,
+               'mtime': stat.st_mtime, 'size': stat.st_size,
+               'roles': list(role_params)}
+        cache_path = os.path.join(
+            accounts_cache_dir,
+            hashlib.md5(path.encode('utf-8')).hexdigest() + '.json')
+        try:
+            with open(cache_path, 'r') as cache_file:
+                cache = json.load(cache_file)
+            if cache['key'] == key:
+                return cache['hash_dict']
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            pass
+        hash_dict = self.get_hash_dict(read_accounts_yaml(path), *role_params)
+        self._write_accounts_cache(cache_path,
+                                   {'key': key, 'hash_dict': hash_dict})
+        return hash_dict
+
+    @staticmethod
+    def _write_accounts_cache(cache_path, cache):
+        """Replace a cache file atomically
+
+        The file is only readable by its owner, as it holds passwords.
+        """
+        cache_dir = os.path.dirname(cache_path)
+        tmp_path = None
+        try:
+            try:
+                os.makedirs(cache_dir)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+            with os.fdopen(fd, 'w') as cache_file:
+                json.dump(cache, cache_file)
+            os.rename(tmp_path, cache_path)
+        except (IOError, OSError, TypeError, ValueError) as e:
+            LOG.warning('Could not cache the accounts in %s: %s' %
+                        (cache_path, e))
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
     @classmethod
     def _append_role(cls, role, account_hash, hash_dict):
         if role in hash_dict['roles']:
@@ -167,68 +251,169 @@ class PreProvisionedCredentialProvider(cred_provider.CredentialProvider):
     def is_multi_tenant(self):
         return self.is_multi_user()
 
+    def _create_accounts_dir(self):
+        try:
+            os.makedirs(self.accounts_dir)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
     def _create_hash_file(self, hash_string):
-        path = os.path.join(os.path.join(self.accounts_dir, hash_string))
-        if not os.path.isfile(path):
-            with open(path, 'w') as fd:
-                fd.write(self.name)
+        """Lock an account, False if it is already locked
+
+        The lock file is created with O_EXCL, so that only one process can
+        lock an account, and holds the name of the provider, the pid of its
+        process and its host.
+        """
+        path = os.path.join(self.accounts_dir, hash_string)
+        flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL
+        while True:
+            try:
+                fd = os.open(path, flags, 0o644)
+                break
+            except OSError as e:
+                if e.errno == errno.EEXIST:
+                    return False
+                if e.errno != errno.ENOENT:
+                    raise
+            # The lock dir does not exist yet, or was removed with the last
+            # lock file by remove_hash, maybe again since it was created
+            self._create_accounts_dir()
+        with os.fdopen(fd, 'w') as lock_file:
+            lock_file.write('%s\n%d\n%s\n' % (self.name, os.getpid(),
+                                              socket.gethostname()))
+        return True
+
+    def _read_hash_file(self, hash_string):
+        """The (name, pid, host) of the owner of a lock, None if unknown
+
+        The lock files written by older versions only hold the name.
+        """
+        try:
+            with open(os.path.join(self.accounts_dir, hash_string)) as fd:
+                lines = fd.read().splitlines()
+        except (IOError, OSError):
+            return None, None, None
+        name = lines[0] if lines else None
+        try:
+            pid = int(lines[1])
+        except (IndexError, ValueError):
+            pid = None
+        host = lines[2] if len(lines) > 2 else None
+        return name, pid, host
+
+    @staticmethod
+    def _is_process_alive(pid):
+        try:
+            os.kill(pid, 0)
+        except OSError as e:
+            # EPERM: the process exists, but belongs to another user
+            return e.errno != errno.ESRCH
+        return True
+
+    def _break_stale_lock(self, hash_string):
+        """Remove the lock of an account whose process died
+
+        Only the locks of the processes of this host can be checked. The
+        lock is read again while holding a flock on a file of the same name
+        in the break dir, so that a lock taken by another process in
+        between is not removed. The kernel releases the flock if its
+        process dies, so a crash while breaking a lock does not block the
+        account. Without flock, the stale locks are left alone.
+
+        :return: True if the lock was removed
+        """
+        if fcntl is None:
+            return False
+        owner = self._read_hash_file(hash_string)
+        name, pid, host = owner
+        if (pid is None or host != socket.gethostname() or
+                self._is_process_alive(pid)):
+            return False
+        path = os.path.join(self.accounts_dir, hash_string)
+        try:
+            if not os.path.isdir(self._break_dir):
+                os.makedirs(self._break_dir)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                return False
+        try:
+            break_fd = os.open(os.path.join(self._break_dir, hash_string),
+                               os.O_WRONLY | os.O_CREAT, 0o644)
+        except OSError:
+            return False
+        try:
+            fcntl.flock(break_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            if self._read_hash_file(hash_string) != owner:
+                return False
+            LOG.warning('Removing the account lock file %s of %s, its '
+                        'process %s is gone' % (path, name, pid))
+            os.remove(path)
             return True
-        return False
+        except (IOError, OSError):
+            # Another process is breaking it, or broke it already
+            return False
+        finally:
+            # Closing it releases the flock. The file is kept, as another
+            # process could otherwise flock a new one while it is held.
+            os.close(break_fd)
 
-    @lockutils.synchronized('test_accounts_io', external=True)
     def _get_free_hash(self, hashes):
         # Cast as a list because in some edge cases a set will be passed in
         hashes = list(hashes)
-        if not os.path.isdir(self.accounts_dir):
-            os.mkdir(self.accounts_dir)
-            # Create File from first hash (since none are in use)
-            self._create_hash_file(hashes[0])
-            return hashes[0]
+        # Try the accounts in a random order, so that the processes do not
+        # all compete for the first ones. The list is shuffled as it is
+        # tried, the number of tries only depends on the fraction of the
+        # accounts in use.
+        last = len(hashes) - 1
+        for index in range(len(hashes)):
+            pick = random.randint(index, last)
+            hashes[index], hashes[pick] = hashes[pick], hashes[index]
+            if self._create_hash_file(hashes[index]):
+                return hashes[index]
         names = []
         for _hash in hashes:
-            res = self._create_hash_file(_hash)
-            if res:
+            if self._break_stale_lock(_hash) and self._create_hash_file(_hash):
                 return _hash
-            else:
-                path = os.path.join(os.path.join(self.accounts_dir,
-                                                 _hash))
-                with open(path, 'r') as fd:
-                    names.append(fd.read())
+            names.append(self._read_hash_file(_hash)[0] or _hash)
         msg = ('Insufficient number of users provided. %s have allocated all '
                'the credentials for this allocation request' % ','.join(names))
         raise lib_exc.InvalidCredentials(msg)
 
     def _get_match_hash_list(self, roles=None):
-        hashes = []
+        roles = frozenset(roles or ())
+        useable_hashes = self._match_cache.get(roles)
+        if useable_hashes is None:
+            useable_hashes = self._find_match_hashes(roles)
+            self._match_cache[roles] = useable_hashes
+        return useable_hashes
+
+    def _find_match_hashes(self, roles):
         if roles:
-            # Loop over all the creds for each role in the subdict and generate
-            # a list of cred lists for each role
+            # The sets of creds of each role, from the inverted index
+            hashes = []
             for role in roles:
-                temp_hashes = self.hash_dict['roles'].get(role, None)
+                temp_hashes = self._role_index.get(role)
                 if not temp_hashes:
                     raise lib_exc.InvalidCredentials(
                         "No credentials with role: %s specified in the "
                         "accounts ""file" % role)
                 hashes.append(temp_hashes)
-            # Take the list of lists and do a boolean and between each list to
-            # find the creds which fall under all the specified roles
-            temp_list = set(hashes[0])
-            for hash_list in hashes[1:]:
-                temp_list = temp_list & set(hash_list)
-            hashes = temp_list
+            # Intersect them starting from the smallest one, to find the
+            # creds which fall under all the specified roles
+            hashes.sort(key=len)
+            hashes = hashes[0].intersection(*hashes[1:])
         else:
             hashes = self.hash_dict['creds'].keys()
         # NOTE(mtreinish): admin is a special case because of the increased
         # privlege set which could potentially cause issues on tests where that
         # is not expected. So unless the admin role isn't specified do not
         # allocate admin.
-        admin_hashes = self.hash_dict['roles'].get(self.admin_role,
-                                                   None)
-        if ((not roles or self.admin_role not in roles) and
-                admin_hashes):
+        admin_hashes = self._role_index.get(self.admin_role)
+        if self.admin_role not in roles and admin_hashes:
             useable_hashes = [x for x in hashes if x not in admin_hashes]
         else:
-            useable_hashes = hashes
+            useable_hashes = list(hashes)
         return useable_hashes
 
     def _sanitize_creds(self, creds):
@@ -247,16 +432,22 @@ class PreProvisionedCredentialProvider(cred_provider.CredentialProvider):
         LOG.info('%s allocated creds:\n%s' % (self.name, clean_creds))
         return self._wrap_creds_with_network(free_hash)
 
-    @lockutils.synchronized('test_accounts_io', external=True)
     def remove_hash(self, hash_string):
         hash_path = os.path.join(self.accounts_dir, hash_string)
-        if not os.path.isfile(hash_path):
+        try:
+            os.remove(hash_path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
             LOG.warning('Expected an account lock file %s to remove, but '
                         'one did not exist' % hash_path)
-        else:
-            os.remove(hash_path)
-            if not os.listdir(self.accounts_dir):
-                os.rmdir(self.accounts_dir)
+            return
+        try:
+            os.rmdir(self.accounts_dir)
+        except OSError:
+            # Other accounts are locked, the lock dir is only removed with
+            # the last lock file
+            pass
 
     def get_hash(self, creds):
         for _hash in self.hash_dict['creds']:
@@ -11,34 +11,41 @@
 #    under the License.
 
 
-import time
-
 from oslo_log import log as logging
 
 from tempest import config
 from tempest import exceptions
-from tempest.lib.common.utils import misc as misc_utils
-from tempest.lib import exceptions as lib_exc
+from tempest.lib.common import polling
+from tempest.lib.common import transitions
 
 CONF = config.CONF
 LOG = logging.getLogger(__name__)
 
+
 def wait_for_sgs_replication_status(client, replication_id, status):
     """Waits for a Volume to reach a given status."""
-    body = client.show_replication(replication_id)['replication']
-    replication_status = body['status']
-    start = int(time.time())
 
-    while replication_status != status:
-        time.sleep(client.build_interval)
+    def _check(body):
+        if body['status'] == 'error':
+            raise exceptions.VolumeBuildErrorException(
+                replication_id=replication_id)
+
+    def _on_timeout(body):
+        message = ('Replication %s failed to reach %s status (current %s) '
+                   'within the required time (%s s).' %
+                   (replication_id, status, body['status'],
+                    client.build_timeout))
+        raise exceptions.TimeoutException(message)
+
+    tracker = transitions.TransitionTracker('replication', replication_id)
+
+    def _fetch():
         body = client.show_replication(replication_id)['replication']
-        replication_status = body['status']
-        if replication_status == 'error':
-            raise exceptions.VolumeBuildErrorException(replication_id=replication_id)
-
-        if int(time.time()) - start >= client.build_timeout:
-            message = ('Replication %s failed to reach %s status (current %s) '
-                       'within the required time (%s s).' %
-                       (replication_id, status, replication_status,
-                        client.build_timeout))
-            raise exceptions.TimeoutException(message)
\ No newline at end of file
+        tracker.observe(body['status'])
+        return body
+
+    polling.wait_until(
+        _fetch,
+        lambda body: body['status'] == status,
+        client.build_timeout, client.build_interval,
+        check=_check, on_timeout=_on_timeout)
@@ -10,13 +10,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-
 import time
 
 from oslo_log import log as logging
+from six.moves.urllib import parse as urlparse
 
 from tempest import config
 from tempest import exceptions
+from tempest.lib.common import polling
+from tempest.lib.common import transitions
 from tempest.lib.common.utils import misc as misc_utils
 from tempest.lib import exceptions as lib_exc
 
@@ -24,96 +26,347 @@ CONF = config.CONF
 LOG = logging.getLogger(__name__)
 
 
+def _with_caller(message):
+    caller = misc_utils.find_test_caller()
+    if caller:
+        message = '(%s) %s' % (caller, message)
+    return message
+
+
+def _get_task_state(body):
+    return body.get('OS-EXT-STS:task_state', None)
+
+
+def _status(body):
+    return transitions.DELETED if body is None else body['status']
+
+
+def _server_state(body):
+    if body is None:
+        return transitions.DELETED
+    return '%s/%s' % (body['status'], _get_task_state(body))
+
+
+def _attributes(*keys):
+    return lambda body: dict((key, body[key]) for key in keys
+                             if body.get(key) is not None)
+
+
+def _server_attributes(body):
+    attributes = _attributes('OS-EXT-AZ:availability_zone')(body)
+    for key in ('flavor', 'image'):
+        # the image is an empty string for the servers booted from volume
+        if body.get(key):
+            attributes[key] = body[key]['id']
+    return attributes
+
+
+def _tracking(fetch, tracker, state, attributes):
+    """Wrap fetch to follow the state of the body it returns"""
+
+    def _fetch():
+        body = fetch()
+        tracker.observe(state(body),
+                        attributes(body) if body is not None else None)
+        return body
+
+    return _fetch
+
+
+def _tracking_all(fetch, resource_type, state, attributes):
+    """Wrap fetch to follow the states of the bodies by id it returns"""
+    trackers = {}
+
+    def _fetch():
+        bodies = fetch()
+        for resource_id, body in bodies.items():
+            tracker = trackers.get(resource_id)
+            if tracker is None:
+                tracker = trackers[resource_id] = (
+                    transitions.TransitionTracker(resource_type,
+                                                  resource_id))
+            tracker.observe(state(body),
+                            attributes(body) if body is not None else None)
+        return bodies
+
+    return _fetch
+
+
+def _server_reached(body, status, ready_wait):
+    server_status = body['status']
+    # NOTE(afazekas): Now the BUILD status only reached
+    # between the UNKNOWN->ACTIVE transition.
+    # TODO(afazekas): enumerate and validate the stable status set
+    if status == 'BUILD' and server_status != 'UNKNOWN':
+        return True
+    if server_status != status:
+        return False
+    # NOTE(afazekas): The instance is in "ready for action state"
+    # when no task in progress
+    # NOTE(afazekas): Converted to string because of the XML
+    # responses
+    return not ready_wait or str(_get_task_state(body)) == "None"
+
+
+def _raise_build_error(body):
+    if 'fault' in body:
+        raise exceptions.BuildErrorException(body['fault'],
+                                             server_id=body['id'])
+    raise exceptions.BuildErrorException(server_id=body['id'])
+
+
+def _next_marker(links):
+    """The marker of the next page link of a list response, or None"""
+    for link in links:
+        if link.get('rel') == 'next':
+            query = urlparse.parse_qs(urlparse.urlsplit(link['href']).query)
+            return query.get('marker', [None])[0]
+    return None
+
+
+def _list_all(list_resources, key):
+    """Wrap a list call to return the resources of all the pages
+
+    The services cap the number of resources of a list response, see the
+    osapi_max_limit option of nova and cinder, and link to the next page.
+    """
+
+    def _list(**params):
+        resources = []
+        while True:
+            body = list_resources(**params)
+            resources.extend(body[key])
+            marker = _next_marker(body.get('%s_links' % key, []))
+            if marker is None or marker == params.get('marker'):
+                return resources
+            params = dict(params, marker=marker)
+
+    return _list
+
+
+def _show_or_none(show_resource):
+    """Wrap a show call to return None when the resource is not found"""
+
+    def _show(resource_id):
+        try:
+            return show_resource(resource_id)
+        except lib_exc.NotFound:
+            return None
+
+    return _show
+
+
+def _poll_listed(list_resources, show_resource, ids, since_filter=None):
+    """Return a function polling the state of resources with a list call
+
+    The function calls list_resources(**params), which returns the
+    detailed resources, and returns a dict of the bodies of the ids by id,
+    None for the deleted ones. A resource listed with a DELETED status is
+    deleted, and one which is not listed is shown with
+    show_resource(id), returning None when it is not found, before being
+    declared deleted. The deleted ones are not polled anymore. With
+    since_filter, the name of a filter like the changes-since one of nova,
+    the polls after the first one only list the resources updated since
+    the last update seen, and keep the previous body of the ids which are
+    not listed.
+    """
+    ids = set(ids)
+    states = dict.fromkeys(ids)
+    deleted = set()
+    seen = {}
+
+    def _fetch():
+        params = {}
+        if since_filter and 'updated' in seen:
+            params[since_filter] = seen['updated']
+        listed = {}
+        for body in list_resources(**params):
+            if body.get('updated'):
+                seen['updated'] = max(seen.get('updated', ''),
+                                      body['updated'])
+            if body['id'] in ids:
+                listed[body['id']] = body
+        for resource_id in ids - deleted:
+            body = listed.get(resource_id)
+            if body is None:
+                if params:
+                    continue
+                body = show_resource(resource_id)
+            if body is not None and body['status'].upper() == 'DELETED':
+                body = None
+            if body is None:
+                deleted.add(resource_id)
+            states[resource_id] = body
+        return states
+
+    return _fetch
+
+
 # NOTE(afazekas): This function needs to know a token and a subject.
 def wait_for_server_status(client, server_id, status, ready_wait=True,
                            extra_timeout=0, raise_on_error=True):
     """Waits for a server to reach a given status."""
 
-    def _get_task_state(body):
-        return body.get('OS-EXT-STS:task_state', None)
-
-    # NOTE(afazekas): UNKNOWN status possible on ERROR
-    # or in a very early stage.
-    body = client.show_server(server_id)['server']
-    old_status = server_status = body['status']
-    old_task_state = task_state = _get_task_state(body)
     start_time = int(time.time())
     timeout = client.build_timeout + extra_timeout
-    while True:
-        # NOTE(afazekas): Now the BUILD status only reached
-        # between the UNKNOWN->ACTIVE transition.
-        # TODO(afazekas): enumerate and validate the stable status set
-        if status == 'BUILD' and server_status != 'UNKNOWN':
-            return
-        if server_status == status:
-            if ready_wait:
-                if status == 'BUILD':
-                    return
-                # NOTE(afazekas): The instance is in "ready for action state"
-                # when no task in progress
-                # NOTE(afazekas): Converted to string because of the XML
-                # responses
-                if str(task_state) == "None":
-                    # without state api extension 3 sec usually enough
-                    time.sleep(CONF.compute.ready_wait)
-                    return
-            else:
-                return
-
-        time.sleep(client.build_interval)
+    tracker = transitions.TransitionTracker('server', server_id)
+
+    def _fetch():
+        # NOTE(afazekas): UNKNOWN status possible on ERROR
+        # or in a very early stage.
         body = client.show_server(server_id)['server']
-        server_status = body['status']
-        task_state = _get_task_state(body)
-        if (server_status != old_status) or (task_state != old_task_state):
+        record = tracker.observe(_server_state(body),
+                                 _server_attributes(body))
+        if record is not None:
             LOG.info('State transition "%s" ==> "%s" after %d second wait',
-                     '/'.join((old_status, str(old_task_state))),
-                     '/'.join((server_status, str(task_state))),
+                     record.from_state, record.to_state,
                      time.time() - start_time)
-        if (server_status == 'ERROR') and raise_on_error:
-            if 'fault' in body:
-                raise exceptions.BuildErrorException(body['fault'],
-                                                     server_id=server_id)
-            else:
-                raise exceptions.BuildErrorException(server_id=server_id)
-
-        timed_out = int(time.time()) - start_time >= timeout
-
-        if timed_out:
-            expected_task_state = 'None' if ready_wait else 'n/a'
-            message = ('Server %(server_id)s failed to reach %(status)s '
-                       'status and task state "%(expected_task_state)s" '
-                       'within the required time (%(timeout)s s).' %
-                       {'server_id': server_id,
-                        'status': status,
-                        'expected_task_state': expected_task_state,
-                        'timeout': timeout})
-            message += ' Current status: %s.' % server_status
-            message += ' Current task state: %s.' % task_state
-            caller = misc_utils.find_test_caller()
-            if caller:
-                message = '(%s) %s' % (caller, message)
-            raise exceptions.TimeoutException(message)
-        old_status = server_status
-        old_task_state = task_state
+        return body
+
+    def _done(body):
+        return _server_reached(body, status, ready_wait)
+
+    def _check(body):
+        if (body['status'] == 'ERROR') and raise_on_error:
+            _raise_build_error(body)
+
+    def _on_timeout(body):
+        expected_task_state = 'None' if ready_wait else 'n/a'
+        message = ('Server %(server_id)s failed to reach %(status)s '
+                   'status and task state "%(expected_task_state)s" '
+                   'within the required time (%(timeout)s s).' %
+                   {'server_id': server_id,
+                    'status': status,
+                    'expected_task_state': expected_task_state,
+                    'timeout': timeout})
+        message += ' Current status: %s.' % body['status']
+        message += ' Current task state: %s.' % _get_task_state(body)
+        raise exceptions.TimeoutException(_with_caller(message))
+
+    polling.wait_until(_fetch, _done, timeout, client.build_interval,
+                       check=_check, on_timeout=_on_timeout)
+    if ready_wait and status != 'BUILD':
+        # without state api extension 3 sec usually enough
+        time.sleep(CONF.compute.ready_wait)
 
 
 def wait_for_server_termination(client, server_id, ignore_error=False):
     """Waits for server to reach termination."""
-    start_time = int(time.time())
-    while True:
+
+    def _show():
         try:
-            body = client.show_server(server_id)['server']
+            return client.show_server(server_id)['server']
         except lib_exc.NotFound:
-            return
+            return None
+
+    show = _tracking(_show, transitions.TransitionTracker('server',
+                                                          server_id),
+                     _server_state, _server_attributes)
 
-        server_status = body['status']
-        if server_status == 'ERROR' and not ignore_error:
+    def _fetch():
+        body = show()
+        if body is not None and body['status'] == 'ERROR' and not ignore_error:
             raise exceptions.BuildErrorException(server_id=server_id)
+        return body
+
+    def _on_timeout(body):
+        raise exceptions.TimeoutException
+
+    polling.wait_until(_fetch, lambda body: body is None,
+                       client.build_timeout, client.build_interval,
+                       on_timeout=_on_timeout)
+
 
-        if int(time.time()) - start_time >= client.build_timeout:
-            raise exceptions.TimeoutException
+def _list_servers(client):
+    return _list_all(
+        lambda **params: client.list_servers(detail=True, **params),
+        'servers')
 
-        time.sleep(client.build_interval)
+
+def _show_server(client):
+    return _show_or_none(
+        lambda server_id: client.show_server(server_id)['server'])
+
+
+def wait_for_servers_status(client, server_ids, status, ready_wait=True,
+                            extra_timeout=0, raise_on_error=True):
+    """Waits for several servers to reach a given status.
+
+    The servers are polled together, with one list call per poll.
+
+    :return: the bodies of the servers by id
+    """
+    if not server_ids:
+        return {}
+    timeout = client.build_timeout + extra_timeout
+    fetch = _tracking_all(
+        _poll_listed(_list_servers(client), _show_server(client),
+                     server_ids, 'changes-since'),
+        'server', _server_state, _server_attributes)
+
+    def _fetch():
+        servers = fetch()
+        for server_id, body in servers.items():
+            if body is None:
+                raise lib_exc.NotFound('Server %s not found' % server_id)
+            if body['status'] == 'ERROR' and raise_on_error:
+                _raise_build_error(body)
+        return servers
+
+    def _done(servers):
+        return all(_server_reached(body, status, ready_wait)
+                   for body in servers.values())
+
+    def _on_timeout(servers):
+        message = ('Servers failed to reach %s status within the required '
+                   'time (%s s). Current status and task state: %s.' %
+                   (status, timeout, ', '.join(
+                       '%s %s/%s' % (server_id, body['status'],
+                                     _get_task_state(body))
+                       for server_id, body in sorted(servers.items())
+                       if not _server_reached(body, status, ready_wait))))
+        raise exceptions.TimeoutException(_with_caller(message))
+
+    servers = polling.wait_until(_fetch, _done, timeout,
+                                 client.build_interval,
+                                 on_timeout=_on_timeout)
+    if ready_wait and status != 'BUILD':
+        time.sleep(CONF.compute.ready_wait)
+    return dict(servers)
+
+
+def wait_for_servers_termination(client, server_ids, ignore_error=False):
+    """Waits for several servers to reach termination.
+
+    The servers are polled together, with one list call per poll.
+    """
+    if not server_ids:
+        return
+    fetch = _tracking_all(
+        _poll_listed(_list_servers(client), _show_server(client),
+                     server_ids, 'changes-since'),
+        'server', _server_state, _server_attributes)
+
+    def _fetch():
+        servers = fetch()
+        for body in servers.values():
+            if (body is not None and body['status'] == 'ERROR' and
+                    not ignore_error):
+                raise exceptions.BuildErrorException(server_id=body['id'])
+        return servers
+
+    def _on_timeout(servers):
+        message = ('Servers %s failed to terminate within the required '
+                   'time (%s s).' %
+                   (', '.join(sorted(server_id for server_id, body
+                                     in servers.items() if body)),
+                    client.build_timeout))
+        raise exceptions.TimeoutException(_with_caller(message))
+
+    polling.wait_until(_fetch,
+                       lambda servers: not any(servers.values()),
+                       client.build_timeout, client.build_interval,
+                       on_timeout=_on_timeout)
 
 
 def wait_for_image_status(client, image_id, status):
@@ -122,86 +375,171 @@ def wait_for_image_status(client, image_id, status):
     The client should have a show_image(image_id) method to get the image.
     The client should also have build_interval and build_timeout attributes.
     """
-    image = client.show_image(image_id)
-    # Compute image client return response wrapped in 'image' element
-    # which is not case with glance image client.
-    if 'image' in image:
-        image = image['image']
-    start = int(time.time())
-
-    while image['status'] != status:
-        time.sleep(client.build_interval)
+
+    tracker = transitions.TransitionTracker('image', image_id)
+
+    def _fetch():
         image = client.show_image(image_id)
         # Compute image client return response wrapped in 'image' element
         # which is not case with glance image client.
         if 'image' in image:
             image = image['image']
-        status_curr = image['status']
-        if status_curr == 'ERROR':
+        tracker.observe(image['status'],
+                        _attributes('disk_format', 'size')(image))
+        return image
+
+    def _check(image):
+        if image['status'] == 'ERROR':
             raise exceptions.AddImageException(image_id=image_id)
 
-        # check the status again to avoid a false negative where we hit
-        # the timeout at the same time that the image reached the expected
-        # status
-        if status_curr == status:
-            return
-
-        if int(time.time()) - start >= client.build_timeout:
-            message = ('Image %(image_id)s failed to reach %(status)s state'
-                       '(current state %(status_curr)s) '
-                       'within the required time (%(timeout)s s).' %
-                       {'image_id': image_id,
-                        'status': status,
-                        'status_curr': status_curr,
-                        'timeout': client.build_timeout})
-            caller = misc_utils.find_test_caller()
-            if caller:
-                message = '(%s) %s' % (caller, message)
-            raise exceptions.TimeoutException(message)
+    def _on_timeout(image):
+        message = ('Image %(image_id)s failed to reach %(status)s state'
+                   '(current state %(status_curr)s) '
+                   'within the required time (%(timeout)s s).' %
+                   {'image_id': image_id,
+                    'status': status,
+                    'status_curr': image['status'],
+                    'timeout': client.build_timeout})
+        raise exceptions.TimeoutException(_with_caller(message))
+
+    polling.wait_until(_fetch, lambda image: image['status'] == status,
+                       client.build_timeout, client.build_interval,
+                       check=_check, on_timeout=_on_timeout)
 
 
 def wait_for_volume_status(client, volume_id, status):
     """Waits for a Volume to reach a given status."""
-    body = client.show_volume(volume_id)['volume']
-    volume_status = body['status']
-    start = int(time.time())
-
-    while volume_status != status:
-        time.sleep(client.build_interval)
-        body = client.show_volume(volume_id)['volume']
-        volume_status = body['status']
-        if volume_status == 'error':
+
+    def _check(body):
+        if body['status'] == 'error':
             raise exceptions.VolumeBuildErrorException(volume_id=volume_id)
-        if volume_status == 'error_restoring':
+        if body['status'] == 'error_restoring':
             raise exceptions.VolumeRestoreErrorException(volume_id=volume_id)
 
-        if int(time.time()) - start >= client.build_timeout:
-            message = ('Volume %s failed to reach %s status (current %s) '
-                       'within the required time (%s s).' %
-                       (volume_id, status, volume_status,
-                        client.build_timeout))
-            raise exceptions.TimeoutException(message)
+    def _on_timeout(body):
+        message = ('Volume %s failed to reach %s status (current %s) '
+                   'within the required time (%s s).' %
+                   (volume_id, status, body['status'],
+                    client.build_timeout))
+        raise exceptions.TimeoutException(message)
+
+    fetch = _tracking(lambda: client.show_volume(volume_id)['volume'],
+                      transitions.TransitionTracker('volume', volume_id),
+                      _status, _volume_attributes)
+    polling.wait_until(fetch,
+                       lambda body: body['status'] == status,
+                       client.build_timeout, client.build_interval,
+                       check=_check, on_timeout=_on_timeout)
+
+
+_volume_attributes = _attributes('size', 'volume_type', 'availability_zone')
+
+
+# NOTE: unlike nova, cinder has no changes-since filter (only the updated_at
+# one of the 3.60 microversion), so the volumes are listed in full at each
+# poll.
+def _list_volumes(client):
+    return _list_all(
+        lambda **params: client.list_volumes(detail=True, params=params),
+        'volumes')
+
+
+def _show_volume(client):
+    return _show_or_none(
+        lambda volume_id: client.show_volume(volume_id)['volume'])
+
+
+def wait_for_volumes_status(client, volume_ids, status):
+    """Waits for several Volumes to reach a given status.
+
+    The volumes are polled together, with one list call per poll.
+
+    :return: the bodies of the volumes by id
+    """
+    if not volume_ids:
+        return {}
+    fetch = _tracking_all(_poll_listed(_list_volumes(client),
+                                       _show_volume(client), volume_ids),
+                          'volume', _status, _volume_attributes)
+
+    def _fetch():
+        volumes = fetch()
+        for volume_id, body in volumes.items():
+            if body is None:
+                raise lib_exc.NotFound('Volume %s not found' % volume_id)
+            if body['status'] == 'error':
+                raise exceptions.VolumeBuildErrorException(
+                    volume_id=volume_id)
+            if body['status'] == 'error_restoring':
+                raise exceptions.VolumeRestoreErrorException(
+                    volume_id=volume_id)
+        return volumes
+
+    def _done(volumes):
+        return all(body['status'] == status for body in volumes.values())
+
+    def _on_timeout(volumes):
+        message = ('Volumes failed to reach %s status within the required '
+                   'time (%s s). Current status: %s.' %
+                   (status, client.build_timeout, ', '.join(
+                       '%s %s' % (volume_id, body['status'])
+                       for volume_id, body in sorted(volumes.items())
+                       if body['status'] != status)))
+        raise exceptions.TimeoutException(message)
+
+    volumes = polling.wait_until(_fetch, _done, client.build_timeout,
+                                 client.build_interval,
+                                 on_timeout=_on_timeout)
+    return dict(volumes)
+
+
+def wait_for_volumes_deletion(client, volume_ids):
+    """Waits for several Volumes to be deleted.
+
+    The volumes are polled together, with one list call per poll.
+    """
+    if not volume_ids:
+        return
+
+    def _on_timeout(volumes):
+        message = ('Volumes %s failed to be deleted within the required '
+                   'time (%s s).' %
+                   (', '.join(sorted(volume_id for volume_id, body
+                                     in volumes.items() if body)),
+                    client.build_timeout))
+        raise exceptions.TimeoutException(message)
+
+    fetch = _tracking_all(_poll_listed(_list_volumes(client),
+                                       _show_volume(client), volume_ids),
+                          'volume', _status, _volume_attributes)
+    polling.wait_until(fetch,
+                       lambda volumes: not any(volumes.values()),
+                       client.build_timeout, client.build_interval,
+                       on_timeout=_on_timeout)
 
 
 def wait_for_snapshot_status(client, snapshot_id, status):
     """Waits for a Snapshot to reach a given status."""
-    body = client.show_snapshot(snapshot_id)['snapshot']
-    snapshot_status = body['status']
-    start = int(time.time())
-
-    while snapshot_status != status:
-        time.sleep(client.build_interval)
-        body = client.show_snapshot(snapshot_id)['snapshot']
-        snapshot_status = body['status']
-        if snapshot_status == 'error':
+
+    def _check(body):
+        if body['status'] == 'error':
             raise exceptions.SnapshotBuildErrorException(
                 snapshot_id=snapshot_id)
-        if int(time.time()) - start >= client.build_timeout:
-            message = ('Snapshot %s failed to reach %s status (current %s) '
-                       'within the required time (%s s).' %
-                       (snapshot_id, status, snapshot_status,
-                        client.build_timeout))
-            raise exceptions.TimeoutException(message)
+
+    def _on_timeout(body):
+        message = ('Snapshot %s failed to reach %s status (current %s) '
+                   'within the required time (%s s).' %
+                   (snapshot_id, status, body['status'],
+                    client.build_timeout))
+        raise exceptions.TimeoutException(message)
+
+    fetch = _tracking(lambda: client.show_snapshot(snapshot_id)['snapshot'],
+                      transitions.TransitionTracker('snapshot', snapshot_id),
+                      _status, _attributes('size', 'volume_id'))
+    polling.wait_until(fetch,
+                       lambda body: body['status'] == status,
+                       client.build_timeout, client.build_interval,
+                       check=_check, on_timeout=_on_timeout)
 
 
 def wait_for_bm_node_status(client, node_id, attr, status):
@@ -209,25 +547,22 @@ def wait_for_bm_node_status(client, node_id, attr, status):
 
     The client should have a show_node(node_uuid) method to get the node.
     """
-    _, node = client.show_node(node_id)
-    start = int(time.time())
-
-    while node[attr] != status:
-        time.sleep(client.build_interval)
-        _, node = client.show_node(node_id)
-        status_curr = node[attr]
-        if status_curr == status:
-            return
-
-        if int(time.time()) - start >= client.build_timeout:
-            message = ('Node %(node_id)s failed to reach %(attr)s=%(status)s '
-                       'within the required time (%(timeout)s s).' %
-                       {'node_id': node_id,
-                        'attr': attr,
-                        'status': status,
-                        'timeout': client.build_timeout})
-            message += ' Current state of %s: %s.' % (attr, status_curr)
-            caller = misc_utils.find_test_caller()
-            if caller:
-                message = '(%s) %s' % (caller, message)
-            raise exceptions.TimeoutException(message)
+
+    def _on_timeout(node):
+        message = ('Node %(node_id)s failed to reach %(attr)s=%(status)s '
+                   'within the required time (%(timeout)s s).' %
+                   {'node_id': node_id,
+                    'attr': attr,
+                    'status': status,
+                    'timeout': client.build_timeout})
+        message += ' Current state of %s: %s.' % (attr, node[attr])
+        raise exceptions.TimeoutException(_with_caller(message))
+
+    fetch = _tracking(lambda: client.show_node(node_id)[1],
+                      transitions.TransitionTracker('baremetal_node',
+                                                    node_id),
+                      lambda node: node[attr], _attributes('driver'))
+    polling.wait_until(fetch,
+                       lambda node: node[attr] == status,
+                       client.build_timeout, client.build_interval,
+                       on_timeout=_on_timeout)
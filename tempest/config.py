@@ -15,6 +15,7 @@
 
 from __future__ import print_function
 
+import atexit
 import logging as std_logging
 import os
 import tempfile
@@ -23,6 +24,10 @@ from oslo_concurrency import lockutils
 from oslo_config import cfg
 from oslo_log import log as logging
 
+from tempest.lib.common import background_logging
+from tempest.lib.common import cassette
+from tempest.lib.common import http
+from tempest.lib.common import polling
 from tempest.test_discover import plugins
 
 
@@ -85,6 +90,28 @@ AuthGroup = [
                      "creates. However in some neutron configurations, like "
                      "with VLAN provider networks, this doesn't work. So if "
                      "set to False the isolated networks will not be created"),
+    cfg.IntOpt('dynamic_creds_pool_size',
+               default=0,
+               min=0,
+               help="If use_dynamic_credentials is set to True, number of "
+                    "sets of primary credentials, with their isolated "
+                    "network resources, each worker provisions in the "
+                    "background and keeps ready for the test classes. As "
+                    "many admin credentials, and credentials of each set "
+                    "of roles, are kept once a test class asked for them. "
+                    "0 disables the pool."),
+    cfg.BoolOpt('dynamic_creds_recycle',
+                default=False,
+                help="Give the primary and alt credentials of a test class "
+                     "back to the pool of dynamic_creds_pool_size rather "
+                     "than deleting them, once the security groups left are "
+                     "deleted. A set given back takes the place of a new "
+                     "one, sets which are not are replaced once deleted. "
+                     "Credentials with ports, servers, keypairs, "
+                     "volumes, snapshots or images left are deleted. The "
+                     "test classes then share projects, which does not "
+                     "isolate them from the resources their predecessors "
+                     "did not clean up."),
     cfg.StrOpt('admin_username',
                help="Username for an administrative user. This is needed for "
                     "authenticating requests made by project isolation to "
@@ -196,6 +223,18 @@ IdentityGroup = [
     cfg.StrOpt('default_domain_id',
                default='default',
                help="ID of the default domain"),
+    cfg.BoolOpt('background_token_refresh',
+                default=False,
+                help="Renew the tokens of the test credentials from a "
+                     "background thread shortly before they expire, so "
+                     "that API requests never wait for a new token."),
+    cfg.StrOpt('token_cache_dir',
+               default=None,
+               help="Directory in which the test workers share the tokens "
+                    "of the credentials they use, so that keystone is asked "
+                    "for one token per set of credentials instead of one "
+                    "per worker. The tokens are stored in files readable "
+                    "only by their owner. Not used when unset."),
 ]
 
 identity_feature_group = cfg.OptGroup(name='identity-feature-enabled',
@@ -1150,7 +1189,178 @@ Expected values for this field are:
 
 If nothing is specified, this feature is not enabled. To trace everything
 specify .* as the regex.
-""")
+"""),
+    cfg.BoolOpt('background_logging',
+                default=False,
+                help="Write the logs from a background thread, so that the "
+                     "tests do not wait for the log files to be written. "
+                     "Only the handlers of the root logger, which are the "
+                     "ones configured by the logging options, are moved to "
+                     "the background thread."),
+]
+
+service_clients_group = cfg.OptGroup(name='service-clients',
+                                     title="Service Clients Options")
+
+ServiceClientsGroup = [
+    cfg.BoolOpt('http_close_connections',
+                default=False,
+                help="Close the HTTP connection after every API request. By "
+                     "default connections are kept alive and reused."),
+    cfg.IntOpt('http_pool_maxsize',
+               default=10,
+               help="Number of HTTP connections kept open for each API "
+                    "endpoint host."),
+    cfg.DictOpt('http_pool_maxsize_by_host',
+                default={},
+                help="Per host override of http_pool_maxsize, for example "
+                     "keystone.example.com:20,nova.example.com:40"),
+    cfg.IntOpt('http_pool_idle_timeout',
+               default=60,
+               help="Seconds after which an idle pooled HTTP connection is "
+                    "closed instead of being reused."),
+    cfg.BoolOpt('http_pool_block',
+                default=False,
+                help="Wait for a free pooled HTTP connection when all the "
+                     "connections to a host are in use, instead of opening "
+                     "an extra one. HTTP connection pools are shared by all "
+                     "the service clients of a test worker."),
+    cfg.StrOpt('latency_report_dir',
+               default=None,
+               help="Directory in which each test worker writes a JSON "
+                    "report of the API request latencies (count, mean, "
+                    "p50, p90 and p99 per service, method and URL) when it "
+                    "exits. The reports are named latency-<pid>.json. No "
+                    "latencies are collected when unset."),
+    cfg.IntOpt('teardown_max_workers',
+               default=8,
+               min=1,
+               help="Maximum number of kinds of resources the test classes "
+                    "delete at the same time when they are torn down, in "
+                    "the order of their dependencies, e.g. the volumes "
+                    "after the servers. 1 deletes them one kind after "
+                    "another."),
+    cfg.StrOpt('transition_report_dir',
+               default=None,
+               help="Directory in which each test worker writes a JSON "
+                    "report of the state transitions seen by the waiters "
+                    "when it exits: the duration distribution of each "
+                    "transition per resource type, and the timeline of "
+                    "the transitions with the resource attributes such as "
+                    "flavor, image and availability zone. The reports are "
+                    "named transitions-<pid>.json. No transitions are "
+                    "collected when unset."),
+    cfg.IntOpt('response_validation_sample_rate',
+               default=0,
+               min=0,
+               help="How many of the successful API responses are checked "
+                    "against their JSON schema. With 0 no response is "
+                    "validated, and their status code is not checked "
+                    "either. With 1 all of them are, with N the first "
+                    "response for each schema is and then 1 in N."),
+    cfg.StrOpt('json_backend',
+               default='auto',
+               choices=['auto', 'orjson', 'ujson', 'simplejson', 'stdlib'],
+               help="Library used to parse the JSON API responses. auto "
+                    "picks the fastest one installed, in the order orjson, "
+                    "ujson, simplejson and the standard library."),
+    cfg.IntOpt('response_cache_ttl',
+               default=0,
+               min=0,
+               help="Seconds during which the responses of read-mostly API "
+                    "endpoints, like the flavor and extension listings, are "
+                    "cached and reused by the service clients of a test "
+                    "worker. Stale responses are revalidated with their "
+                    "ETag when the service sends one. The cached responses "
+                    "of a resource collection are dropped when a client "
+                    "changes it. 0 disables the cache."),
+    cfg.IntOpt('response_cache_size',
+               default=1000,
+               min=1,
+               help="Maximum number of API responses cached by a test "
+                    "worker, the least recently used ones are dropped "
+                    "first."),
+    cfg.IntOpt('http_max_retries',
+               default=0,
+               min=0,
+               help="Number of times an idempotent API request (GET, HEAD, "
+                    "PUT, DELETE) is sent again after a connection error or "
+                    "a 429, 502, 503 or 504 response, before failing. 0 "
+                    "disables the retries."),
+    cfg.FloatOpt('http_retry_backoff',
+                 default=1.0,
+                 min=0,
+                 help="Seconds waited before the first retry of an API "
+                      "request. The delay doubles at every retry, with a "
+                      "random part, unless the response gives a "
+                      "Retry-After."),
+    cfg.FloatOpt('http_retry_max_backoff',
+                 default=30.0,
+                 min=0,
+                 help="Maximum seconds waited before retrying an API "
+                      "request."),
+    cfg.FloatOpt('http_rate_limit',
+                 default=0,
+                 min=0,
+                 help="Maximum number of API requests per second a test "
+                      "worker sends to each endpoint, requests over the "
+                      "limit wait for their turn. 0 disables the limit."),
+    cfg.IntOpt('http_rate_limit_burst',
+               default=0,
+               min=0,
+               help="Number of API requests a test worker can send at once "
+                    "to an endpoint it did not use for a while, when "
+                    "http_rate_limit is set. By default one second worth "
+                    "of requests."),
+    cfg.BoolOpt('coalesce_get_requests',
+                default=False,
+                help="Share one API call between the identical GET requests "
+                     "(same credentials, URL and headers) sent at the same "
+                     "time by the threads of a test worker, for instance "
+                     "parallel waiters polling the same resource."),
+    cfg.StrOpt('http_cassette',
+               default=None,
+               help="File into which the API responses are recorded, or "
+                    "from which they are served back without sending the "
+                    "requests, depending on http_cassette_mode. Replaying "
+                    "a recorded run profiles the client side of tempest "
+                    "without the noise of a real cloud."),
+    cfg.StrOpt('http_cassette_mode',
+               default='replay',
+               choices=cassette.MODES,
+               help="Whether the API responses are recorded into "
+                    "http_cassette, or served back from it."),
+    cfg.FloatOpt('polling_backoff',
+                 default=1.0,
+                 min=1,
+                 help="Factor by which the waiters lengthen the interval "
+                      "between two polls of a resource, starting from the "
+                      "build_interval of their client. 1 polls at a fixed "
+                      "interval."),
+    cfg.FloatOpt('polling_max_interval',
+                 default=0,
+                 min=0,
+                 help="Maximum seconds between two polls of a waiter when "
+                      "polling_backoff is set, it never shortens the "
+                      "build_interval. 0 for no limit."),
+    cfg.FloatOpt('polling_jitter',
+                 default=0,
+                 min=0,
+                 max=1,
+                 help="Fraction of the interval between two polls by which "
+                      "it is randomized, so that the waiters of parallel "
+                      "workers do not poll in step."),
+    cfg.FloatOpt('polling_fast_start',
+                 default=0,
+                 min=0,
+                 help="Seconds at the start of a wait during which the "
+                      "waiters poll every polling_fast_interval seconds, "
+                      "to return quickly from the short transitions."),
+    cfg.FloatOpt('polling_fast_interval',
+                 default=0.5,
+                 min=0,
+                 help="Seconds between two polls during "
+                      "polling_fast_start."),
 ]
 
 input_scenario_group = cfg.OptGroup(name="input-scenario",
@@ -1459,6 +1669,7 @@ _opts = [
     (scenario_group, ScenarioGroup),
     (service_available_group, ServiceAvailableGroup),
     (debug_group, DebugGroup),
+    (service_clients_group, ServiceClientsGroup),
     (baremetal_group, BaremetalGroup),
     (input_scenario_group, InputScenarioGroup),
     (negative_group, NegativeGroup),
@@ -1532,6 +1743,7 @@ class TempestConfigPrivate(object):
         self.scenario = _CONF.scenario
         self.service_available = _CONF.service_available
         self.debug = _CONF.debug
+        self.service_clients = _CONF['service-clients']
         self.baremetal = _CONF.baremetal
         self.input_scenario = _CONF['input-scenario']
         self.negative = _CONF.negative
@@ -1585,6 +1797,21 @@ class TempestConfigPrivate(object):
         LOG.info("Using tempest config file %s" % path)
         register_opts()
         self._set_attrs()
+        if self.debug.background_logging:
+            background_logging.enable()
+        if self.service_clients.http_cassette:
+            http_cassette = cassette.Cassette(
+                self.service_clients.http_cassette,
+                self.service_clients.http_cassette_mode)
+            atexit.register(http_cassette.close)
+            http.use_cassette(http_cassette)
+        service_clients = self.service_clients
+        polling.set_default_policy(polling.PollingPolicy(
+            backoff=service_clients.polling_backoff,
+            max_interval=service_clients.polling_max_interval or None,
+            jitter=service_clients.polling_jitter,
+            fast_start=service_clients.polling_fast_start,
+            fast_interval=service_clients.polling_fast_interval))
         if parse_conf:
             _CONF.log_opt_values(LOG, std_logging.DEBUG)
 
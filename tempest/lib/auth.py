@@ -17,6 +17,8 @@ import abc
 import copy
 import datetime
 import re
+import threading
+import weakref
 
 from oslo_log import log as logging
 import six
@@ -91,6 +93,9 @@ class AuthProvider(object):
         self.cache = None
         self.alt_auth_data = None
         self.alt_part = None
+        # Held while fetching a new token, so that concurrent requests
+        # finding the token expired wait for one of them to renew it
+        self._auth_lock = threading.Lock()
 
     def __str__(self):
         return "Creds :{creds}, cached auth data: {cache}".format(
@@ -131,9 +136,14 @@ class AuthProvider(object):
 
     def get_auth(self):
         """Returns auth from cache if available, else auth first"""
-        if self.cache is None or self.is_expired(self.cache):
-            self.set_auth()
-        return self.cache
+        auth_data = self.cache
+        if auth_data is None or self.is_expired(auth_data):
+            with self._auth_lock:
+                # Another thread may have renewed it while we waited
+                if self.cache is auth_data:
+                    self.set_auth()
+            auth_data = self.cache
+        return auth_data
 
     def set_auth(self):
         """Forces setting auth.
@@ -150,8 +160,9 @@ class AuthProvider(object):
         Can be called to clear the access cache so that next request
         will fetch a new token and base_url.
         """
-        self.cache = None
-        self.credentials.reset()
+        with self._auth_lock:
+            self.cache = None
+            self.credentials.reset()
 
     @abc.abstractmethod
     def is_expired(self, auth_data):
@@ -231,12 +242,27 @@ class KeystoneAuthProvider(AuthProvider):
 
     def __init__(self, credentials, auth_url,
                  disable_ssl_certificate_validation=None,
-                 ca_certs=None, trace_requests=None):
+                 ca_certs=None, trace_requests=None, token_cache=None):
+        """Keystone auth provider __init__
+
+        :param credentials: credentials for authentication
+        :param auth_url: the keystone API URL
+        :param token_cache: a token_cache.FileTokenCache through which the
+                            tokens are shared with other processes
+        """
         super(KeystoneAuthProvider, self).__init__(credentials)
         self.dsvm = disable_ssl_certificate_validation
         self.ca_certs = ca_certs
         self.trace_requests = trace_requests
+        self.token_cache = token_cache
         self.auth_client = self._auth_client(auth_url)
+        # The auth data whose catalog base URLs are cached, and the base
+        # URLs by filters
+        self._base_urls = (None, {})
+        # The auth data whose token expiry is cached, and the expiry
+        self._expiry = (None, None)
+        # The token cache key and the token of the last shared auth data
+        self._shared_token = None
 
     def _decorate_request(self, filters, method, url, headers=None, body=None,
                           auth_data=None):
@@ -271,11 +297,89 @@ class KeystoneAuthProvider(AuthProvider):
         # Bypasses the cache
         auth_func = getattr(self.auth_client, 'get_token')
         auth_params = self._auth_params()
+        if self.token_cache is not None:
+            return self._get_shared_auth(auth_func, auth_params)
 
         # returns token, auth_data
         token, auth_data = auth_func(**auth_params)
         return token, auth_data
 
+    def _get_shared_auth(self, auth_func, auth_params):
+        """Get a token through the token cache shared with other processes
+
+        The cached token is used unless it expires within the threshold or
+        is the one this provider is renewing, which may have been revoked.
+        """
+        key = self.token_cache.key(self.auth_client.auth_url, auth_params)
+        current_token = self.cache[0] if self.cache is not None else None
+        with self.token_cache.lock(key):
+            auth_data = self.token_cache.get(key)
+            if (auth_data is None or auth_data[0] == current_token or
+                    self.is_expired(auth_data)):
+                auth_data = auth_func(**auth_params)
+                self.token_cache.set(key, auth_data)
+        self._shared_token = (key, auth_data[0])
+        return auth_data
+
+    def clear_auth(self):
+        """Clear access cache
+
+        The token may have been revoked, so it is dropped from the token
+        cache too, for neither this provider nor another one to reuse it.
+        It is looked up by the key it was cached with, as the credentials
+        filled since then may change the key.
+        """
+        shared_token, self._shared_token = self._shared_token, None
+        if shared_token is not None:
+            self.token_cache.invalidate(*shared_token)
+        super(KeystoneAuthProvider, self).clear_auth()
+
+    @abc.abstractmethod
+    def _expiry_string(self, auth_data_body):
+        """The expiry time of the token, as returned by keystone"""
+        return
+
+    def get_expiry(self, auth_data):
+        """The expiry time of the token of auth_data, as a UTC datetime
+
+        It is parsed once for the cached auth data.
+        """
+        parsed_auth_data, expiry = self._expiry
+        if parsed_auth_data is not auth_data:
+            expiry = self._parse_expiry_time(
+                self._expiry_string(auth_data[1]))
+            if auth_data is self.cache:
+                self._expiry = (auth_data, expiry)
+        return expiry
+
+    def is_expired(self, auth_data, margin=None):
+        """Whether the token expires within token_expiry_threshold
+
+        :param margin: a timedelta added to the threshold
+        """
+        threshold = self.token_expiry_threshold
+        if margin is not None:
+            threshold += margin
+        return (self.get_expiry(auth_data) - threshold <=
+                datetime.datetime.utcnow())
+
+    def refresh_auth(self, margin=None):
+        """Renew the cached token if it expires within margin
+
+        Nothing is done when no token is cached: the provider is not used.
+
+        :param margin: a timedelta added to token_expiry_threshold
+        :return: whether a new token was fetched
+        """
+        auth_data = self.cache
+        if auth_data is None or not self.is_expired(auth_data, margin):
+            return False
+        with self._auth_lock:
+            if self.cache is not auth_data:
+                return False
+            self.set_auth()
+        return True
+
     def _parse_expiry_time(self, expiry_string):
         expiry = None
         for date_format in self.EXPIRY_DATE_FORMATS:
@@ -294,6 +398,45 @@ class KeystoneAuthProvider(AuthProvider):
     def get_token(self):
         return self.auth_data[0]
 
+    def base_url(self, filters, auth_data=None):
+        """Base URL from catalog
+
+        Filters can be:
+        - service: compute, image, etc
+        - region: the service region
+        - endpoint_type: adminURL, publicURL, internalURL
+        - api_version: replace catalog version with this
+        - skip_path: take just the base URL
+
+        The base URLs found in the catalog of the cached auth data are
+        kept, by filters, until the auth data is replaced.
+        """
+        if auth_data is None:
+            auth_data = self.auth_data
+        key = (filters.get('service'), filters.get('region'),
+               filters.get('endpoint_type'), filters.get('api_version'),
+               filters.get('skip_path'))
+        base_urls = self._base_urls_of(auth_data)
+        base_url = base_urls.get(key)
+        if base_url is None:
+            base_url = base_urls[key] = self._base_url(filters, auth_data)
+        return base_url
+
+    def _base_urls_of(self, auth_data):
+        indexed_auth_data, base_urls = self._base_urls
+        if indexed_auth_data is not auth_data:
+            if auth_data is not self.cache:
+                # Alternate auth data, which is only used once
+                return {}
+            base_urls = {}
+            self._base_urls = (auth_data, base_urls)
+        return base_urls
+
+    @abc.abstractmethod
+    def _base_url(self, filters, auth_data):
+        """Extracts the base_url of filters from the auth_data catalog"""
+        return
+
 
 class KeystoneV2AuthProvider(KeystoneAuthProvider):
 
@@ -321,18 +464,7 @@ class KeystoneV2AuthProvider(KeystoneAuthProvider):
         if self.credentials.user_id is None:
             self.credentials.user_id = user['id']
 
-    def base_url(self, filters, auth_data=None):
-        """Base URL from catalog
-
-        Filters can be:
-        - service: compute, image, etc
-        - region: the service region
-        - endpoint_type: adminURL, publicURL, internalURL
-        - api_version: replace catalog version with this
-        - skip_path: take just the base URL
-        """
-        if auth_data is None:
-            auth_data = self.auth_data
+    def _base_url(self, filters, auth_data):
         token, _auth_data = auth_data
         service = filters.get('service')
         region = filters.get('region')
@@ -357,11 +489,8 @@ class KeystoneV2AuthProvider(KeystoneAuthProvider):
                 (service, region, endpoint_type))
         return apply_url_filters(_base_url, filters)
 
-    def is_expired(self, auth_data):
-        _, access = auth_data
-        expiry = self._parse_expiry_time(access['token']['expires'])
-        return (expiry - self.token_expiry_threshold <=
-                datetime.datetime.utcnow())
+    def _expiry_string(self, auth_data_body):
+        return auth_data_body['token']['expires']
 
 
 class KeystoneV3AuthProvider(KeystoneAuthProvider):
@@ -419,18 +548,7 @@ class KeystoneV3AuthProvider(KeystoneAuthProvider):
         if self.credentials.user_domain_name is None:
             self.credentials.user_domain_name = user['domain']['name']
 
-    def base_url(self, filters, auth_data=None):
-        """Base URL from catalog
-
-        Filters can be:
-        - service: compute, image, etc
-        - region: the service region
-        - endpoint_type: adminURL, publicURL, internalURL
-        - api_version: replace catalog version with this
-        - skip_path: take just the base URL
-        """
-        if auth_data is None:
-            auth_data = self.auth_data
+    def _base_url(self, filters, auth_data):
         token, _auth_data = auth_data
         service = filters.get('service')
         region = filters.get('region')
@@ -468,11 +586,65 @@ class KeystoneV3AuthProvider(KeystoneAuthProvider):
                 raise exceptions.EndpointNotFound(service)
         return apply_url_filters(_base_url, filters)
 
-    def is_expired(self, auth_data):
-        _, access = auth_data
-        expiry = self._parse_expiry_time(access['expires_at'])
-        return (expiry - self.token_expiry_threshold <=
-                datetime.datetime.utcnow())
+    def _expiry_string(self, auth_data_body):
+        return auth_data_body['expires_at']
+
+
+class TokenRefresher(object):
+    """Renew the tokens of auth providers before they expire
+
+    A background thread checks the registered providers every ``interval``
+    seconds and renews the tokens which expire within twice that time of
+    their expiry threshold, so that API requests do not wait for keystone.
+    Providers are only weakly referenced and dropped once unused.
+
+    :param int interval: seconds between two checks
+    """
+
+    def __init__(self, interval=10):
+        self.interval = interval
+        self._providers = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, provider):
+        """Renew the tokens of a KeystoneAuthProvider in the background"""
+        with self._lock:
+            self._providers.add(provider)
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name='tempest-token-refresher')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def refresh(self):
+        """Renew the tokens which expire before the next check"""
+        margin = datetime.timedelta(seconds=2 * self.interval)
+        with self._lock:
+            providers = list(self._providers)
+        for provider in providers:
+            try:
+                provider.refresh_auth(margin)
+            except Exception:
+                LOG.exception('Failed to renew the token of %s',
+                              provider.credentials)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.refresh()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+
+# Shared by all the auth providers of a process
+TOKEN_REFRESHER = TokenRefresher()
 
 
 def is_identity_version_supported(identity_version):
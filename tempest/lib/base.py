@@ -19,10 +19,44 @@ import os
 import fixtures
 import testtools
 
+from tempest.lib.common.utils import misc as misc_utils
+
 LOG = logging.getLogger(__name__)
 
 
-class BaseTestCase(testtools.testcase.WithAttributes, testtools.TestCase):
+class TestCallerMixin(object):
+    """Record which part of a test is running for find_test_caller
+
+    Service clients name the test in their logs for every request, knowing
+    it from here is much cheaper than walking the stack each time. The
+    class level setUpClass and tearDownClass are decorated with
+    misc_utils.class_test_caller by the test base classes.
+    """
+
+    def _set_test_caller(self, method_name):
+        misc_utils.set_test_caller(
+            '%s:%s' % (self.__class__.__name__, method_name))
+
+    def _run_setup(self, result):
+        # Cleanups run last to first, so this one runs after all the others
+        self.addCleanup(misc_utils.set_test_caller, None)
+        self._set_test_caller('setUp')
+        return super(TestCallerMixin, self)._run_setup(result)
+
+    def _run_test_method(self, result):
+        self._set_test_caller(self._testMethodName)
+        return super(TestCallerMixin, self)._run_test_method(result)
+
+    def _run_teardown(self, result):
+        self._set_test_caller('tearDown')
+        try:
+            return super(TestCallerMixin, self)._run_teardown(result)
+        finally:
+            self._set_test_caller('_run_cleanups')
+
+
+class BaseTestCase(TestCallerMixin, testtools.testcase.WithAttributes,
+                   testtools.TestCase):
     setUpClassCalled = False
 
     # NOTE(sdague): log_format is defined inline here instead of using the oslo
@@ -32,12 +66,14 @@ class BaseTestCase(testtools.testcase.WithAttributes, testtools.TestCase):
                   '[%(name)s] %(message)s')
 
     @classmethod
+    @misc_utils.class_test_caller
     def setUpClass(cls):
         if hasattr(super(BaseTestCase, cls), 'setUpClass'):
             super(BaseTestCase, cls).setUpClass()
         cls.setUpClassCalled = True
 
     @classmethod
+    @misc_utils.class_test_caller
     def tearDownClass(cls):
         if hasattr(super(BaseTestCase, cls), 'tearDownClass'):
             super(BaseTestCase, cls).tearDownClass()
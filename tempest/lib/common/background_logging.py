@@ -0,0 +1,107 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Write log records from a background thread
+
+enable() moves the handlers of a logger behind a queue, so that the thread
+logging a message only merges its arguments and the formatting and I/O of
+the handlers are done by a background thread.
+"""
+
+import atexit
+import logging
+import threading
+
+from six.moves import queue
+
+_STOP = object()
+
+
+class QueueHandler(logging.Handler):
+    """Put the log records in a queue"""
+
+    def __init__(self, record_queue):
+        super(QueueHandler, self).__init__()
+        self.queue = record_queue
+
+    def prepare(self, record):
+        # The arguments may be changed by the caller once we return, so the
+        # message and traceback are turned into text in the calling thread
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(
+                    record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        try:
+            self.queue.put_nowait(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+
+class QueueListener(object):
+    """Pass the records of a queue to handlers, from a background thread"""
+
+    def __init__(self, record_queue, handlers):
+        self.queue = record_queue
+        self.handlers = handlers
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run,
+                                        name='tempest-log-writer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            record = self.queue.get()
+            if record is _STOP:
+                break
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+
+    def stop(self):
+        """Write the records left in the queue and stop the thread"""
+        if self._thread is None:
+            return
+        self.queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+
+def enable(logger=None):
+    """Move the handlers of a logger to a background thread
+
+    :param logger: the logger whose handlers are moved, by default the root
+                   logger which oslo.log configures
+    :return: the QueueListener writing the records, which is stopped at exit
+             once all the queued records are written
+    """
+    if logger is None:
+        logger = logging.getLogger()
+    record_queue = queue.Queue()
+    listener = QueueListener(record_queue, list(logger.handlers))
+    for handler in listener.handlers:
+        logger.removeHandler(handler)
+    logger.addHandler(QueueHandler(record_queue))
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
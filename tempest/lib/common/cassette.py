@@ -0,0 +1,229 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Recorded API responses, served back without any network I/O
+
+A Cassette in record mode keeps the responses received by ClosingHttp in a
+file, and serves them back in replay mode instead of sending the requests.
+This gives a repeatable, offline, workload to profile the client stack:
+authentication, serialization, parsing and validation, without the
+latency and noise of a real cloud.
+
+The file has one JSON document per line and per interaction. Requests are
+matched on their method and normalised URL, see normalize_url; the
+responses of a same request are served back in the order they were
+recorded, the last one being repeated once they are all used. The tokens
+of the recorded token responses are made valid again when they are served,
+see renew_token.
+"""
+
+import base64
+import collections
+import datetime
+import io
+import json
+import threading
+
+import six
+from six.moves.urllib import parse as urlparse
+import urllib3
+
+from tempest.lib import exceptions
+
+RECORD = 'record'
+REPLAY = 'replay'
+MODES = (RECORD, REPLAY)
+
+# How long the tokens served back by a cassette are valid
+TOKEN_LIFETIME = datetime.timedelta(hours=1)
+
+# The headers which do not hold for the decoded body a cassette stores
+_BODY_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding')
+
+
+def normalize_url(url):
+    """The part of an URL requests are matched on
+
+    The host and port are kept, as the services of a cloud may have the
+    same paths, but the scheme is dropped. Duplicated slashes are merged
+    and the query parameters are sorted. The endpoints of the services
+    come from the recorded token responses, so only the identity URL has
+    to be the same when a cassette is replayed.
+    """
+    parsed = urlparse.urlsplit(url)
+    path = '/'.join(s for s in parsed.path.split('/') if s)
+    query = urlparse.urlencode(sorted(urlparse.parse_qsl(
+        parsed.query, keep_blank_values=True)))
+    url = '%s/%s' % (parsed.netloc, path)
+    return '%s?%s' % (url, query) if query else url
+
+
+def _is_token_request(method, url):
+    return method == 'POST' and url.split('?')[0].endswith('/tokens')
+
+
+def renew_token(data):
+    """The body of a token response, with a token valid for TOKEN_LIFETIME
+
+    The recorded tokens have usually expired when they are served back,
+    which would make the auth providers ask for a token before each
+    request. Only the expiry of the identity v2 and v3 token bodies is
+    changed, other bodies are returned as they are.
+    """
+    try:
+        body = json.loads(data.decode('utf-8'))
+    except ValueError:
+        return data
+    if not isinstance(body, dict):
+        return data
+    if 'token' in body:
+        token, expiry_key = body['token'], 'expires_at'
+    elif 'token' in body.get('access', {}):
+        token, expiry_key = body['access']['token'], 'expires'
+    else:
+        return data
+    expiry = datetime.datetime.utcnow() + TOKEN_LIFETIME
+    token[expiry_key] = expiry.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    return json.dumps(body).encode('utf-8')
+
+
+def _encode_body(data):
+    try:
+        return {'body': data.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'body_b64': base64.b64encode(data).decode('ascii')}
+
+
+def _decode_body(interaction):
+    if 'body_b64' in interaction:
+        return base64.b64decode(interaction['body_b64'])
+    return interaction.get('body', '').encode('utf-8')
+
+
+class Cassette(object):
+    """Record or replay the responses of ClosingHttp
+
+    Recorded interactions are appended to the file as soon as their
+    response is read, so that the workers of a concurrent run can record
+    into the same file. Streamed responses are not recorded.
+
+    :param str path: the cassette file
+    :param str mode: record, to append the interactions to the file, or
+                     replay, to serve the responses of the file
+    """
+
+    def __init__(self, path, mode=REPLAY):
+        if mode not in MODES:
+            raise ValueError('Unknown cassette mode %s, use one of %s' %
+                             (mode, ', '.join(MODES)))
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._file = None
+        self._interactions = collections.defaultdict(list)
+        self._played = collections.defaultdict(int)
+        if mode == RECORD:
+            self._file = io.open(path, 'a', encoding='utf-8')
+        else:
+            self._load()
+
+    @property
+    def recording(self):
+        return self.mode == RECORD
+
+    @property
+    def replaying(self):
+        return self.mode == REPLAY
+
+    def _load(self):
+        with io.open(self.path, encoding='utf-8') as cassette_file:
+            for line in cassette_file:
+                if not line.strip():
+                    continue
+                interaction = json.loads(line)
+                key = (interaction['method'], interaction['url'])
+                self._interactions[key].append(interaction)
+
+    def record(self, method, url, response, data):
+        """Write an interaction to the cassette
+
+        :param response: the urllib3 response
+        :param bytes data: the response body, decoded by urllib3
+        """
+        data = data or b''
+        # The body is stored decoded, the headers must not tell to decode
+        # or unchunk it on replay
+        headers = dict((name, value)
+                       for name, value in response.getheaders().items()
+                       if name.lower() not in _BODY_HEADERS)
+        headers['content-length'] = str(len(data))
+        interaction = {
+            'method': method.upper(),
+            'url': normalize_url(url),
+            'status': response.status,
+            'reason': response.reason,
+            'headers': headers,
+        }
+        interaction.update(_encode_body(data))
+        line = json.dumps(interaction, separators=(',', ':'),
+                          sort_keys=True)
+        with self._lock:
+            self._file.write(six.text_type(line) + u'\n')
+            self._file.flush()
+
+    def play(self, method, url, preload_content=True):
+        """The recorded response of a request
+
+        :raises CassetteMiss: if the request was not recorded
+        :return: an urllib3 response, whose body is read from memory
+        """
+        key = (method.upper(), normalize_url(url))
+        with self._lock:
+            interactions = self._interactions.get(key)
+            if not interactions:
+                raise exceptions.CassetteMiss(method=key[0], url=key[1],
+                                              path=self.path)
+            index = self._played[key]
+            if index < len(interactions) - 1:
+                self._played[key] = index + 1
+            interaction = interactions[index]
+        body = _decode_body(interaction)
+        headers = interaction['headers']
+        if _is_token_request(*key):
+            body = renew_token(body)
+            headers = dict((name, str(len(body))
+                            if name.lower() == 'content-length' else value)
+                           for name, value in headers.items())
+        return urllib3.response.HTTPResponse(
+            body=io.BytesIO(body),
+            headers=headers,
+            status=interaction['status'],
+            reason=interaction['reason'],
+            version=11,
+            preload_content=preload_content)
+
+    def rewind(self):
+        """Serve the recorded responses from the first one again"""
+        with self._lock:
+            self._played.clear()
+
+    def __len__(self):
+        return sum(len(i) for i in self._interactions.values())
+
+    def close(self):
+        if self._file is not None:
+            with self._lock:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,762 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""In-process fake of the OpenStack APIs used by the service clients
+
+FakeCloud is a WSGI application speaking the subset of the Keystone v2
+and v3, Nova, Neutron, Cinder and Glance v2 APIs used to create, show,
+list and delete the common resources: tokens, projects, users, roles,
+servers, flavors, networks, subnets, ports, routers, security groups,
+volumes, snapshots and images. Its state is kept in memory and the
+resources go through their usual state transitions, BUILD to ACTIVE for
+a server for instance, after configurable delays.
+
+It lets the client side of tempest - waiters, cleanups, credential
+providers, the stress driver - run at a high request rate without any
+cloud, to find where it stops scaling. It is not a functional fake of
+OpenStack: tokens are not checked, and the resources are neither scoped
+to projects nor checked for conflicts.
+
+The application can be served over HTTP with make_server, see also the
+``tempest fake-cloud`` command, or called in process by the service
+clients through a WSGITransport.
+"""
+
+import collections
+import datetime
+import io
+import json
+import re
+import threading
+import time
+import uuid
+from wsgiref import simple_server
+
+import six
+from six.moves import socketserver
+from six.moves.urllib import parse as urlparse
+import urllib3
+
+from tempest.lib.common import http
+
+# The status a resource is created in, and the one it then moves to after
+# the delay of the '<kind>:<status>' transition
+TRANSITIONS = {
+    'server': ('BUILD', 'ACTIVE'),
+    'volume': ('creating', 'available'),
+    'snapshot': ('creating', 'available'),
+}
+
+# The status of the resources deleted after the delay of the
+# '<kind>:DELETE' transition. Other resources keep their status until then.
+DELETING_STATUSES = {'volume': 'deleting', 'snapshot': 'deleting'}
+
+# The resources listed with a DELETED status once deleted, by the list
+# requests filtered with changes-since, as nova does
+LISTED_WHEN_DELETED = ('server',)
+
+# Fields of the resources listed without details
+BRIEF_FIELDS = {
+    'server': ('id', 'links', 'name'),
+    'flavor': ('id', 'links', 'name'),
+    'volume': ('id', 'links', 'name'),
+    'snapshot': ('id', 'links', 'name'),
+}
+
+# Query parameters of the list requests which are not attribute filters
+_PAGING_PARAMS = ('limit', 'marker', 'sort_key', 'sort_dir', 'fields',
+                  'all_tenants', 'changes-since')
+
+_STATUS_REASONS = {200: 'OK', 201: 'Created', 202: 'Accepted',
+                   204: 'No Content', 400: 'Bad Request',
+                   404: 'Not Found', 405: 'Method Not Allowed'}
+
+# kind: the type of the resources, which are shared by the collections of
+# a same kind, e.g. the v2 and v3 users
+# path: regex of the URL of the collection
+# key: the key of one resource in the request and response bodies, the
+# plural being the key of a list
+# wrapped: whether the bodies of one resource are wrapped in a {key: ...}
+# dict
+Collection = collections.namedtuple(
+    'Collection', ['kind', 'path', 'key', 'plural', 'create_code',
+                   'delete_code', 'wrapped'])
+
+COLLECTIONS = (
+    Collection('project', r'/identity/v2\.0/tenants', 'tenant', 'tenants',
+               200, 204, True),
+    Collection('user', r'/identity/v2\.0/users', 'user', 'users',
+               200, 204, True),
+    Collection('role', r'/identity/v2\.0/OS-KSADM/roles', 'role', 'roles',
+               200, 204, True),
+    Collection('project', r'/identity/v3/projects', 'project', 'projects',
+               201, 204, True),
+    Collection('user', r'/identity/v3/users', 'user', 'users',
+               201, 204, True),
+    Collection('role', r'/identity/v3/roles', 'role', 'roles',
+               201, 204, True),
+    Collection('domain', r'/identity/v3/domains', 'domain', 'domains',
+               201, 204, True),
+    Collection('server', r'/compute/v2\.1/servers', 'server', 'servers',
+               202, 204, True),
+    Collection('flavor', r'/compute/v2\.1/flavors', 'flavor', 'flavors',
+               200, 202, True),
+    Collection('network', r'/network/v2\.0/networks', 'network',
+               'networks', 201, 204, True),
+    Collection('subnet', r'/network/v2\.0/subnets', 'subnet', 'subnets',
+               201, 204, True),
+    Collection('port', r'/network/v2\.0/ports', 'port', 'ports',
+               201, 204, True),
+    Collection('router', r'/network/v2\.0/routers', 'router', 'routers',
+               201, 204, True),
+    Collection('security_group', r'/network/v2\.0/security-groups',
+               'security_group', 'security_groups', 201, 204, True),
+    Collection('volume', r'/volume/v[12]/[^/]+/volumes', 'volume',
+               'volumes', 202, 202, True),
+    Collection('snapshot', r'/volume/v[12]/[^/]+/snapshots', 'snapshot',
+               'snapshots', 202, 202, True),
+    Collection('image', r'/image/v2/images', 'image', 'images',
+               201, 204, False),
+)
+
+FLAVORS = (
+    ('1', 'm1.tiny', 512, 1, 1),
+    ('2', 'm1.small', 2048, 1, 20),
+    ('3', 'm1.medium', 4096, 2, 40),
+    ('42', 'm1.nano', 64, 1, 0),
+    ('84', 'm1.micro', 128, 1, 0),
+)
+
+
+def _isotime(timestamp, date_format='%Y-%m-%dT%H:%M:%SZ'):
+    return datetime.datetime.utcfromtimestamp(timestamp).strftime(
+        date_format)
+
+
+class _Resource(object):
+
+    __slots__ = ('doc', 'pending')
+
+    def __init__(self, doc, pending=None):
+        self.doc = doc
+        # (status, due time) of the next transition, a None status for a
+        # deletion
+        self.pending = pending
+
+
+class FakeCloud(object):
+    """WSGI application faking the common OpenStack APIs
+
+    The transitions are applied when the resources are next read, no
+    thread is involved.
+
+    :param str url: the URL the application is reached at, used in the
+                    service catalog
+    :param dict delays: seconds taken by the state transitions, keyed by
+                        '<kind>:<status>', e.g. 'server:BUILD' for the BUILD
+                        to ACTIVE transition of servers, or
+                        '<kind>:DELETE' for the deletions
+    :param float default_delay: seconds taken by the other transitions
+    :param str region: the region of the endpoints of the catalog
+    """
+
+    def __init__(self, url='http://127.0.0.1:8080', delays=None,
+                 default_delay=0, region='RegionOne'):
+        self.url = url.rstrip('/')
+        self.delays = dict(delays or {})
+        self.default_delay = default_delay
+        self.region = region
+        self._lock = threading.Lock()
+        self._resources = collections.defaultdict(collections.OrderedDict)
+        self._deleted = collections.defaultdict(collections.OrderedDict)
+        # token: (user, project) documents
+        self._tokens = {}
+        self._grants = collections.defaultdict(set)
+        self._routes = self._build_routes()
+        for flavor_id, name, ram, vcpus, disk in FLAVORS:
+            self._resources['flavor'][flavor_id] = _Resource(
+                self._flavor(flavor_id, name, ram, vcpus, disk))
+
+    def _build_routes(self):
+        routes = [
+            ('POST', r'/identity/v2\.0/tokens', self._v2_token, ()),
+            ('POST', r'/identity/v3/auth/tokens', self._v3_token, ()),
+            ('PUT', r'/identity/v2\.0/tenants/(?P<project>[^/]+)/users/'
+                    r'(?P<user>[^/]+)/roles/OS-KSADM/(?P<role>[^/]+)',
+             self._grant_role, ()),
+            ('PUT', r'/identity/v3/projects/(?P<project>[^/]+)/users/'
+                    r'(?P<user>[^/]+)/roles/(?P<role>[^/]+)',
+             self._grant_role, ()),
+            ('GET', r'/identity/v2\.0/tenants/(?P<project>[^/]+)/users/'
+                    r'(?P<user>[^/]+)/roles', self._list_grants, ()),
+            ('GET', r'/identity/v3/projects/(?P<project>[^/]+)/users/'
+                    r'(?P<user>[^/]+)/roles', self._list_grants, ()),
+            ('PUT', r'/network/v2\.0/routers/(?P<id>[^/]+)/'
+                    r'(?P<action>add|remove)_router_interface',
+             self._router_interface, ()),
+            ('PUT', r'/image/v2/images/(?P<id>[^/]+)/file',
+             self._upload_image, ()),
+        ]
+        for collection in COLLECTIONS:
+            path = '(?P<collection_path>%s)' % collection.path
+            member = path + r'/(?P<id>[^/]+)'
+            routes.extend([
+                ('POST', path, self._create, (collection,)),
+                ('GET', path + r'(?P<detail>/detail)?', self._list,
+                 (collection,)),
+                ('GET', member, self._show, (collection,)),
+                ('PUT', member, self._update, (collection,)),
+                ('PATCH', member, self._update, (collection,)),
+                ('DELETE', member, self._delete, (collection,)),
+            ])
+        return [(method, re.compile(regex + '$'), handler, args)
+                for method, regex, handler, args in routes]
+
+    # Catalog and tokens
+
+    def catalog(self, project_id, identity_version='v3'):
+        """The endpoints of the services, as (type, name, URL) tuples"""
+        return (
+            ('identity', 'keystone',
+             '%s/identity/%s' % (self.url, identity_version)),
+            ('compute', 'nova', self.url + '/compute/v2.1'),
+            ('network', 'neutron', self.url + '/network'),
+            ('volume', 'cinder', '%s/volume/v1/%s' % (self.url, project_id)),
+            ('volumev2', 'cinderv2', '%s/volume/v2/%s' % (self.url,
+                                                          project_id)),
+            ('image', 'glance', self.url + '/image'),
+        )
+
+    def _named(self, kind, name, **fields):
+        """The resource named name, created if needed"""
+        for resource in self._resources[kind].values():
+            if resource.doc.get('name') == name:
+                return resource.doc
+        doc = dict(fields, name=name,
+                   id=uuid.uuid5(uuid.NAMESPACE_OID,
+                                 '%s:%s' % (kind, name)).hex)
+        self._resources[kind][doc['id']] = _Resource(doc)
+        return doc
+
+    def _issue_token(self, user_name, project_name):
+        with self._lock:
+            user = self._named('user', user_name, enabled=True,
+                               domain_id='default')
+            project = self._named('project', project_name or 'admin',
+                                  enabled=True, domain_id='default',
+                                  description='')
+            token = uuid.uuid4().hex
+            self._tokens[token] = (user, project)
+            roles = [{'id': role_id, 'name': self._role_name(role_id)}
+                     for role_id in self._grants[(project['id'],
+                                                  user['id'])]]
+        return token, user, project, roles
+
+    def _role_name(self, role_id):
+        role = self._resources['role'].get(role_id)
+        return role.doc['name'] if role else role_id
+
+    def _v2_token(self, request):
+        auth = request.body.get('auth', {})
+        credentials = auth.get('passwordCredentials', {})
+        token, user, project, roles = self._issue_token(
+            credentials.get('username'), auth.get('tenantName'))
+        now = time.time()
+        catalog = [
+            {'type': service_type, 'name': name,
+             'endpoints': [{'region': self.region, 'publicURL': url,
+                            'internalURL': url, 'adminURL': url}]}
+            for service_type, name, url in self.catalog(project['id'],
+                                                        'v2.0')]
+        return 200, {'access': {
+            'token': {'id': token, 'issued_at': _isotime(now),
+                      'expires': _isotime(now + 86400),
+                      'tenant': {'id': project['id'],
+                                 'name': project['name']}},
+            'user': {'id': user['id'], 'name': user['name'],
+                     'roles': [{'name': r['name']} for r in roles]},
+            'serviceCatalog': catalog,
+            'metadata': {'roles': [r['id'] for r in roles]}}}
+
+    def _v3_token(self, request):
+        auth = request.body.get('auth', {})
+        user = auth.get('identity', {}).get('password', {}).get('user', {})
+        project = auth.get('scope', {}).get('project', {})
+        token, user, project, roles = self._issue_token(
+            user.get('name'), project.get('name'))
+        now = time.time()
+        date_format = '%Y-%m-%dT%H:%M:%S.%fZ'
+        catalog = [
+            {'type': service_type, 'name': name, 'id': name,
+             'endpoints': [{'id': '%s-%s' % (name, interface),
+                            'interface': interface, 'region': self.region,
+                            'region_id': self.region, 'url': url}
+                           for interface in ('public', 'internal', 'admin')]}
+            for service_type, name, url in self.catalog(project['id'])]
+        body = {'token': {
+            'methods': ['password'],
+            'issued_at': _isotime(now, date_format),
+            'expires_at': _isotime(now + 86400, date_format),
+            'user': {'id': user['id'], 'name': user['name'],
+                     'domain': {'id': 'default', 'name': 'Default'}},
+            'project': {'id': project['id'], 'name': project['name'],
+                        'domain': {'id': 'default', 'name': 'Default'}},
+            'roles': roles,
+            'catalog': catalog}}
+        return 201, body, {'X-Subject-Token': token}
+
+    def _grant_role(self, request, project, user, role):
+        with self._lock:
+            self._grants[(project, user)].add(role)
+        if request.path.startswith('/identity/v3'):
+            return 204, None
+        return 200, {'role': {'id': role, 'name': self._role_name(role)}}
+
+    def _list_grants(self, request, project, user):
+        with self._lock:
+            roles = [{'id': role_id, 'name': self._role_name(role_id)}
+                     for role_id in self._grants[(project, user)]]
+        return 200, {'roles': roles}
+
+    # Resource documents
+
+    def _links(self, path, resource_id):
+        href = '%s%s/%s' % (self.url, path, resource_id)
+        return [{'rel': 'self', 'href': href},
+                {'rel': 'bookmark', 'href': href}]
+
+    def _flavor(self, flavor_id, name, ram, vcpus, disk):
+        return {'id': flavor_id, 'name': name, 'ram': ram, 'vcpus': vcpus,
+                'disk': disk, 'swap': '', 'rxtx_factor': 1.0,
+                'OS-FLV-EXT-DATA:ephemeral': 0,
+                'OS-FLV-DISABLED:disabled': False,
+                'os-flavor-access:is_public': True,
+                'links': self._links('/compute/v2.1/flavors', flavor_id)}
+
+    def _new_doc(self, request, collection, fields):
+        resource_id = fields.get('id') or str(uuid.uuid4())
+        user, project = self._tokens.get(request.token, ({}, {}))
+        now = _isotime(time.time())
+        doc = dict(fields, id=resource_id)
+        kind = collection.kind
+        if kind in ('project', 'user', 'role', 'domain'):
+            doc.setdefault('enabled', True)
+            if kind != 'role':
+                doc.setdefault('domain_id', 'default')
+            return doc
+        tenant_id = fields.get('tenant_id') or project.get('id', '')
+        doc.setdefault('name', '')
+        links = self._links(request.collection_path, resource_id)
+        if kind == 'server':
+            image_id = fields.get('imageRef', '')
+            flavor_id = str(fields.get('flavorRef', ''))
+            doc = {
+                'id': resource_id, 'name': fields.get('name', ''),
+                'tenant_id': tenant_id, 'user_id': user.get('id', ''),
+                'created': now, 'updated': now, 'hostId': '',
+                'progress': 0, 'accessIPv4': '', 'accessIPv6': '',
+                'metadata': fields.get('metadata', {}),
+                'image': {'id': image_id,
+                          'links': self._links('/compute/v2.1/images',
+                                               image_id)},
+                'flavor': {'id': flavor_id,
+                           'links': self._links('/compute/v2.1/flavors',
+                                                flavor_id)},
+                'addresses': {}, 'key_name': fields.get('key_name'),
+                'security_groups': fields.get('security_groups',
+                                              [{'name': 'default'}]),
+                'OS-EXT-AZ:availability_zone': fields.get(
+                    'availability_zone', 'nova'),
+                'OS-EXT-STS:task_state': None,
+                'OS-EXT-STS:vm_state': 'active',
+                'OS-EXT-STS:power_state': 1,
+                'OS-DCF:diskConfig': 'MANUAL',
+                'os-extended-volumes:volumes_attached': [],
+                'config_drive': '',
+                'links': links}
+        elif kind in ('volume', 'snapshot'):
+            doc.update({'created_at': now, 'updated': now,
+                        'size': fields.get('size', 1),
+                        'metadata': fields.get('metadata', {}),
+                        'links': links})
+            if kind == 'volume':
+                doc.update({'attachments': [], 'bootable': 'false',
+                            'availability_zone': fields.get(
+                                'availability_zone', 'nova'),
+                            'os-vol-tenant-attr:tenant_id': tenant_id})
+        elif kind == 'image':
+            doc.update({'status': 'queued', 'created_at': now,
+                        'updated_at': now, 'owner': tenant_id,
+                        'visibility': fields.get('visibility', 'private'),
+                        'tags': fields.get('tags', []), 'size': None,
+                        'file': '/v2/images/%s/file' % resource_id,
+                        'self': '/v2/images/%s' % resource_id})
+        else:
+            # neutron resources
+            doc.setdefault('tenant_id', tenant_id)
+            doc.setdefault('admin_state_up', True)
+            doc.setdefault('status', 'ACTIVE')
+            if kind == 'network':
+                doc.setdefault('subnets', [])
+                doc.setdefault('shared', False)
+                doc.setdefault('router:external', False)
+            elif kind == 'subnet':
+                doc.setdefault('ip_version', 4)
+                doc.setdefault('gateway_ip', None)
+                doc.setdefault('enable_dhcp', True)
+                doc.setdefault('allocation_pools', [])
+                doc.setdefault('dns_nameservers', [])
+                doc.setdefault('host_routes', [])
+                network = self._resources['network'].get(
+                    doc.get('network_id'))
+                if network is not None:
+                    network.doc['subnets'].append(resource_id)
+            elif kind == 'port':
+                mac = uuid.uuid4().hex
+                doc.setdefault('mac_address', 'fa:16:3e:%s:%s:%s' % (
+                    mac[0:2], mac[2:4], mac[4:6]))
+                doc.setdefault('fixed_ips', [])
+                doc.setdefault('device_id', '')
+                doc.setdefault('device_owner', '')
+            elif kind == 'router':
+                doc.setdefault('external_gateway_info', None)
+            elif kind == 'security_group':
+                doc.setdefault('description', '')
+                doc.setdefault('security_group_rules', [])
+        return doc
+
+    def _delay(self, kind, status):
+        return self.delays.get('%s:%s' % (kind, status), self.default_delay)
+
+    def _apply_transitions(self, kind, resource_id, resource, now):
+        """Bring a resource to its current state
+
+        :return: the resource, or None if it was deleted
+        """
+        while resource.pending is not None and resource.pending[1] <= now:
+            status, due = resource.pending
+            resource.pending = None
+            if status is None:
+                self._remove(kind, resource_id, resource, due)
+                return None
+            resource.doc['status'] = status
+            resource.doc['updated'] = _isotime(due)
+        return resource
+
+    def _remove(self, kind, resource_id, resource, now):
+        self._resources[kind].pop(resource_id, None)
+        if kind in LISTED_WHEN_DELETED:
+            resource.doc['status'] = 'DELETED'
+            resource.doc['updated'] = _isotime(now)
+            self._deleted[kind][resource_id] = resource.doc
+
+    def _get(self, kind, resource_id, now):
+        resource = self._resources[kind].get(resource_id)
+        if resource is None:
+            return None
+        return self._apply_transitions(kind, resource_id, resource, now)
+
+    # Collection handlers
+
+    def _body(self, request, collection):
+        if collection.wrapped:
+            return request.body.get(collection.key, {})
+        return request.body
+
+    def _wrap(self, collection, doc):
+        if collection.wrapped:
+            return {collection.key: doc}
+        return doc
+
+    def _create(self, request, collection):
+        now = time.time()
+        with self._lock:
+            doc = self._new_doc(request, collection,
+                                self._body(request, collection))
+            pending = None
+            if collection.kind in TRANSITIONS:
+                status, next_status = TRANSITIONS[collection.kind]
+                doc['status'] = status
+                pending = (next_status,
+                           now + self._delay(collection.kind, status))
+            self._resources[collection.kind][doc['id']] = _Resource(
+                doc, pending)
+            doc = dict(doc)
+        if collection.kind == 'server':
+            doc = {'id': doc['id'], 'links': doc['links'],
+                   'adminPass': uuid.uuid4().hex[:12],
+                   'OS-DCF:diskConfig': 'MANUAL',
+                   'security_groups': doc['security_groups']}
+        return collection.create_code, self._wrap(collection, doc)
+
+    def _matches(self, doc, filters, changes_since):
+        if changes_since and doc.get('updated', '') < changes_since:
+            return False
+        for key, value in filters.items():
+            if key in doc and str(doc[key]) != value:
+                return False
+        return True
+
+    def _list(self, request, collection, detail=None):
+        filters = dict((key, value) for key, value in request.query.items()
+                       if key not in _PAGING_PARAMS)
+        changes_since = request.query.get('changes-since')
+        now = time.time()
+        kind = collection.kind
+        with self._lock:
+            docs = []
+            for resource_id, resource in list(
+                    self._resources[kind].items()):
+                if self._apply_transitions(kind, resource_id, resource,
+                                           now) is None:
+                    continue
+                if self._matches(resource.doc, filters, changes_since):
+                    docs.append(resource.doc)
+            if changes_since:
+                docs.extend(doc for doc in self._deleted[kind].values()
+                            if self._matches(doc, filters, changes_since))
+            brief = BRIEF_FIELDS.get(kind)
+            if brief and not detail:
+                docs = [dict((key, doc.get(key)) for key in brief)
+                        for doc in docs]
+            else:
+                docs = [dict(doc) for doc in docs]
+        return 200, {collection.plural: docs}
+
+    def _show(self, request, collection, id):
+        with self._lock:
+            resource = self._get(collection.kind, id, time.time())
+            if resource is None:
+                return self._not_found(collection, id)
+            return 200, self._wrap(collection, dict(resource.doc))
+
+    def _update(self, request, collection, id):
+        now = time.time()
+        with self._lock:
+            resource = self._get(collection.kind, id, now)
+            if resource is None:
+                return self._not_found(collection, id)
+            body = request.body
+            if request.method == 'PATCH' and isinstance(body, list):
+                # glance v2 JSON patch
+                for change in body:
+                    path = change.get('path', '').lstrip('/')
+                    if change.get('op') == 'remove':
+                        resource.doc.pop(path, None)
+                    else:
+                        resource.doc[path] = change.get('value')
+            else:
+                resource.doc.update(self._body(request, collection))
+            resource.doc['updated'] = _isotime(now)
+            return 200, self._wrap(collection, dict(resource.doc))
+
+    def _delete(self, request, collection, id):
+        now = time.time()
+        kind = collection.kind
+        with self._lock:
+            resource = self._get(kind, id, now)
+            if resource is None:
+                return self._not_found(collection, id)
+            delay = self._delay(kind, 'DELETE')
+            if delay:
+                if kind in DELETING_STATUSES:
+                    resource.doc['status'] = DELETING_STATUSES[kind]
+                resource.pending = (None, now + delay)
+            else:
+                self._remove(kind, id, resource, now)
+        return collection.delete_code, None
+
+    def _router_interface(self, request, id, action):
+        with self._lock:
+            router = self._get('router', id, time.time())
+            if router is None:
+                return 404, {'NeutronError': {
+                    'type': 'RouterNotFound',
+                    'message': 'Router %s could not be found' % id}}
+            subnet_id = request.body.get('subnet_id')
+            port_id = request.body.get('port_id')
+            ports = self._resources['port']
+            if action == 'add':
+                if port_id is None:
+                    port_id = str(uuid.uuid4())
+                    ports[port_id] = _Resource({
+                        'id': port_id, 'status': 'ACTIVE',
+                        'device_id': id,
+                        'device_owner': 'network:router_interface',
+                        'fixed_ips': [{'subnet_id': subnet_id}],
+                        'tenant_id': router.doc.get('tenant_id', '')})
+                else:
+                    port = ports.get(port_id)
+                    if port is not None:
+                        port.doc.update(
+                            device_id=id,
+                            device_owner='network:router_interface')
+            else:
+                for candidate_id, port in list(ports.items()):
+                    if (port.doc.get('device_id') == id and
+                            (candidate_id == port_id or
+                             {'subnet_id': subnet_id} in
+                             port.doc.get('fixed_ips', []))):
+                        port_id = candidate_id
+                        del ports[candidate_id]
+        return 200, {'id': id, 'subnet_id': subnet_id, 'port_id': port_id,
+                     'tenant_id': router.doc.get('tenant_id', '')}
+
+    def _upload_image(self, request, id):
+        now = time.time()
+        with self._lock:
+            resource = self._get('image', id, now)
+            if resource is None:
+                return 404, {'message': 'Image %s not found' % id}
+            resource.doc['status'] = 'saving'
+            resource.doc['size'] = len(request.raw_body)
+            resource.pending = ('active',
+                                now + self._delay('image', 'saving'))
+        return 204, None
+
+    @staticmethod
+    def _not_found(collection, resource_id):
+        return 404, {'itemNotFound': {
+            'code': 404,
+            'message': '%s %s could not be found' % (collection.key,
+                                                     resource_id)}}
+
+    # WSGI
+
+    def __call__(self, environ, start_response):
+        request = _Request(environ)
+        status, body, headers = 404, {'itemNotFound': {
+            'code': 404,
+            'message': 'No API at %s' % request.path}}, {}
+        for method, regex, handler, args in self._routes:
+            match = regex.match(request.path)
+            if match is None:
+                continue
+            if method != request.method:
+                status, body = 405, None
+                continue
+            kwargs = dict((key, value)
+                          for key, value in match.groupdict().items()
+                          if value is not None)
+            request.collection_path = kwargs.pop('collection_path',
+                                                 request.path)
+            result = handler(request, *args, **kwargs)
+            status, body = result[:2]
+            headers = result[2] if len(result) > 2 else {}
+            break
+        data = b'' if body is None else json.dumps(body).encode('utf-8')
+        headers = dict(headers, **{'Content-Type': 'application/json',
+                                   'Content-Length': str(len(data))})
+        start_response('%d %s' % (status, _STATUS_REASONS.get(status, '')),
+                       list(headers.items()))
+        return [data]
+
+
+class _Request(object):
+
+    def __init__(self, environ):
+        self.method = environ['REQUEST_METHOD']
+        self.path = re.sub('/+', '/', environ.get('PATH_INFO', '/'))
+        if len(self.path) > 1:
+            self.path = self.path.rstrip('/')
+        self.query = dict(urlparse.parse_qsl(environ.get('QUERY_STRING',
+                                                         '')))
+        self.token = environ.get('HTTP_X_AUTH_TOKEN')
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+        self.raw_body = environ['wsgi.input'].read(length) if length else b''
+        self.collection_path = self.path
+        content_type = environ.get('CONTENT_TYPE', '')
+        self.body = {}
+        if self.raw_body and 'octet-stream' not in content_type:
+            try:
+                self.body = json.loads(self.raw_body.decode('utf-8'))
+            except ValueError:
+                pass
+
+
+class WSGITransport(object):
+    """Call a WSGI application in process instead of sending requests
+
+    A drop-in replacement of ClosingHttp, to set as the http_obj of the
+    service clients.
+
+    :param app: the WSGI application, e.g. a FakeCloud
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def request(self, url, method, headers=None, body=None, stream=False,
+                **kwargs):
+        parsed = urlparse.urlsplit(url)
+        if isinstance(body, six.text_type):
+            body = body.encode('utf-8')
+        body = body or b''
+        environ = {
+            'REQUEST_METHOD': method.upper(),
+            'PATH_INFO': urlparse.unquote(parsed.path),
+            'QUERY_STRING': parsed.query,
+            'SERVER_NAME': parsed.hostname or 'localhost',
+            'SERVER_PORT': str(parsed.port or 80),
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.url_scheme': parsed.scheme or 'http',
+        }
+        for name, value in (headers or {}).items():
+            name = name.upper().replace('-', '_')
+            if name == 'CONTENT_TYPE':
+                environ[name] = value
+            else:
+                environ['HTTP_' + name] = value
+        started = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            started['status'] = status
+            started['headers'] = response_headers
+
+        data = b''.join(self.app(environ, start_response))
+        code, reason = started['status'].split(' ', 1)
+        response = urllib3.response.HTTPResponse(
+            body=io.BytesIO(data), headers=dict(started['headers']),
+            status=int(code), reason=reason, version=11,
+            preload_content=not stream)
+        if stream:
+            return http.Response(response, url), http.StreamingBody(response)
+        return http.Response(response, url), response.data
+
+
+class _ThreadingWSGIServer(socketserver.ThreadingMixIn,
+                           simple_server.WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(simple_server.WSGIRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+def make_server(app, host='127.0.0.1', port=8080):
+    """A threaded HTTP server of a WSGI application
+
+    The URL of a FakeCloud is set to the one of the server, so that a port
+    of 0 can be used to bind a free port.
+    """
+    server = simple_server.make_server(host, port, app,
+                                       server_class=_ThreadingWSGIServer,
+                                       handler_class=_QuietHandler)
+    if isinstance(app, FakeCloud):
+        app.url = 'http://%s:%s' % server.server_address[:2]
+    return server
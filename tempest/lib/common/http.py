@@ -13,12 +13,336 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import errno
+import socket
+import threading
+import time
+
+import six
+from six.moves import http_client
 import urllib3
 
+# Number of connections kept open per host when no per-host size is given
+DEFAULT_POOL_MAXSIZE = 10
+
+# Seconds a pooled connection may stay idle before it is closed on checkout
+DEFAULT_IDLE_TIMEOUT = 60
+
+# Number of per endpoint pools a pool manager keeps before closing the least
+# recently used one. Large enough for every endpoint of a cloud catalog.
+DEFAULT_NUM_POOLS = 100
+
+# Size of the chunks yielded when iterating over a streamed response body
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Tracks, per thread, whether the last connection checked out of a pool
+# was an already established (reused) one.
+_checkout = threading.local()
+
+# Cassette used by the ClosingHttp instances built without one, see
+# use_cassette
+_default_cassette = None
+
+
+def _is_stale_socket_error(error):
+    """Whether a ProtocolError means the peer closed an idle connection"""
+    reason = error.args[1] if len(error.args) > 1 else None
+    if isinstance(reason, http_client.BadStatusLine):
+        # RemoteDisconnected on python 3, empty status line on python 2
+        return True
+    if isinstance(reason, socket.error):
+        return reason.errno in (errno.ECONNRESET, errno.EPIPE)
+    return False
+
+
+class ConnectionStats(object):
+    """Thread safe counters describing connection usage
+
+    One instance is kept for every endpoint a pool manager talks to, and
+    one for the pool manager as a whole; counters of an endpoint are
+    added to the ``parent`` counters as well.
+
+    :ivar requests: number of connections checked out of the pools
+    :ivar reused: checkouts which got an already established connection
+    :ivar handshakes: checkouts which had to open a new TCP (and TLS)
+                      connection
+    :ivar reaped: idle connections closed because of the idle timeout
+    :ivar stale_retries: requests sent again after a stale keep-alive socket
+    :ivar waits: checkouts which found every pooled connection in use
+    :ivar in_use: connections currently checked out of the pools
+    :ivar bytes_sent: request body bytes sent
+    :ivar bytes_received: response body bytes received
+    """
+
+    FIELDS = ('requests', 'reused', 'handshakes', 'reaped', 'stale_retries',
+              'waits', 'in_use', 'bytes_sent', 'bytes_received')
+
+    def __init__(self, parent=None):
+        self._lock = threading.Lock()
+        self.parent = parent
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            for field in self.FIELDS:
+                setattr(self, field, 0)
+
+    def incr(self, field, value=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + value)
+        if self.parent is not None:
+            self.parent.incr(field, value)
+
+    def as_dict(self):
+        with self._lock:
+            return dict((field, getattr(self, field)) for field in self.FIELDS)
+
+    def __str__(self):
+        return str(self.as_dict())
+
+
+def _body_length(body):
+    if isinstance(body, (six.binary_type, six.text_type)):
+        return len(body)
+    return 0
+
+
+# Returned by _body_position for the bodies which can be sent again as is
+_REPLAYABLE = object()
+
+
+def _body_position(body):
+    """Where to rewind a request body to before sending it again
+
+    :return: _REPLAYABLE for no body or a bytes or text body, the current
+             offset of a seekable file, None for the bodies which cannot be
+             sent again, such as generators or pipes
+    """
+    if body is None or isinstance(body, (six.binary_type, six.text_type)):
+        return _REPLAYABLE
+    try:
+        return body.tell()
+    except (AttributeError, IOError, OSError):
+        return None
+
+
+class _KeepAlivePoolMixin(object):
+    """Adds idle connection reaping and usage accounting to urllib3 pools
+
+    ``idle_timeout`` and ``stats`` are set by ClosingHttp when the pool is
+    created.
+    """
+
+    idle_timeout = None
+    stats = None
+
+    def _get_conn(self, timeout=None):
+        if (self.stats is not None and self.pool is not None and
+                self.pool.empty()):
+            self.stats.incr('waits')
+        conn = super(_KeepAlivePoolMixin, self)._get_conn(timeout=timeout)
+        last_used = getattr(conn, 'tempest_last_used', None)
+        if (self.idle_timeout is not None and last_used is not None and
+                conn.sock is not None and
+                time.time() - last_used > self.idle_timeout):
+            conn.close()
+            if self.stats is not None:
+                self.stats.incr('reaped')
+        reused = conn.sock is not None
+        _checkout.reused = reused
+        if self.stats is not None:
+            self.stats.incr('requests')
+            self.stats.incr('in_use')
+            self.stats.incr('reused' if reused else 'handshakes')
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn.tempest_last_used = time.time()
+        if self.stats is not None:
+            self.stats.incr('in_use', -1)
+        super(_KeepAlivePoolMixin, self)._put_conn(conn)
+
+    def open_sockets(self):
+        """Number of connected sockets, idle or in use, of this pool"""
+        idle = 0
+        if self.pool is not None:
+            idle = len([conn for conn in list(self.pool.queue)
+                        if conn is not None and conn.sock is not None])
+        in_use = self.stats.in_use if self.stats is not None else 0
+        return idle + in_use
+
+
+class KeepAliveHTTPConnectionPool(_KeepAlivePoolMixin,
+                                  urllib3.connectionpool.HTTPConnectionPool):
+    pass
+
+
+class KeepAliveHTTPSConnectionPool(_KeepAlivePoolMixin,
+                                   urllib3.connectionpool.HTTPSConnectionPool):
+    pass
+
+
+class StreamingBody(object):
+    """File-like access to a response body which is read on demand
+
+    Returned instead of the body data by ClosingHttp.request when streaming
+    is requested. The pooled connection is given back to its pool once the
+    body has been read to the end, or when close() is called.
+
+    :param response: the urllib3 response, built without preloading content
+    :param stats: ConnectionStats used to count the bytes received
+    """
+
+    def __init__(self, response, stats=None):
+        self._response = response
+        self._stats = stats
+        self._buffer = b''
+        self._closed = False
+
+    def _read(self, amt=None):
+        if self._closed:
+            return b''
+        data = self._response.read(amt)
+        if self._stats is not None:
+            self._stats.incr('bytes_received', len(data))
+        if amt is None or not data:
+            self._response.release_conn()
+            self._closed = True
+        return data
+
+    def peek(self, amt):
+        """Return up to amt bytes from the start of the unread body
+
+        The bytes are buffered and returned again by the next reads.
+        """
+        while len(self._buffer) < amt and not self._closed:
+            data = self._read(amt - len(self._buffer))
+            if not data:
+                break
+            self._buffer += data
+        return self._buffer[:amt]
+
+    def read(self, amt=None):
+        """Read and return up to amt bytes, or the rest of the body"""
+        if self._buffer:
+            if amt is None:
+                data = self._buffer + self._read()
+                self._buffer = b''
+            else:
+                data = self._buffer[:amt]
+                self._buffer = self._buffer[amt:]
+                if len(data) < amt:
+                    data += self._read(amt - len(data))
+            return data
+        return self._read(amt)
+
+    def iter_chunks(self, chunk_size=STREAM_CHUNK_SIZE):
+        """Iterate over the body in chunks of at most chunk_size bytes"""
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def __iter__(self):
+        return self.iter_chunks()
+
+    def close(self):
+        """Stop reading the body and release the connection
+
+        A connection whose response was not read to the end can not be
+        reused, so it is closed before being given back to the pool.
+        """
+        self._buffer = b''
+        if self._closed:
+            return
+        self._closed = True
+        self._response.close()
+        self._response.release_conn()
+
+    @property
+    def closed(self):
+        return self._closed and not self._buffer
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __bool__(self):
+        return bool(self.peek(1))
+
+    __nonzero__ = __bool__
+
+    def __str__(self):
+        return '<StreamingBody: %s>' % (
+            'closed' if self.closed else 'open')
+
+
+def use_cassette(cassette):
+    """Record or replay the requests of every ClosingHttp with a cassette
+
+    :param cassette: a tempest.lib.common.cassette.Cassette, used by the
+                     ClosingHttp instances not given a cassette of their
+                     own, or None to send the requests again
+    """
+    global _default_cassette
+    _default_cassette = cassette
+
+
+class Response(dict):
+    """The status and lower case headers of a response to url"""
+
+    def __init__(self, info, url):
+        for key, value in info.getheaders().items():
+            self[key.lower()] = value
+        self.status = info.status
+        self['status'] = str(self.status)
+        self.reason = info.reason
+        self.version = info.version
+        self['content-location'] = url
+
 
 class ClosingHttp(urllib3.poolmanager.PoolManager):
+    """urllib3 pool manager used by the tempest service clients
+
+    Connections are kept alive and reused between requests by default.
+    Service clients do not build their own instance, they borrow a shared
+    one from the process wide TRANSPORTS registry (see get_transport).
+
+    :param bool disable_ssl_certificate_validation: Set to true to disable ssl
+                                                    certificate validation
+    :param str ca_certs: File containing the CA Bundle to use in verifying a
+                         TLS server cert
+    :param bool close_connections: Send ``connection: close`` on every request
+                                   so that no connection is ever reused
+    :param int pool_maxsize: Number of connections kept open for each host
+    :param dict pool_maxsize_by_host: Per host override of pool_maxsize, keys
+                                      are host names, values are pool sizes
+    :param int idle_timeout: Seconds after which an idle pooled connection is
+                             closed instead of being reused. None disables
+                             reaping.
+    :param bool retry_stale: Send a request once more on a new connection if
+                             a reused keep-alive connection was found closed
+                             by the server
+    :param bool pool_block: Wait for a free connection when all the pooled
+                            connections of a host are in use, instead of
+                            opening an extra, non pooled, one
+    :param cassette: a Cassette recording the responses, or serving them
+                     back instead of sending the requests; by default the
+                     one given to use_cassette, if any
+
+    request() returns a (response, body) tuple. When called with
+    ``stream=True`` the body is a StreamingBody instead of the data.
+    """
+
     def __init__(self, disable_ssl_certificate_validation=False,
-                 ca_certs=None):
+                 ca_certs=None, close_connections=False,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_maxsize_by_host=None,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, retry_stale=True,
+                 pool_block=False, cassette=None):
         kwargs = {}
 
         if disable_ssl_certificate_validation:
@@ -29,27 +353,201 @@ class ClosingHttp(urllib3.poolmanager.PoolManager):
             kwargs['cert_reqs'] = 'CERT_REQUIRED'
             kwargs['ca_certs'] = ca_certs
 
-        super(ClosingHttp, self).__init__(**kwargs)
+        kwargs['maxsize'] = pool_maxsize
+        kwargs['block'] = pool_block
 
-    def request(self, url, method, *args, **kwargs):
+        super(ClosingHttp, self).__init__(num_pools=DEFAULT_NUM_POOLS,
+                                          **kwargs)
+        self.close_connections = close_connections
+        self.pool_maxsize_by_host = dict(pool_maxsize_by_host or {})
+        self.idle_timeout = idle_timeout
+        self.retry_stale = retry_stale
+        self.cassette = cassette
+        self.stats = ConnectionStats()
+        self._endpoint_stats = {}
+        self._endpoint_stats_lock = threading.Lock()
+        self.pool_classes_by_scheme = {
+            'http': KeepAliveHTTPConnectionPool,
+            'https': KeepAliveHTTPSConnectionPool,
+        }
+
+    def _get_endpoint_stats(self, scheme, host, port):
+        key = (scheme, host, port)
+        with self._endpoint_stats_lock:
+            if key not in self._endpoint_stats:
+                self._endpoint_stats[key] = ConnectionStats(parent=self.stats)
+            return self._endpoint_stats[key]
+
+    def _get_url_stats(self, url):
+        parsed = urllib3.util.parse_url(url)
+        scheme = (parsed.scheme or 'http').lower()
+        port = parsed.port or urllib3.connectionpool.port_by_scheme.get(
+            scheme, 80)
+        return self._get_endpoint_stats(scheme, parsed.host, port)
 
-        class Response(dict):
-            def __init__(self, info):
-                for key, value in info.getheaders().items():
-                    self[key.lower()] = value
-                self.status = info.status
-                self['status'] = str(self.status)
-                self.reason = info.reason
-                self.version = info.version
-                self['content-location'] = url
+    def endpoint_stats(self):
+        """Usage counters of every endpoint this pool manager talked to
 
-        original_headers = kwargs.get('headers', {})
-        new_headers = dict(original_headers, connection='close')
-        new_kwargs = dict(kwargs, headers=new_headers)
+        :return: a dict of counters, as returned by ConnectionStats.as_dict
+                 plus ``open_sockets``, keyed by (scheme, host, port)
+        """
+        open_sockets = {}
+        for key in list(self.pools.keys()):
+            pool = self.pools.get(key)
+            if pool is None:
+                continue
+            endpoint = (pool.scheme, pool.host, pool.port)
+            open_sockets[endpoint] = (open_sockets.get(endpoint, 0) +
+                                      pool.open_sockets())
+        with self._endpoint_stats_lock:
+            endpoints = list(self._endpoint_stats.items())
+        result = {}
+        for endpoint, stats in endpoints:
+            result[endpoint] = stats.as_dict()
+            result[endpoint]['open_sockets'] = open_sockets.get(endpoint, 0)
+        return result
 
+    def _new_pool(self, scheme, host, port, request_context=None):
+        if request_context is None:
+            request_context = self.connection_pool_kw.copy()
+        else:
+            request_context = request_context.copy()
+        if host in self.pool_maxsize_by_host:
+            request_context['maxsize'] = self.pool_maxsize_by_host[host]
+        pool = super(ClosingHttp, self)._new_pool(
+            scheme, host, port, request_context=request_context)
+        pool.idle_timeout = self.idle_timeout
+        pool.stats = self._get_endpoint_stats(scheme, host, port)
+        return pool
+
+    def _urlopen(self, method, url, *args, **kwargs):
         # Follow up to 5 redirections. Don't raise an exception if
         # it's exceeded but return the HTTP 3XX response instead.
         retry = urllib3.util.Retry(raise_on_redirect=False, redirect=5)
-        r = super(ClosingHttp, self).request(method, url, retries=retry,
-                                             *args, **new_kwargs)
-        return Response(r), r.data
+        _checkout.reused = False
+        body = kwargs.get('body')
+        position = _body_position(body)
+        try:
+            return super(ClosingHttp, self).request(method, url, retries=retry,
+                                                    *args, **kwargs)
+        except urllib3.exceptions.ProtocolError as e:
+            # NOTE: urllib3 already re-sends idempotent requests on connection
+            # errors. Other requests are only sent again when they went over
+            # a reused keep-alive connection which the server had closed
+            # before sending anything back: the request was never processed.
+            # The body of the first attempt may have been consumed, it is
+            # only sent again when it can be replayed or rewound.
+            if not (self.retry_stale and _checkout.reused and
+                    _is_stale_socket_error(e) and position is not None):
+                raise
+            if position is not _REPLAYABLE:
+                try:
+                    body.seek(position)
+                except (AttributeError, IOError, OSError):
+                    raise e
+            self._get_url_stats(url).incr('stale_retries')
+            retry = urllib3.util.Retry(raise_on_redirect=False, redirect=5)
+            return super(ClosingHttp, self).request(method, url, retries=retry,
+                                                    *args, **kwargs)
+
+    def request(self, url, method, *args, **kwargs):
+        cassette = self.cassette
+        if cassette is None:
+            cassette = _default_cassette
+        stream = kwargs.pop('stream', False)
+        if self.close_connections:
+            original_headers = kwargs.get('headers', {})
+            new_headers = dict(original_headers, connection='close')
+            kwargs = dict(kwargs, headers=new_headers)
+
+        if cassette is not None and cassette.replaying:
+            r = cassette.play(method, url, preload_content=not stream)
+        else:
+            r = self._urlopen(method, url, preload_content=not stream,
+                              *args, **kwargs)
+        stats = self._get_url_stats(url)
+        stats.incr('bytes_sent', _body_length(kwargs.get('body')))
+        if stream:
+            return Response(r, url), StreamingBody(r, stats=stats)
+        data = r.data
+        stats.incr('bytes_received', _body_length(data))
+        if cassette is not None and cassette.recording:
+            cassette.record(method, url, r, data)
+        return Response(r, url), data
+
+
+class TransportRegistry(object):
+    """Process wide registry of shared HTTP transports
+
+    Service clients borrow their pool manager from here instead of owning
+    one, so that all the clients talking to the same endpoint share pooled
+    connections. Transports are keyed on their TLS and pooling settings;
+    within a transport, urllib3 keeps one pool per (scheme, host, port).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._transports = {}
+
+    @staticmethod
+    def _key(kwargs):
+        key = []
+        for name, value in sorted(kwargs.items()):
+            if isinstance(value, dict):
+                value = tuple(sorted(value.items()))
+            key.append((name, value))
+        return tuple(key)
+
+    def get(self, **kwargs):
+        """Return the shared ClosingHttp built with the given arguments
+
+        :param kwargs: arguments of ClosingHttp
+        """
+        key = self._key(kwargs)
+        with self._lock:
+            transport = self._transports.get(key)
+            if transport is None:
+                transport = ClosingHttp(**kwargs)
+                self._transports[key] = transport
+            return transport
+
+    def stats(self):
+        """Per endpoint usage counters of all the shared transports
+
+        :return: a list of dicts with the endpoint ``scheme``, ``host``,
+                 ``port``, the ``tls`` settings of the transport and the
+                 counters from ClosingHttp.endpoint_stats
+        """
+        with self._lock:
+            transports = list(self._transports.items())
+        result = []
+        for key, transport in transports:
+            settings = dict(key)
+            tls = dict(
+                disable_ssl_certificate_validation=settings.get(
+                    'disable_ssl_certificate_validation', False),
+                ca_certs=settings.get('ca_certs'))
+            for endpoint, counters in transport.endpoint_stats().items():
+                scheme, host, port = endpoint
+                counters.update(scheme=scheme, host=host, port=port, tls=tls)
+                result.append(counters)
+        return result
+
+    def clear(self):
+        """Close all the pooled connections and forget the transports"""
+        with self._lock:
+            transports = list(self._transports.values())
+            self._transports = {}
+        for transport in transports:
+            transport.clear()
+
+
+TRANSPORTS = TransportRegistry()
+
+
+def get_transport(**kwargs):
+    """Borrow a shared ClosingHttp from the process wide registry
+
+    :param kwargs: arguments of ClosingHttp
+    """
+    return TRANSPORTS.get(**kwargs)
@@ -0,0 +1,252 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Per request instrumentation of the service clients
+
+Callbacks registered with register_hook are called by RestClient after
+every API request with a RequestRecord. LatencyCollector is a built-in
+callback which keeps per endpoint latency histograms and can write them to
+a JSON report when the process exits.
+"""
+
+import atexit
+import collections
+import json
+import math
+import os
+import re
+import threading
+
+from oslo_log import log as logging
+from six.moves.urllib import parse as urlparse
+
+LOG = logging.getLogger(__name__)
+
+# Percentiles written to the latency report
+REPORT_PERCENTILES = (50, 90, 99)
+
+RequestRecord = collections.namedtuple(
+    'RequestRecord', ['service', 'method', 'url_template', 'status',
+                      'latency', 'request_bytes', 'response_bytes',
+                      'request_id'])
+"""What is known about one API request
+
+:param service: catalog type of the service client
+:param method: HTTP method
+:param url_template: the URL path, with resource ids replaced by
+                     placeholders (see normalize_url)
+:param status: HTTP status code of the response
+:param latency: seconds between sending the request and getting the response
+:param request_bytes: size of the request body
+:param response_bytes: size of the response body, None when streamed
+:param request_id: the request id returned by the service, if any
+"""
+
+_UUID_RE = re.compile(r'^[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?'
+                      r'[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}$')
+_INTEGER_RE = re.compile(r'^\d+$')
+
+_hooks = []
+_hooks_lock = threading.Lock()
+
+
+def normalize_url(url):
+    """Turn a request URL into a template shared by all similar requests
+
+    The scheme, host and query string are dropped and the path segments
+    which are UUIDs (with or without dashes) or integers are replaced with
+    ``{id}``, e.g. ``https://nova:8774/v2.1/<project_id>/servers/<id>``
+    becomes ``/v2.1/{id}/servers/{id}``.
+    """
+    path = urlparse.urlparse(url).path
+    segments = []
+    for segment in path.split('/'):
+        if _UUID_RE.match(segment) or _INTEGER_RE.match(segment):
+            segment = '{id}'
+        segments.append(segment)
+    return '/'.join(segments)
+
+
+def register_hook(callback):
+    """Call callback with a RequestRecord after every API request
+
+    Callbacks are called in the thread which made the request, they should
+    be fast and must not raise.
+    """
+    global _hooks
+    with _hooks_lock:
+        if callback not in _hooks:
+            # copy on write, so that emitting never needs the lock
+            _hooks = _hooks + [callback]
+
+
+def unregister_hook(callback):
+    global _hooks
+    with _hooks_lock:
+        _hooks = [hook for hook in _hooks if hook is not callback]
+
+
+def has_hooks():
+    return bool(_hooks)
+
+
+def emit(record):
+    """Pass a RequestRecord to all the registered callbacks"""
+    for hook in _hooks:
+        try:
+            hook(record)
+        except Exception:
+            LOG.exception('Request instrumentation hook %s failed', hook)
+
+
+def body_length(body):
+    """Size of a request or response body, None when unknown"""
+    if body is None:
+        return 0
+    try:
+        return len(body)
+    except TypeError:
+        return None
+
+
+class LatencyHistogram(object):
+    """Log-linear histogram of latencies, with bounded memory
+
+    Buckets grow geometrically by GROWTH, so percentiles are exact within
+    about 5%, whatever the number of samples.
+    """
+
+    GROWTH = 2 ** (1.0 / 8)
+    # Latencies below one millisecond all go in the first bucket
+    MIN_LATENCY = 0.001
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, latency):
+        if latency <= self.MIN_LATENCY:
+            return 0
+        return int(math.ceil(math.log(latency / self.MIN_LATENCY,
+                                      self.GROWTH)))
+
+    def _bucket_upper_bound(self, bucket):
+        return self.MIN_LATENCY * self.GROWTH ** bucket
+
+    def add(self, latency):
+        bucket = self._bucket(latency)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += latency
+        if self.min is None or latency < self.min:
+            self.min = latency
+        if self.max is None or latency > self.max:
+            self.max = latency
+
+    def percentile(self, percent):
+        """Upper bound of the bucket holding the given percentile"""
+        if not self.count:
+            return None
+        rank = int(math.ceil(self.count * percent / 100.0))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self._bucket_upper_bound(bucket), self.max)
+        return self.max
+
+    def as_dict(self):
+        result = dict(count=self.count, min=self.min, max=self.max,
+                      mean=self.total / self.count if self.count else None)
+        for percent in REPORT_PERCENTILES:
+            result['p%s' % percent] = self.percentile(percent)
+        return result
+
+
+class LatencyCollector(object):
+    """Request hook keeping latency histograms per endpoint
+
+    Endpoints are identified by service, method and URL template.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.statuses = {}
+
+    def __call__(self, record):
+        key = (record.service, record.method, record.url_template)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram()
+                self.statuses[key] = {}
+            histogram.add(record.latency)
+            statuses = self.statuses[key]
+            statuses[record.status] = statuses.get(record.status, 0) + 1
+
+    def report(self):
+        """Return the histograms as a list of dicts, slowest p99 first"""
+        with self._lock:
+            items = [(key, histogram.as_dict(), dict(self.statuses[key]))
+                     for key, histogram in self.histograms.items()]
+        report = []
+        for (service, method, url_template), latency, statuses in items:
+            entry = dict(service=service, method=method,
+                         url_template=url_template,
+                         statuses=dict((str(status), count) for
+                                       status, count in statuses.items()))
+            entry.update(latency)
+            report.append(entry)
+        report.sort(key=lambda entry: entry['p99'], reverse=True)
+        return report
+
+    def write_report(self, path):
+        with open(path, 'w') as report_file:
+            json.dump(self.report(), report_file, indent=2, sort_keys=True)
+
+
+_latency_collector = None
+
+
+def enable_latency_report(report_dir):
+    """Collect request latencies and write them to a report at exit
+
+    The report is written to latency-<pid>.json in report_dir, so that
+    parallel test workers do not overwrite each other's report. Calling
+    it more than once in a process has no further effect.
+
+    :param report_dir: directory in which the report is written
+    :return: the LatencyCollector in use
+    """
+    global _latency_collector
+    with _hooks_lock:
+        if _latency_collector is not None:
+            return _latency_collector
+        _latency_collector = LatencyCollector()
+    path = os.path.join(report_dir, 'latency-%s.json' % os.getpid())
+    register_hook(_latency_collector)
+    atexit.register(_write_latency_report, _latency_collector, path)
+    return _latency_collector
+
+
+def _write_latency_report(collector, path):
+    try:
+        collector.write_report(path)
+    except (IOError, OSError):
+        LOG.exception('Failed to write the request latency report %s', path)
@@ -0,0 +1,102 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""JSON codec of the service clients
+
+A drop-in replacement for the loads and dumps of oslo_serialization's
+jsonutils, where loads uses the fastest JSON library available among
+orjson, ujson, simplejson and the standard library. Parsing the response
+bodies dominates the JSON cost of the service clients, the request bodies
+are small so dumps keeps using oslo_serialization, and its exact output.
+"""
+
+import collections
+import json
+
+from oslo_serialization import jsonutils
+from oslo_utils import importutils
+import six
+
+JSONBackend = collections.namedtuple('JSONBackend', ['name', 'loads'])
+
+# Backends tried by set_backend('auto'), fastest first
+AUTO_BACKENDS = ('orjson', 'ujson', 'simplejson', 'stdlib')
+
+_UTF8 = ('utf-8', 'utf8')
+
+
+def _load_backend(name):
+    if name == 'stdlib':
+        return JSONBackend('stdlib', json.loads)
+    if name not in AUTO_BACKENDS:
+        raise ValueError('Unknown JSON backend %s' % name)
+    module = importutils.try_import(name)
+    if module is None:
+        return None
+    return JSONBackend(name, module.loads)
+
+
+def set_backend(name='auto'):
+    """Select the library used to parse JSON
+
+    :param name: one of orjson, ujson, simplejson or stdlib, or auto to use
+                 the fastest one installed
+    :raises ValueError: if the library is unknown or not installed
+    :return: the name of the library in use
+    """
+    global _backend
+    names = AUTO_BACKENDS if name == 'auto' else (name,)
+    for backend_name in names:
+        backend = _load_backend(backend_name)
+        if backend is not None:
+            _backend = backend
+            return backend.name
+    raise ValueError('JSON backend %s is not installed' % name)
+
+
+def get_backend():
+    """Return the name of the library used to parse JSON"""
+    return _backend.name
+
+
+def loads(s, encoding='utf-8', **kwargs):
+    """Deserialize a JSON document
+
+    Keyword arguments such as object_hook are only supported by the standard
+    library, they make loads use oslo_serialization's.
+
+    :raises ValueError: if s is not valid JSON
+    """
+    if kwargs:
+        return jsonutils.loads(s, encoding=encoding, **kwargs)
+    if (isinstance(s, six.binary_type) and
+            encoding.lower() not in _UTF8):
+        s = s.decode(encoding)
+    try:
+        return _backend.loads(s)
+    except ValueError:
+        if _backend.loads is json.loads:
+            raise
+        # The fast libraries reject some valid documents, like integers
+        # bigger than 64 bits: let the standard library decide.
+        return json.loads(s)
+
+
+dumps = jsonutils.dumps
+dump = jsonutils.dump
+load = jsonutils.load
+
+_backend = None
+set_backend()
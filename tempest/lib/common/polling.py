@@ -0,0 +1,145 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Polling loop of the waiters
+
+wait_until polls a resource until it reaches the state waited for. The
+waiters only describe how to get the state of their resource, which state
+they wait for and which ones are failures, while a PollingPolicy decides
+how long to sleep between two polls.
+"""
+
+import random
+import time
+
+from tempest.lib import exceptions
+
+
+class PollingPolicy(object):
+    """How long a waiter sleeps between two polls
+
+    The first interval is the one of the waiter, typically the
+    build_interval of its client, and every following one is backoff times
+    longer, up to max_interval. Each interval is randomized by up to
+    +/- jitter of its length, so that parallel waiters do not poll in step.
+    During the first fast_start seconds of a wait the waiter polls every
+    fast_interval seconds instead, to return quickly from the transitions
+    which take a few seconds.
+
+    The default policy polls at the fixed interval of the waiter.
+
+    :param float backoff: growth factor of the interval, 1 for a fixed one
+    :param float max_interval: maximum seconds between two polls, None for
+                               no limit. It never shortens the interval of
+                               the waiter.
+    :param float jitter: fraction of the interval it is randomized by
+    :param float fast_start: seconds during which fast_interval is used
+    :param float fast_interval: seconds between the polls of the fast start
+    """
+
+    def __init__(self, backoff=1.0, max_interval=None, jitter=0.0,
+                 fast_start=0.0, fast_interval=0.5):
+        self.backoff = backoff
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.fast_start = fast_start
+        self.fast_interval = fast_interval
+
+    def schedule(self, interval):
+        """The intervals of one wait, see _Schedule.next_delay"""
+        return _Schedule(self, interval)
+
+
+class _Schedule(object):
+
+    def __init__(self, policy, interval):
+        self.policy = policy
+        self.interval = interval
+        self._next = interval
+        self._max = None
+        if policy.max_interval is not None:
+            self._max = max(interval, policy.max_interval)
+
+    def next_delay(self, elapsed, timeout):
+        """Seconds to sleep before the next poll
+
+        :param float elapsed: seconds since the wait started
+        :param float timeout: seconds after which the wait fails; the delay
+                              is cut to poll once more at that time
+        """
+        policy = self.policy
+        if elapsed < policy.fast_start:
+            delay = min(self.interval, policy.fast_interval)
+        else:
+            delay = self._next
+            if policy.backoff != 1:
+                self._next *= policy.backoff
+                if self._max is not None:
+                    self._next = min(self._max, self._next)
+        if policy.jitter:
+            delay *= random.uniform(1 - policy.jitter, 1 + policy.jitter)
+        return max(0, min(delay, timeout - elapsed))
+
+
+_default_policy = PollingPolicy()
+
+
+def set_default_policy(policy):
+    """Set the PollingPolicy of the waiters not given one"""
+    global _default_policy
+    _default_policy = policy
+
+
+def get_default_policy():
+    return _default_policy
+
+
+def wait_until(fetch, done, timeout, interval, check=None, on_timeout=None,
+               policy=None):
+    """Poll a resource until it reaches the state waited for
+
+    :param fetch: callable returning the current state of the resource
+    :param done: callable telling whether a state is the one waited for
+    :param float timeout: seconds after which the wait fails
+    :param float interval: base seconds between two polls, see
+                           PollingPolicy
+    :param check: callable given every polled state but the first one,
+                  before done, which raises if the state is a failure
+    :param on_timeout: callable given the last state on timeout, whose
+                       result is returned. By default a TimeoutException is
+                       raised.
+    :param policy: the PollingPolicy, by default the one set with
+                   set_default_policy
+    :return: the state waited for
+    """
+    schedule = (policy or _default_policy).schedule(interval)
+    start = time.time()
+    elapsed = 0
+    state = fetch()
+    if done(state):
+        return state
+    while True:
+        time.sleep(schedule.next_delay(elapsed, timeout))
+        state = fetch()
+        if check is not None:
+            check(state)
+        if done(state):
+            return state
+        elapsed = time.time() - start
+        if elapsed >= timeout:
+            if on_timeout is not None:
+                return on_timeout(state)
+            raise exceptions.TimeoutException(
+                'The wait timed out after %d seconds' % elapsed)
@@ -0,0 +1,147 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Cache of the GET responses of read-mostly API endpoints
+
+RestClient uses a ResponseCache when one is passed to it, for the URLs
+matching its allowlist, see RestClient._cached_request.
+"""
+
+import collections
+import re
+import threading
+import time
+
+# Path segments skipped to find the resource collection of an URL
+_VERSION_RE = re.compile(r'^v\d+(\.\d+)?$')
+
+
+def resource_collection(url):
+    """The resource collection an URL relative to an endpoint belongs to
+
+    e.g. flavors for flavors/42/os-extra_specs?foo=bar, or images for
+    v2/images/<id>.
+    """
+    path = url.split('?', 1)[0]
+    for segment in path.split('/'):
+        if segment and not _VERSION_RE.match(segment):
+            return segment
+    return ''
+
+
+class CacheEntry(object):
+
+    __slots__ = ('resp', 'body', 'etag', 'expires', 'collection')
+
+    def __init__(self, resp, body, expires, collection):
+        self.resp = resp
+        self.body = body
+        self.etag = resp.get('etag')
+        self.expires = expires
+        self.collection = collection
+
+
+class ResponseCache(object):
+    """TTL and size bounded LRU cache of API responses
+
+    :param int ttl: seconds during which a cached response is used without
+                    asking the service; after that it is revalidated with
+                    If-None-Match if the service sent an ETag, or fetched
+                    again
+    :param int maxsize: maximum number of cached responses, the least
+                        recently used are evicted first
+    """
+
+    STATS = ('hits', 'misses', 'revalidations', 'evictions',
+             'invalidations')
+
+    def __init__(self, ttl=60, maxsize=1000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        # keys of the entries of each (endpoint, collection)
+        self._collections = collections.defaultdict(set)
+        self._stats = dict((name, 0) for name in self.STATS)
+
+    def incr(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key):
+        """Return the entry of key and whether it is still fresh
+
+        :return: a (CacheEntry, fresh) tuple, (None, False) on a miss
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None, False
+            # move it to the most recently used end
+            self._entries[key] = entry
+            return entry, entry.expires > time.time()
+
+    def store(self, key, collection, resp, body):
+        with self._lock:
+            self._remove(key)
+            entry = CacheEntry(resp, body, time.time() + self.ttl,
+                               collection)
+            self._entries[key] = entry
+            self._collections[collection].add(key)
+            while len(self._entries) > self.maxsize:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats['evictions'] += 1
+        return entry
+
+    def refresh(self, key):
+        """Make the entry of key fresh again, after a revalidation"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.expires = time.time() + self.ttl
+            self._stats['revalidations'] += 1
+
+    def invalidate(self, collection):
+        """Drop all the cached responses of a resource collection"""
+        with self._lock:
+            keys = self._collections.pop(collection, ())
+            for key in keys:
+                self._entries.pop(key, None)
+            if keys:
+                self._stats['invalidations'] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._collections.get(entry.collection)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._collections[entry.collection]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._collections.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        return stats
+
+    def __len__(self):
+        return len(self._entries)
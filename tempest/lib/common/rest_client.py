@@ -15,25 +15,40 @@
 #    under the License.
 
 import collections
+import copy
+import itertools
 import logging as real_logging
 import re
+import sys
+import threading
 import time
 
 import jsonschema
 from oslo_log import log as logging
-from oslo_serialization import jsonutils as json
 import six
+from six.moves import queue
 
 from tempest.lib.common import http
+from tempest.lib.common import instrumentation
+from tempest.lib.common import jsonutils as json
+from tempest.lib.common import polling
+from tempest.lib.common import response_cache
 from tempest.lib.common.utils import misc as misc_utils
 from tempest.lib import exceptions
 
 # redrive rate limited calls at most twice
 MAX_RECURSION_DEPTH = 2
 
+# Methods which may change the resources of a collection, and so invalidate
+# its cached responses
+MUTATING_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
 # All the successful HTTP status codes from RFC 7231 & 4918
 HTTP_SUCCESS = (200, 201, 202, 203, 204, 205, 206, 207)
 
+# Bytes of a streamed error response read for logging and error checking
+STREAM_ERROR_BODY_LIMIT = 64 * 1024
+
 # All the redirection HTTP status codes from RFC 7231 & 4918
 HTTP_REDIRECTION = (300, 301, 302, 303, 304, 305, 306, 307)
 
@@ -42,6 +57,77 @@ JSONSCHEMA_VALIDATOR = jsonschema.Draft4Validator
 FORMAT_CHECKER = jsonschema.draft4_format_checker
 
 
+class _CompiledSchema(object):
+    """The JSON schema validators of a response schema"""
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.body_validator = self._validator(schema.get('response_body'))
+        self.header_validator = self._validator(
+            schema.get('response_header'))
+        # Shared by the threads of map_requests and single_flight, next()
+        # on a count is atomic
+        self._counter = itertools.count()
+
+    @staticmethod
+    def _validator(schema):
+        if not schema:
+            return None
+        JSONSCHEMA_VALIDATOR.check_schema(schema)
+        return JSONSCHEMA_VALIDATOR(schema, format_checker=FORMAT_CHECKER)
+
+    def sample(self, rate):
+        """Whether the current response should be validated
+
+        :param int rate: the first response and then 1 in rate are
+        """
+        return next(self._counter) % rate == 0
+
+
+# The response schemas are module level constants, so their validators are
+# built once and cached by id. The schema is kept with its validators to
+# make sure the id is not reused.
+_compiled_schemas = {}
+
+
+def _get_compiled_schema(schema):
+    compiled = _compiled_schemas.get(id(schema))
+    if compiled is None or compiled.schema is not schema:
+        compiled = _compiled_schemas[id(schema)] = _CompiledSchema(schema)
+    return compiled
+
+
+@six.python_2_unicode_compatible
+class _LogHeaders(object):
+    """Headers formatted like a dict, without the auth token"""
+
+    __slots__ = ('headers',)
+
+    REDACTED = ('X-Auth-Token',)
+
+    def __init__(self, headers):
+        self.headers = headers
+
+    def __str__(self):
+        return '{%s}' % ', '.join(
+            '%r: %r' % (name, '<omitted>' if name in self.REDACTED else value)
+            for name, value in six.iteritems(self.headers))
+
+
+@six.python_2_unicode_compatible
+class _LogBody(object):
+    """A body truncated by RestClient._safe_body when formatted"""
+
+    __slots__ = ('client', 'body')
+
+    def __init__(self, client, body):
+        self.client = client
+        self.body = body
+
+    def __str__(self):
+        return self.client._safe_body(self.body)
+
+
 class RestClient(object):
     """Unified OpenStack RestClient class
 
@@ -63,19 +149,59 @@ class RestClient(object):
                          TLS server cert
     :param str trace_request: Regex to use for specifying logging the entirety
                               of the request and response payload
+    :param bool close_connections: Set to true to close the HTTP connection
+                                   after every request instead of keeping it
+                                   alive for reuse
+    :param int pool_maxsize: Number of HTTP connections kept open per host
+    :param dict pool_maxsize_by_host: Per host override of pool_maxsize
+    :param int pool_idle_timeout: Seconds after which an idle pooled
+                                  connection is closed instead of reused
+    :param bool pool_block: Set to true to wait for a free pooled connection
+                            rather than opening an extra one when all the
+                            connections to a host are in use
+    :param response_cache: a response_cache.ResponseCache caching the GET
+                           responses of the URLs matching cacheable_urls
+    :param retry_policy: a retry.RetryPolicy deciding which failed requests
+                         are sent again
+    :param throttle: a retry.Throttle limiting the rate of the requests sent
+                     to each endpoint
+    :param single_flight: a single_flight.SingleFlight group through which
+                          identical concurrent GET requests share one API
+                          call
+    :param int response_validation_sample_rate: How many of the successful
+                                                responses are checked
+                                                against their JSON schema:
+                                                0 for none, which also skips
+                                                the status code check, 1 for
+                                                all of them, N for the first
+                                                one of each schema and then
+                                                1 in N
     """
     TYPE = "json"
 
     # The version of the API this client implements
     api_version = None
 
+    # Regular expressions matching the relative URLs whose GET responses may
+    # be cached, when the client has a response cache. Only resources which
+    # change through the API, like flavors, should be listed: the cache is
+    # invalidated by the writes of the clients sharing it, not by status
+    # changes happening in the services.
+    cacheable_urls = ()
+
     LOG = logging.getLogger(__name__)
 
     def __init__(self, auth_provider, service, region,
                  endpoint_type='publicURL',
                  build_interval=1, build_timeout=60,
                  disable_ssl_certificate_validation=False, ca_certs=None,
-                 trace_requests=''):
+                 trace_requests='', close_connections=False,
+                 pool_maxsize=http.DEFAULT_POOL_MAXSIZE,
+                 pool_maxsize_by_host=None,
+                 pool_idle_timeout=http.DEFAULT_IDLE_TIMEOUT,
+                 pool_block=False, response_cache=None, retry_policy=None,
+                 throttle=None, single_flight=None,
+                 response_validation_sample_rate=0):
         self.auth_provider = auth_provider
         self.service = service
         self.region = region
@@ -83,6 +209,11 @@ class RestClient(object):
         self.build_interval = build_interval
         self.build_timeout = build_timeout
         self.trace_requests = trace_requests
+        self.response_cache = response_cache
+        self.retry_policy = retry_policy
+        self.throttle = throttle
+        self.single_flight = single_flight
+        self.response_validation_sample_rate = response_validation_sample_rate
 
         self._skip_path = False
         self.general_header_lc = set(('cache-control', 'connection',
@@ -93,9 +224,15 @@ class RestClient(object):
                                        'location', 'proxy-authenticate',
                                        'retry-after', 'server',
                                        'vary', 'www-authenticate'))
+        # Also the default number of threads of map_requests, so that each
+        # of them can use a pooled connection
+        self.pool_maxsize = pool_maxsize
         dscv = disable_ssl_certificate_validation
-        self.http_obj = http.ClosingHttp(
-            disable_ssl_certificate_validation=dscv, ca_certs=ca_certs)
+        self.http_obj = http.get_transport(
+            disable_ssl_certificate_validation=bool(dscv), ca_certs=ca_certs,
+            close_connections=close_connections, pool_maxsize=pool_maxsize,
+            pool_maxsize_by_host=pool_maxsize_by_host,
+            idle_timeout=pool_idle_timeout, pool_block=pool_block)
 
     def _get_type(self):
         return self.TYPE
@@ -258,7 +395,7 @@ class RestClient(object):
         """
         return self.request('POST', url, extra_headers, headers, body)
 
-    def get(self, url, headers=None, extra_headers=False):
+    def get(self, url, headers=None, extra_headers=False, stream=False):
         """Send a HTTP GET request using keystone service catalog and auth
 
         :param str url: the relative url to send the post request to
@@ -267,11 +404,13 @@ class RestClient(object):
                                    returned by the get_headers() method are to
                                    be used but additional headers are needed in
                                    the request pass them in as a dict.
+        :param bool stream: Set to true to get the response body as a
+                            http.StreamingBody instead of reading it in full
         :return: a tuple with the first entry containing the response headers
                  and the second the response body
         :rtype: tuple
         """
-        return self.request('GET', url, extra_headers, headers)
+        return self.request('GET', url, extra_headers, headers, stream=stream)
 
     def delete(self, url, headers=None, body=None, extra_headers=False):
         """Send a HTTP DELETE request using keystone service catalog and auth
@@ -375,6 +514,12 @@ class RestClient(object):
 
     def _safe_body(self, body, maxlen=4096):
         # convert a structure into a string safely
+        if isinstance(body, http.StreamingBody):
+            # only look at the start of a streamed body, without consuming it
+            body = body.peek(maxlen)
+        elif isinstance(body, (six.binary_type, six.text_type)):
+            # only convert what can be logged, bodies can be very large
+            body = body[:maxlen]
         try:
             text = six.text_type(body)
         except UnicodeDecodeError:
@@ -389,33 +534,37 @@ class RestClient(object):
                            req_body=None):
         if req_headers is None:
             req_headers = {}
+        if not self.trace_requests:
+            return
         caller_name = misc_utils.find_test_caller()
-        if self.trace_requests and re.search(self.trace_requests, caller_name):
-            self.LOG.debug('Starting Request (%s): %s %s' %
-                           (caller_name, method, req_url))
+        if re.search(self.trace_requests, caller_name):
+            self.LOG.debug('Starting Request (%s): %s %s',
+                           caller_name, method, req_url)
 
     def _log_request_full(self, method, req_url, resp,
                           secs="", req_headers=None,
                           req_body=None, resp_body=None,
                           caller_name=None, extra=None):
-        if 'X-Auth-Token' in req_headers:
-            req_headers['X-Auth-Token'] = '<omitted>'
         log_fmt = """Request - Headers: %s
         Body: %s
     Response - Headers: %s
         Body: %s"""
 
+        # The headers and bodies are only turned into text if a handler
+        # actually writes the record
         self.LOG.debug(
-            log_fmt % (
-                str(req_headers),
-                self._safe_body(req_body),
-                str(resp),
-                self._safe_body(resp_body)),
+            log_fmt,
+            _LogHeaders(req_headers),
+            _LogBody(self, req_body),
+            _LogHeaders(resp),
+            _LogBody(self, resp_body),
             extra=extra)
 
     def _log_request(self, method, req_url, resp,
                      secs="", req_headers=None,
                      req_body=None, resp_body=None):
+        if not self.LOG.isEnabledFor(real_logging.INFO):
+            return
         if req_headers is None:
             req_headers = {}
         # if we have the request id, put it in the right part of the log
@@ -426,15 +575,11 @@ class RestClient(object):
         # Once we're down to 1 caller, clean this up.
         caller_name = misc_utils.find_test_caller()
         if secs:
-            secs = " %.3fs" % secs
-        self.LOG.info(
-            'Request (%s): %s %s %s%s' % (
-                caller_name,
-                resp['status'],
-                method,
-                req_url,
-                secs),
-            extra=extra)
+            self.LOG.info('Request (%s): %s %s %s %.3fs', caller_name,
+                          resp['status'], method, req_url, secs, extra=extra)
+        else:
+            self.LOG.info('Request (%s): %s %s %s', caller_name,
+                          resp['status'], method, req_url, extra=extra)
 
         # Also look everything at DEBUG if you want to filter this
         # out, don't run at debug.
@@ -473,6 +618,22 @@ class RestClient(object):
             pass
         return body
 
+    def _parse_resp_once(self, resp, body):
+        """Return _parse_resp(body), parsing it once per response
+
+        The result is cached on the response, where the rate limit retries
+        and the error checks find it.
+        """
+        cached = getattr(resp, '_parsed_body', None)
+        if cached is not None and cached[0] is body:
+            return cached[1]
+        parsed = self._parse_resp(body)
+        try:
+            resp._parsed_body = (body, parsed)
+        except AttributeError:
+            pass
+        return parsed
+
     def response_checker(self, method, resp, resp_body):
         """A sanity check on the response from a HTTP request
 
@@ -515,8 +676,95 @@ class RestClient(object):
         if method != 'HEAD' and not resp_body and resp.status >= 400:
             self.LOG.warning("status >= 400 response with empty body")
 
-    def _request(self, method, url, headers=None, body=None):
+    def _request(self, method, url, headers=None, body=None, stream=False):
         """A simple HTTP request interface."""
+        cache = self.response_cache
+        if method == 'GET' and not stream:
+            if cache is not None and self._is_cacheable(url):
+                return self._cached_request(url, headers)
+            return self._get(url, headers)
+        if cache is None or stream or method not in MUTATING_METHODS:
+            return self._send_request(method, url, headers, body, stream)
+        try:
+            return self._send_request(method, url, headers, body)
+        finally:
+            cache.invalidate(self._cache_collection(url))
+
+    def _get(self, url, headers=None):
+        """GET url, sharing the request with identical concurrent ones
+
+        With a single flight group, a GET sent while the same one (same
+        credentials, endpoint, URL and headers) is in flight waits for its
+        response instead of sending another request. Each caller gets its
+        own copy of the response headers, the body is immutable and parsed
+        by each caller.
+        """
+        if self.single_flight is None:
+            return self._send_request('GET', url, headers)
+        resp, body = self.single_flight.do(
+            self._request_key(url, headers),
+            lambda: self._send_request('GET', url, headers))
+        return self._copy_response(resp), body
+
+    @staticmethod
+    def _copy_response(resp):
+        """A copy of a shared response, without its parsed body"""
+        resp = copy.copy(resp)
+        resp.__dict__.pop('_parsed_body', None)
+        return resp
+
+    def _is_cacheable(self, url):
+        for pattern in self.cacheable_urls:
+            if re.match(pattern, url):
+                return True
+        return False
+
+    def _cache_collection(self, url):
+        return (self.service, self.region,
+                response_cache.resource_collection(url))
+
+    def _request_key(self, url, headers):
+        creds = getattr(self.auth_provider, 'credentials', None)
+        scope = tuple(getattr(creds, attr, None)
+                      for attr in getattr(creds, 'ATTRIBUTES', ())
+                      if attr != 'password')
+        headers = tuple(sorted((name.lower(), value) for name, value in
+                               six.iteritems(headers or {})
+                               if name.lower() != 'x-auth-token'))
+        return (scope, tuple(sorted(self.filters.items())), url, headers)
+
+    def _cached_request(self, url, headers=None):
+        """GET a cacheable URL through the response cache
+
+        Fresh cached responses are returned without a request. Stale ones
+        are revalidated with If-None-Match when the service sent an ETag,
+        and only successful responses are cached. Each caller gets its own
+        copy of the response headers, the body is immutable and parsed by
+        each caller.
+        """
+        cache = self.response_cache
+        key = self._request_key(url, headers)
+        entry, fresh = cache.get(key)
+        if fresh:
+            cache.incr('hits')
+            return self._copy_response(entry.resp), entry.body
+        if entry is not None and entry.etag:
+            conditional_headers = dict(headers or {})
+            conditional_headers['If-None-Match'] = entry.etag
+            resp, body = self._get(url, conditional_headers)
+            if resp.status == 304:
+                cache.refresh(key)
+                return self._copy_response(entry.resp), entry.body
+        else:
+            resp, body = self._get(url, headers)
+        cache.incr('misses')
+        if resp.status == 200:
+            cache.store(key, self._cache_collection(url),
+                        self._copy_response(resp), body)
+        return resp, body
+
+    def _send_request(self, method, url, headers=None, body=None,
+                      stream=False):
         # Authenticate the request with the auth provider
         req_url, req_headers, req_body = self.auth_provider.auth_request(
             method, url, headers, body, self.filters)
@@ -524,19 +772,81 @@ class RestClient(object):
         # Do the actual request, and time it
         start = time.time()
         self._log_request_start(method, req_url)
-        resp, resp_body = self.raw_request(
-            req_url, method, headers=req_headers, body=req_body)
+        if self.retry_policy is None and self.throttle is None:
+            resp, resp_body = self.raw_request(
+                req_url, method, headers=req_headers, body=req_body,
+                stream=stream)
+        else:
+            resp, resp_body = self._raw_request_with_retries(
+                method, req_url, req_headers, req_body, stream)
+        if stream and resp.status >= 400:
+            # Error bodies are small, and needed to check the error
+            streamed_body = resp_body
+            resp_body = streamed_body.peek(STREAM_ERROR_BODY_LIMIT)
+            streamed_body.close()
         end = time.time()
         self._log_request(method, req_url, resp, secs=(end - start),
                           req_headers=req_headers, req_body=req_body,
                           resp_body=resp_body)
+        if instrumentation.has_hooks():
+            self._emit_request_record(method, req_url, resp, end - start,
+                                      req_body, resp_body, stream)
 
         # Verify HTTP response codes
         self.response_checker(method, resp, resp_body)
 
         return resp, resp_body
 
-    def raw_request(self, url, method, headers=None, body=None):
+    def _raw_request_with_retries(self, method, req_url, req_headers,
+                                  req_body, stream=False):
+        """raw_request, throttled and retried by the client policies"""
+        attempt = 0
+        while True:
+            if self.throttle is not None:
+                self.throttle.wait(req_url)
+            try:
+                resp, resp_body = self.raw_request(
+                    req_url, method, headers=req_headers, body=req_body,
+                    stream=stream)
+            except Exception as e:
+                if self.retry_policy is None:
+                    raise
+                delay = self.retry_policy.retry_delay(method, attempt,
+                                                      error=e)
+                if delay is None:
+                    raise
+                reason = e
+            else:
+                if self.retry_policy is None:
+                    return resp, resp_body
+                delay = self.retry_policy.retry_delay(method, attempt,
+                                                      resp=resp)
+                if delay is None:
+                    return resp, resp_body
+                if stream:
+                    resp_body.close()
+                reason = resp.status
+            attempt += 1
+            self.LOG.warning('Retrying request %s %s in %.1f seconds '
+                             '(attempt %d), after: %s', method, req_url,
+                             delay, attempt, reason)
+            time.sleep(delay)
+
+    def _emit_request_record(self, method, req_url, resp, secs, req_body,
+                             resp_body, stream=False):
+        if stream and resp.status < 400:
+            response_bytes = None
+        else:
+            response_bytes = instrumentation.body_length(resp_body)
+        instrumentation.emit(instrumentation.RequestRecord(
+            service=self.service, method=method,
+            url_template=instrumentation.normalize_url(req_url),
+            status=resp.status, latency=secs,
+            request_bytes=instrumentation.body_length(req_body),
+            response_bytes=response_bytes,
+            request_id=self._get_request_id(resp) or None))
+
+    def raw_request(self, url, method, headers=None, body=None, stream=False):
         """Send a raw HTTP request without the keystone catalog or auth
 
         This method sends a HTTP request in the same manner as the request()
@@ -549,17 +859,19 @@ class RestClient(object):
         :param str headers: Headers to use for the request if none are specifed
                             the headers
         :param str body: Body to send with the request
+        :param bool stream: Set to true to get the response body as a
+                            http.StreamingBody instead of reading it in full
         :rtype: tuple
         :return: a tuple with the first entry containing the response headers
                  and the second the response body
         """
         if headers is None:
             headers = self.get_headers()
-        return self.http_obj.request(url, method,
-                                     headers=headers, body=body)
+        return self.http_obj.request(url, method, headers=headers, body=body,
+                                     stream=stream)
 
     def request(self, method, url, extra_headers=False, headers=None,
-                body=None):
+                body=None, stream=False):
         """Send a HTTP request with keystone auth and using the catalog
 
         This method will send an HTTP request using keystone auth in the
@@ -574,6 +886,12 @@ class RestClient(object):
         received it will retry the request after waiting the 'retry-after'
         duration from the header.
 
+        When streaming, the body of a successful response is returned as a
+        http.StreamingBody: a file-like object which can be iterated over in
+        chunks, and which releases the connection once read to the end or
+        closed. Only the start of it is read for logging. Error response
+        bodies are read up to STREAM_ERROR_BODY_LIMIT bytes.
+
         :param str method: The HTTP verb to use for the request
         :param str url: Relative url to send the request to
         :param bool extra_headers: Boolean value than indicates if the headers
@@ -585,6 +903,8 @@ class RestClient(object):
                              get_headers() method are used. If the request
                              explicitly requires no headers use an empty dict.
         :param str body: Body to send with the request
+        :param bool stream: Set to true to stream the response body instead
+                            of reading it in full
         :rtype: tuple
         :return: a tuple with the first entry containing the response headers
                  and the second the response body
@@ -624,19 +944,19 @@ class RestClient(object):
             except (ValueError, TypeError):
                 headers = self.get_headers()
 
-        resp, resp_body = self._request(method, url,
-                                        headers=headers, body=body)
+        resp, resp_body = self._request(method, url, headers=headers,
+                                        body=body, stream=stream)
 
         while (resp.status == 413 and
                'retry-after' in resp and
                 not self.is_absolute_limit(
-                    resp, self._parse_resp(resp_body)) and
+                    resp, self._parse_resp_once(resp, resp_body)) and
                 retry < MAX_RECURSION_DEPTH):
             retry += 1
             delay = int(resp['retry-after'])
             time.sleep(delay)
-            resp, resp_body = self._request(method, url,
-                                            headers=headers, body=body)
+            resp, resp_body = self._request(method, url, headers=headers,
+                                            body=body, stream=stream)
         self._error_checker(method, url, headers, body,
                             resp, resp_body)
         return resp, resp_body
@@ -680,37 +1000,37 @@ class RestClient(object):
 
         if resp.status == 401:
             if parse_resp:
-                resp_body = self._parse_resp(resp_body)
+                resp_body = self._parse_resp_once(resp, resp_body)
             raise exceptions.Unauthorized(resp_body, resp=resp)
 
         if resp.status == 403:
             if parse_resp:
-                resp_body = self._parse_resp(resp_body)
+                resp_body = self._parse_resp_once(resp, resp_body)
             raise exceptions.Forbidden(resp_body, resp=resp)
 
         if resp.status == 404:
             if parse_resp:
-                resp_body = self._parse_resp(resp_body)
+                resp_body = self._parse_resp_once(resp, resp_body)
             raise exceptions.NotFound(resp_body, resp=resp)
 
         if resp.status == 400:
             if parse_resp:
-                resp_body = self._parse_resp(resp_body)
+                resp_body = self._parse_resp_once(resp, resp_body)
             raise exceptions.BadRequest(resp_body, resp=resp)
 
         if resp.status == 410:
             if parse_resp:
-                resp_body = self._parse_resp(resp_body)
+                resp_body = self._parse_resp_once(resp, resp_body)
             raise exceptions.Gone(resp_body, resp=resp)
 
         if resp.status == 409:
             if parse_resp:
-                resp_body = self._parse_resp(resp_body)
+                resp_body = self._parse_resp_once(resp, resp_body)
             raise exceptions.Conflict(resp_body, resp=resp)
 
         if resp.status == 413:
             if parse_resp:
-                resp_body = self._parse_resp(resp_body)
+                resp_body = self._parse_resp_once(resp, resp_body)
             if self.is_absolute_limit(resp, resp_body):
                 raise exceptions.OverLimit(resp_body, resp=resp)
             else:
@@ -718,19 +1038,19 @@ class RestClient(object):
 
         if resp.status == 415:
             if parse_resp:
-                resp_body = self._parse_resp(resp_body)
+                resp_body = self._parse_resp_once(resp, resp_body)
             raise exceptions.InvalidContentType(resp_body, resp=resp)
 
         if resp.status == 422:
             if parse_resp:
-                resp_body = self._parse_resp(resp_body)
+                resp_body = self._parse_resp_once(resp, resp_body)
             raise exceptions.UnprocessableEntity(resp_body, resp=resp)
 
         if resp.status in (500, 501):
             message = resp_body
             if parse_resp:
                 try:
-                    resp_body = self._parse_resp(resp_body)
+                    resp_body = self._parse_resp_once(resp, resp_body)
                 except ValueError:
                     # If response body is a non-json string message.
                     # Use resp_body as is and raise InvalidResponseBody
@@ -772,6 +1092,52 @@ class RestClient(object):
             return True
         return 'exceed' in over_limit.get('message', 'blabla')
 
+    def map_requests(self, func, items, max_workers=None):
+        """Call func(item) for each item, from a bounded pool of threads
+
+        This is meant for batches of independent API calls, such as
+        deleting a list of resources. The threads share the HTTP
+        connection pools of the service clients.
+
+        :param func: callable doing the API call for one item, typically a
+                     bound method of a service client
+        :param items: the argument of each call
+        :param int max_workers: maximum number of concurrent calls, by
+                                default the pool_maxsize of the client
+        :return: a list of BatchResult, in the order of items, once all the
+                 calls are done
+        """
+        items = list(items)
+        results = [BatchResult(item) for item in items]
+        max_workers = min(max_workers or self.pool_maxsize, len(items))
+        if max_workers <= 1:
+            for result in results:
+                result.run(func)
+            return results
+
+        pending = queue.Queue()
+        for result in results:
+            pending.put(result)
+        caller_name = misc_utils.find_test_caller()
+
+        def worker():
+            with misc_utils.test_caller_context(caller_name):
+                while True:
+                    try:
+                        result = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    result.run(func)
+
+        workers = [threading.Thread(target=worker)
+                   for _ in range(max_workers)]
+        for thread in workers:
+            thread.daemon = True
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return results
+
     def wait_for_resource_deletion(self, id):
         """Waits for a resource to be deleted
 
@@ -783,20 +1149,19 @@ class RestClient(object):
         :raises TimeoutException: If the build_timeout has elapsed and the
                                   resource still hasn't been deleted
         """
-        start_time = int(time.time())
-        while True:
-            if self.is_resource_deleted(id):
-                return
-            if int(time.time()) - start_time >= self.build_timeout:
-                message = ('Failed to delete %(resource_type)s %(id)s within '
-                           'the required time (%(timeout)s s).' %
-                           {'resource_type': self.resource_type, 'id': id,
-                            'timeout': self.build_timeout})
-                caller = misc_utils.find_test_caller()
-                if caller:
-                    message = '(%s) %s' % (caller, message)
-                raise exceptions.TimeoutException(message)
-            time.sleep(self.build_interval)
+        def _on_timeout(deleted):
+            message = ('Failed to delete %(resource_type)s %(id)s within '
+                       'the required time (%(timeout)s s).' %
+                       {'resource_type': self.resource_type, 'id': id,
+                        'timeout': self.build_timeout})
+            caller = misc_utils.find_test_caller()
+            if caller:
+                message = '(%s) %s' % (caller, message)
+            raise exceptions.TimeoutException(message)
+
+        polling.wait_until(lambda: self.is_resource_deleted(id), bool,
+                           self.build_timeout, self.build_interval,
+                           on_timeout=_on_timeout)
 
     def is_resource_deleted(self, id):
         """Subclasses override with specific deletion detection."""
@@ -809,24 +1174,26 @@ class RestClient(object):
         """Returns the primary type of resource this client works with."""
         return 'resource'
 
-    @classmethod
-    def validate_response(cls, schema, resp, body):
+    def validate_response(self, schema, resp, body):
+        rate = self.response_validation_sample_rate
+        if not rate:
+            return
         # Only check the response if the status code is a success code
         # TODO(cyeoh): Eventually we should be able to verify that a failure
         # code if it exists is something that we expect. This is explicitly
         # declared in the V3 API and so we should be able to export this in
         # the response schema. For now we'll ignore it.
-        return
         if resp.status in HTTP_SUCCESS + HTTP_REDIRECTION:
-            cls.expected_success(schema['status_code'], resp.status)
+            self.expected_success(schema['status_code'], resp.status)
+
+            compiled = _get_compiled_schema(schema)
+            if not compiled.sample(rate):
+                return
 
             # Check the body of a response
-            body_schema = schema.get('response_body')
-            if body_schema:
+            if compiled.body_validator:
                 try:
-                    jsonschema.validate(body, body_schema,
-                                        cls=JSONSCHEMA_VALIDATOR,
-                                        format_checker=FORMAT_CHECKER)
+                    compiled.body_validator.validate(body)
                 except jsonschema.ValidationError as ex:
                     msg = ("HTTP response body is invalid (%s)") % ex
                     raise exceptions.InvalidHTTPResponseBody(msg)
@@ -836,17 +1203,42 @@ class RestClient(object):
                     raise exceptions.InvalidHTTPResponseBody(msg)
 
             # Check the header of a response
-            header_schema = schema.get('response_header')
-            if header_schema:
+            if compiled.header_validator:
                 try:
-                    jsonschema.validate(resp, header_schema,
-                                        cls=JSONSCHEMA_VALIDATOR,
-                                        format_checker=FORMAT_CHECKER)
+                    compiled.header_validator.validate(resp)
                 except jsonschema.ValidationError as ex:
                     msg = ("HTTP response header is invalid (%s)") % ex
                     raise exceptions.InvalidHTTPResponseHeader(msg)
 
 
+class BatchResult(object):
+    """The outcome of one of the calls of RestClient.map_requests"""
+
+    __slots__ = ('item', 'value', 'exc_info')
+
+    def __init__(self, item):
+        self.item = item
+        self.value = None
+        self.exc_info = None
+
+    def run(self, func):
+        try:
+            self.value = func(self.item)
+        except Exception:
+            self.exc_info = sys.exc_info()
+
+    @property
+    def exception(self):
+        """The exception raised by the call, None if it succeeded"""
+        return self.exc_info[1] if self.exc_info else None
+
+    def result(self):
+        """Return the value returned by the call, or raise its exception"""
+        if self.exc_info:
+            six.reraise(*self.exc_info)
+        return self.value
+
+
 class ResponseBody(dict):
     """Class that wraps an http response and dict body into a single value.
 
@@ -0,0 +1,202 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Retries and client side rate limiting of the API requests
+
+A RetryPolicy decides whether a failed request is sent again and after
+how long, a Throttle limits the rate of the requests sent to each API
+endpoint. RestClient uses them when they are passed to it, and they count
+what they do in STATS.
+"""
+
+import random
+import socket
+import threading
+import time
+
+from six.moves.urllib import parse as urlparse
+import urllib3
+
+from tempest.lib.common import http
+
+# Methods which can be sent again without side effects, RFC 7231 4.2.2
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS', 'TRACE')
+
+# Statuses telling that the service could not handle the request for now
+RETRY_STATUSES = (429, 502, 503, 504)
+
+# Errors raised when the service could not be reached, or closed the
+# connection before responding
+CONNECTION_ERRORS = (urllib3.exceptions.HTTPError, socket.error)
+
+
+class RetryStats(http.ConnectionStats):
+    """Thread safe counters of the retries and throttling delays
+
+    :ivar retries: requests sent again
+    :ivar retried_errors: retries after a connection error
+    :ivar retried_statuses: retries after a RETRY_STATUSES response
+    :ivar retry_delay: seconds slept before retrying
+    :ivar throttled: requests delayed by a Throttle
+    :ivar throttle_delay: seconds slept by throttled requests
+    """
+
+    FIELDS = ('retries', 'retried_errors', 'retried_statuses', 'retry_delay',
+              'throttled', 'throttle_delay')
+
+
+STATS = RetryStats()
+
+
+class RetryPolicy(object):
+    """When and after how long to send a failed request again
+
+    Idempotent requests are retried after a connection error or a
+    RETRY_STATUSES response, with a capped exponential backoff: the n-th
+    retry waits between half and all of ``min(max_backoff, backoff * 2**n)``
+    seconds, the random part spreading the retries of parallel workers. A
+    Retry-After header given in seconds is used instead, within the cap.
+
+    Subclasses can override retry_delay to change what is retried.
+
+    :param int max_retries: maximum number of times a request is sent again
+    :param float backoff: seconds waited before the first retry
+    :param float max_backoff: maximum seconds waited before a retry
+    :param tuple methods: the HTTP methods which are retried
+    :param tuple statuses: the response statuses which are retried
+    """
+
+    def __init__(self, max_retries=3, backoff=1.0, max_backoff=30.0,
+                 methods=IDEMPOTENT_METHODS, statuses=RETRY_STATUSES,
+                 stats=STATS):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.methods = methods
+        self.statuses = statuses
+        self.stats = stats
+
+    def backoff_delay(self, attempt):
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return random.uniform(delay / 2.0, delay)
+
+    def retry_delay(self, method, attempt, resp=None, error=None):
+        """Seconds to wait before sending a request again
+
+        :param str method: the HTTP method of the request
+        :param int attempt: the number of retries already done
+        :param resp: the response, when one was received
+        :param error: the exception raised, when no response was received
+        :return: the delay, or None if the request must not be retried
+        """
+        if attempt >= self.max_retries or method.upper() not in self.methods:
+            return None
+        if error is not None:
+            if not isinstance(error, CONNECTION_ERRORS):
+                return None
+            self.stats.incr('retried_errors')
+        elif resp.status in self.statuses:
+            self.stats.incr('retried_statuses')
+        else:
+            return None
+        delay = self._retry_after(resp)
+        if delay is None:
+            delay = self.backoff_delay(attempt)
+        self.stats.incr('retries')
+        self.stats.incr('retry_delay', delay)
+        return delay
+
+    def _retry_after(self, resp):
+        if resp is None:
+            return None
+        try:
+            return min(self.max_backoff, max(0, int(resp['retry-after'])))
+        except (KeyError, ValueError):
+            # Missing, or an HTTP date
+            return None
+
+
+class TokenBucket(object):
+    """Thread safe token bucket
+
+    Tokens are added at ``rate`` per second up to ``capacity``. A token is
+    taken for every request: when none is left the bucket goes in debt and
+    the caller is told how long to wait for its token, so that waiting
+    callers are served in order without holding the lock while they sleep.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._timestamp = time.time()
+        self._lock = threading.Lock()
+
+    def consume(self):
+        """Take a token
+
+        :return: seconds to wait before using the token
+        """
+        with self._lock:
+            now = time.time()
+            self._tokens = min(
+                self.capacity,
+                self._tokens + (now - self._timestamp) * self.rate)
+            self._timestamp = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0
+            return -self._tokens / self.rate
+
+
+class Throttle(object):
+    """Limit the rate of the requests sent to each API endpoint
+
+    One TokenBucket is kept per scheme and host:port, shared by all the
+    threads and clients using the Throttle.
+
+    :param float rate: requests per second allowed to each endpoint
+    :param int burst: requests which can be sent at once after an idle
+                      period, by default one second worth of requests
+    """
+
+    def __init__(self, rate, burst=None, stats=STATS):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.stats = stats
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, url):
+        parsed = urlparse.urlparse(url)
+        key = (parsed.scheme, parsed.netloc)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate,
+                                                          self.burst)
+            return bucket
+
+    def wait(self, url):
+        """Wait until a request can be sent to the endpoint of url
+
+        :return: the seconds waited
+        """
+        delay = self._bucket(url).consume()
+        if delay:
+            self.stats.incr('throttled')
+            self.stats.incr('throttle_delay', delay)
+            time.sleep(delay)
+        return delay
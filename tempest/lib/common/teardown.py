@@ -0,0 +1,145 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Parallel teardown of the resources of a test
+
+The resources are deleted by tasks, each with the name of the kind of
+resource it deletes and the names of the tasks which must be done before
+it starts, e.g. the volumes after the servers they are attached to. The
+TeardownExecutor runs the tasks from a bounded pool of threads, each as
+soon as the tasks it depends on are done, so that the teardown takes as
+long as the longest chain of dependent tasks rather than the sum of all
+the deletions.
+"""
+
+import threading
+
+from oslo_log import log as logging
+import six
+from six.moves import queue
+
+from tempest.lib.common import rest_client
+from tempest.lib.common.utils import misc as misc_utils
+
+LOG = logging.getLogger(__name__)
+
+# Default number of tasks run at the same time
+DEFAULT_MAX_WORKERS = 8
+
+
+class TeardownExecutor(object):
+    """Run teardown tasks concurrently, in the order of their dependencies
+
+    A task runs once all the tasks named in its after list are done,
+    whether they succeeded or not: a failed deletion should not prevent
+    the others from being attempted. Names with no task are ignored, so
+    that the dependencies can be declared whichever resources a test
+    created.
+
+    :param int max_workers: maximum number of tasks run at the same time,
+                            1 to run them one after another, each time the
+                            first one added whose dependencies are done
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        self.max_workers = max(1, max_workers)
+        self._tasks = []
+        self._lock = threading.Lock()
+
+    def add(self, name, func, after=()):
+        """Add a task
+
+        :param str name: name of the task, shared by the tasks deleting the
+                         same kind of resources
+        :param func: callable doing the deletion, without arguments
+        :param after: names of the tasks to be done before this one starts
+        """
+        with self._lock:
+            self._tasks.append((name, func, frozenset(after)))
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def _check_cycles(self, tasks):
+        names = set(name for name, _, _ in tasks)
+        after = {}
+        for name, _, depends in tasks:
+            after.setdefault(name, set()).update(depends & names)
+        done = set()
+        while after:
+            ready = [name for name, depends in after.items()
+                     if depends <= done]
+            if not ready:
+                raise ValueError('Teardown dependency cycle between %s' %
+                                 ', '.join(sorted(after)))
+            for name in ready:
+                done.add(name)
+                del after[name]
+
+    def run(self):
+        """Run all the tasks added and wait for them
+
+        The tasks run are removed, so that the executor can be reused. The
+        failures are logged, and the first one is raised once all the
+        tasks are done.
+
+        :return: a list of rest_client.BatchResult, whose items are the
+                 names of the tasks, in the order the tasks were added
+        """
+        with self._lock:
+            tasks, self._tasks = self._tasks, []
+        self._check_cycles(tasks)
+        results = [rest_client.BatchResult(name) for name, _, _ in tasks]
+        waiting = list(zip(tasks, results))
+        # Number of tasks of each name not done yet
+        remaining = {}
+        for name, _, _ in tasks:
+            remaining[name] = remaining.get(name, 0) + 1
+        done = queue.Queue()
+        caller_name = misc_utils.find_test_caller()
+
+        def worker(func, result):
+            with misc_utils.test_caller_context(caller_name):
+                result.run(lambda name: func())
+            done.put(result)
+
+        running = 0
+        while waiting or running:
+            for index, ((name, func, after), result) in enumerate(waiting):
+                if running >= self.max_workers:
+                    break
+                if any(remaining.get(dep) for dep in after):
+                    continue
+                waiting[index] = None
+                running += 1
+                if self.max_workers == 1:
+                    worker(func, result)
+                    continue
+                thread = threading.Thread(target=worker, args=(func, result))
+                thread.daemon = True
+                thread.start()
+            waiting = [task for task in waiting if task is not None]
+            result = done.get()
+            running -= 1
+            remaining[result.item] -= 1
+
+        for result in results:
+            if result.exc_info:
+                LOG.error('Teardown task %s failed', result.item,
+                          exc_info=result.exc_info)
+        for result in results:
+            if result.exc_info:
+                six.reraise(*result.exc_info)
+        return results
@@ -0,0 +1,121 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tokens shared by the test worker processes
+
+A FileTokenCache keeps the tokens fetched by the keystone auth providers in
+a directory, so that the test workers using the same credentials share
+their tokens instead of each asking keystone for one. See
+KeystoneAuthProvider._get_auth.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+from oslo_concurrency import lockutils
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+class FileTokenCache(object):
+    """Token cache with one file per set of credentials
+
+    The files are only readable by their owner, and each of them is
+    protected by a lock, held while a token is fetched so that the workers
+    and threads needing the same token wait for one of them to get it.
+
+    :param str path: the directory of the cache, created if needed
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.isdir(path):
+            try:
+                os.makedirs(path, 0o700)
+            except OSError:
+                # Created by another worker in the meantime
+                if not os.path.isdir(path):
+                    raise
+
+    @staticmethod
+    def key(auth_url, auth_params):
+        """The cache key of the token requested with auth_params
+
+        :param str auth_url: the keystone token URL
+        :param dict auth_params: the parameters of the token request, which
+                                 include the password: only their hash is
+                                 written
+        """
+        data = json.dumps([auth_url, sorted(auth_params.items())])
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, '%s.json' % key)
+
+    def lock(self, key):
+        """A lock for the token of key
+
+        The inter-process lock does not exclude the threads of a process,
+        so it is taken under an in-process one.
+        """
+        return lockutils.lock('token-%s' % key, external=True,
+                              lock_path=self.path)
+
+    def get(self, key):
+        """Return the cached (token, auth_data) of key, or None"""
+        try:
+            with open(self._file(key)) as token_file:
+                token, auth_data = json.load(token_file)
+        except (IOError, OSError, ValueError):
+            return None
+        return token, auth_data
+
+    def invalidate(self, key, token):
+        """Drop the cached token of key if it is still token
+
+        A token cached by another worker in the meantime is kept.
+        """
+        with self.lock(key):
+            auth_data = self.get(key)
+            if auth_data is None or auth_data[0] != token:
+                return
+            try:
+                os.remove(self._file(key))
+            except OSError:
+                LOG.warning('Failed to remove the token cache file %s',
+                            self._file(key), exc_info=True)
+
+    def set(self, key, auth_data):
+        """Cache a (token, auth_data) tuple
+
+        The file is written under a temporary name and then renamed, so
+        that readers never see a partial file.
+        """
+        path = self._file(key)
+        tmp_path = None
+        try:
+            # Only readable by its owner, and unique to the writer
+            fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+            with os.fdopen(fd, 'w') as token_file:
+                json.dump(list(auth_data), token_file)
+            os.rename(tmp_path, path)
+        except (IOError, OSError):
+            LOG.warning('Failed to write the token cache file %s', path,
+                        exc_info=True)
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
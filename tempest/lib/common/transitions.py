@@ -0,0 +1,197 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""State transitions of the resources waited for
+
+The waiters follow the state of their resource with a TransitionTracker,
+which passes a TransitionRecord to the callbacks registered with
+register_hook every time the state changes. TimelineCollector is a
+built-in callback which keeps the duration distribution of every
+transition and can write them, with the timeline of the transitions, to a
+JSON report when the process exits.
+"""
+
+import atexit
+import collections
+import json
+import os
+import threading
+import time
+
+from oslo_log import log as logging
+
+from tempest.lib.common import instrumentation
+
+LOG = logging.getLogger(__name__)
+
+# State of the deleted resources
+DELETED = 'DELETED'
+
+TransitionRecord = collections.namedtuple(
+    'TransitionRecord', ['resource_type', 'resource_id', 'from_state',
+                         'to_state', 'elapsed', 'timestamp', 'attributes'])
+"""A state change of a resource seen by a waiter
+
+:param resource_type: e.g. server, volume or stack
+:param resource_id: id of the resource
+:param from_state: the previous state, e.g. BUILD/spawning for a server
+:param to_state: the new state
+:param elapsed: seconds the resource was seen in from_state. The first
+                state seen by a waiter may have been entered before it
+                started, its duration is then a lower bound.
+:param timestamp: time at which the new state was seen
+:param attributes: dict of the attributes of the resource which explain
+                   its durations, e.g. the flavor or availability zone
+"""
+
+_hooks = []
+_hooks_lock = threading.Lock()
+
+
+def register_hook(callback):
+    """Call callback with a TransitionRecord after every state change
+
+    Callbacks are called in the thread of the waiter, they should be fast
+    and must not raise.
+    """
+    global _hooks
+    with _hooks_lock:
+        if callback not in _hooks:
+            # copy on write, so that emitting never needs the lock
+            _hooks = _hooks + [callback]
+
+
+def unregister_hook(callback):
+    global _hooks
+    with _hooks_lock:
+        _hooks = [hook for hook in _hooks if hook is not callback]
+
+
+def emit(record):
+    """Pass a TransitionRecord to all the registered callbacks"""
+    for hook in _hooks:
+        try:
+            hook(record)
+        except Exception:
+            LOG.exception('Transition hook %s failed', hook)
+
+
+class TransitionTracker(object):
+    """Follow the state of one resource during a wait
+
+    :param resource_type: type of the resource, e.g. server
+    :param resource_id: id of the resource
+    """
+
+    def __init__(self, resource_type, resource_id):
+        self.resource_type = resource_type
+        self.resource_id = resource_id
+        self.state = None
+        self.since = None
+
+    def observe(self, state, attributes=None):
+        """Record the current state of the resource
+
+        :param state: the state, e.g. a status, DELETED once deleted
+        :param attributes: dict of attributes of the resource, stored with
+                           the transition
+        :return: the TransitionRecord when the state changed, else None
+        """
+        now = time.time()
+        if self.since is None:
+            self.state, self.since = state, now
+            return None
+        if state == self.state:
+            return None
+        record = TransitionRecord(
+            resource_type=self.resource_type, resource_id=self.resource_id,
+            from_state=self.state, to_state=state, elapsed=now - self.since,
+            timestamp=now, attributes=attributes or {})
+        self.state, self.since = state, now
+        emit(record)
+        return record
+
+
+class TimelineCollector(object):
+    """Transition hook keeping the duration distribution per transition
+
+    Transitions are identified by resource type, from and to states.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.events = []
+
+    def __call__(self, record):
+        key = (record.resource_type, record.from_state, record.to_state)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = (
+                    instrumentation.LatencyHistogram())
+            histogram.add(record.elapsed)
+            self.events.append(record)
+
+    def report(self):
+        """Return the distributions, slowest p90 first, and the timeline"""
+        with self._lock:
+            items = [(key, histogram.as_dict())
+                     for key, histogram in self.histograms.items()]
+            events = list(self.events)
+        transitions = []
+        for (resource_type, from_state, to_state), durations in items:
+            entry = dict(resource_type=resource_type, from_state=from_state,
+                         to_state=to_state)
+            entry.update(durations)
+            transitions.append(entry)
+        transitions.sort(key=lambda entry: entry['p90'], reverse=True)
+        return {'transitions': transitions,
+                'events': [record._asdict() for record in events]}
+
+    def write_report(self, path):
+        with open(path, 'w') as report_file:
+            json.dump(self.report(), report_file, indent=2, sort_keys=True)
+
+
+_timeline_collector = None
+
+
+def enable_timeline_report(report_dir):
+    """Collect the state transitions and write them to a report at exit
+
+    The report is written to transitions-<pid>.json in report_dir, so that
+    parallel test workers do not overwrite each other's report. Calling
+    it more than once in a process has no further effect.
+
+    :param report_dir: directory in which the report is written
+    :return: the TimelineCollector in use
+    """
+    global _timeline_collector
+    with _hooks_lock:
+        if _timeline_collector is not None:
+            return _timeline_collector
+        _timeline_collector = TimelineCollector()
+    path = os.path.join(report_dir, 'transitions-%s.json' % os.getpid())
+    register_hook(_timeline_collector)
+    atexit.register(_write_timeline_report, _timeline_collector, path)
+    return _timeline_collector
+
+
+def _write_timeline_report(collector, path):
+    try:
+        collector.write_report(path)
+    except (IOError, OSError):
+        LOG.exception('Failed to write the transition report %s', path)
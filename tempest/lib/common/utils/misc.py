@@ -13,13 +13,20 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+import functools
 import inspect
 import re
+import threading
 
 from oslo_log import log as logging
 
 LOG = logging.getLogger(__name__)
 
+# Name of the test code running in the current thread, set by the test base
+# classes so that find_test_caller does not have to walk the stack.
+_test_context = threading.local()
+
 
 def singleton(cls):
     """Simple wrapper for classes that should only have a single instance."""
@@ -32,17 +39,61 @@ def singleton(cls):
     return getinstance
 
 
+def set_test_caller(caller_name):
+    """Set the name returned by find_test_caller in the current thread.
+
+    :param caller_name: "<test class>:<method>", or None to go back to
+                        finding the caller by walking the stack
+    :return: the name which was set before
+    """
+    previous = getattr(_test_context, 'caller_name', None)
+    _test_context.caller_name = caller_name
+    return previous
+
+
+@contextlib.contextmanager
+def test_caller_context(caller_name):
+    """Set the test caller name in the current thread for a block of code"""
+    previous = set_test_caller(caller_name)
+    try:
+        yield
+    finally:
+        set_test_caller(previous)
+
+
+def class_test_caller(method):
+    """Decorator setting the test caller for a class level method
+
+    For setUpClass and tearDownClass, to be applied under @classmethod.
+    """
+    @functools.wraps(method)
+    def wrapper(cls, *args, **kwargs):
+        with test_caller_context('%s:%s' % (cls.__name__, method.__name__)):
+            return method(cls, *args, **kwargs)
+    return wrapper
+
+
 def find_test_caller():
     """Find the caller class and test name.
 
-    Because we know that the interesting things that call us are
-    test_* methods, and various kinds of setUp / tearDown, we
-    can look through the call stack to find appropriate methods,
-    and the class we were in when those were called.
+    The test base classes record which test, setUp, tearDown or cleanup
+    is running with set_test_caller, in which case that name is returned
+    right away. Otherwise, because we know that the interesting things
+    that call us are test_* methods, and various kinds of setUp /
+    tearDown, we can look through the call stack to find appropriate
+    methods, and the class we were in when those were called.
     """
+    caller_name = getattr(_test_context, 'caller_name', None)
+    if caller_name is not None:
+        return caller_name
+    return _find_test_caller_in_stack()
+
+
+def _find_test_caller_in_stack():
     caller_name = None
     names = []
-    frame = inspect.currentframe()
+    # Skip the frame of find_test_caller as well as our own
+    frame = inspect.currentframe().f_back
     is_cleanup = False
     # Start climbing the ladder until we hit a good method
     while True:
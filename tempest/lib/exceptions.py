@@ -217,3 +217,8 @@ class SSHExecCommandFailed(TempestException):
     message = ("Command '%(command)s', exit status: %(exit_status)d, "
                "stderr:\n%(stderr)s\n"
                "stdout:\n%(stdout)s")
+
+
+class CassetteMiss(TempestException):
+    message = ("No response recorded for %(method)s %(url)s in the "
+               "cassette %(path)s")
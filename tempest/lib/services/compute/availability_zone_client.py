@@ -13,16 +13,18 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-from oslo_serialization import jsonutils as json
-
 from tempest.lib.api_schema.response.compute.v2_1 import availability_zone \
     as schema
+from tempest.lib.common import jsonutils as json
 from tempest.lib.common import rest_client
 from tempest.lib.services.compute import base_compute_client
 
 
 class AvailabilityZoneClient(base_compute_client.BaseComputeClient):
 
+    # The detailed listing has the state of the services, which changes
+    cacheable_urls = (r'os-availability-zone$',)
+
     def list_availability_zones(self, detail=False):
         url = 'os-availability-zone'
         schema_list = schema.list_availability_zone_list
@@ -19,6 +19,10 @@ from tempest.lib import exceptions
 
 COMPUTE_MICROVERSION = None
 
+# Schema selected for each schema_versions_info list and microversion, the
+# list is kept with the schema to make sure its id is not reused.
+_selected_schemas = {}
+
 
 class BaseComputeClient(rest_client.RestClient):
     """Base compute service clients class to support microversion.
@@ -48,9 +52,9 @@ class BaseComputeClient(rest_client.RestClient):
         return headers
 
     def request(self, method, url, extra_headers=False, headers=None,
-                body=None):
+                body=None, stream=False):
         resp, resp_body = super(BaseComputeClient, self).request(
-            method, url, extra_headers, headers, body)
+            method, url, extra_headers, headers, body, stream=stream)
         if (COMPUTE_MICROVERSION and
             COMPUTE_MICROVERSION != api_version_utils.LATEST_MICROVERSION):
             api_version_utils.assert_version_header_matches_request(
@@ -73,6 +77,16 @@ class BaseComputeClient(rest_client.RestClient):
             {'min': '2.2', 'max': '2.9', 'schema': schemav22},
             {'min': '2.10', 'max': None, 'schema': schemav210}]
         """
+        key = (id(schema_versions_info), COMPUTE_MICROVERSION)
+        selected = _selected_schemas.get(key)
+        if selected is not None and selected[0] is schema_versions_info:
+            return selected[1]
+        schema = self._select_schema(schema_versions_info)
+        _selected_schemas[key] = (schema_versions_info, schema)
+        return schema
+
+    @staticmethod
+    def _select_schema(schema_versions_info):
         schema = None
         version = api_version_request.APIVersionRequest(COMPUTE_MICROVERSION)
         for items in schema_versions_info:
@@ -13,9 +13,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-from oslo_serialization import jsonutils as json
-
 from tempest.lib.api_schema.response.compute.v2_1 import certificates as schema
+from tempest.lib.common import jsonutils as json
 from tempest.lib.common import rest_client
 from tempest.lib.services.compute import base_compute_client
 
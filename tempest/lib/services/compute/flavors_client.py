@@ -13,7 +13,6 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-from oslo_serialization import jsonutils as json
 from six.moves.urllib import parse as urllib
 
 from tempest.lib.api_schema.response.compute.v2_1 import flavors as schema
@@ -21,12 +20,15 @@ from tempest.lib.api_schema.response.compute.v2_1 import flavors_access \
     as schema_access
 from tempest.lib.api_schema.response.compute.v2_1 import flavors_extra_specs \
     as schema_extra_specs
+from tempest.lib.common import jsonutils as json
 from tempest.lib.common import rest_client
 from tempest.lib.services.compute import base_compute_client
 
 
 class FlavorsClient(base_compute_client.BaseComputeClient):
 
+    cacheable_urls = (r'flavors(/|\?|$)',)
+
     def list_flavors(self, detail=False, **params):
         url = 'flavors'
         _schema = schema.list_flavors
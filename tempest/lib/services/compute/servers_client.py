@@ -16,10 +16,10 @@
 
 import copy
 
-from oslo_serialization import jsonutils as json
 from six.moves.urllib import parse as urllib
 
 from tempest.lib.api_schema.response.compute.v2_1 import servers as schema
+from tempest.lib.common import jsonutils as json
 from tempest.lib.common import rest_client
 from tempest.lib.services.compute import base_compute_client
 
@@ -106,6 +106,30 @@ class ServersClient(base_compute_client.BaseComputeClient):
         self.validate_response(schema.delete_server, resp, body)
         return rest_client.ResponseBody(resp, body)
 
+    def show_servers(self, server_ids):
+        """Get the details of several servers concurrently.
+
+        :param server_ids: the ids of the servers
+        :return: the show_server response of each server, in the same order
+        :raises: the first error, in the order of server_ids, once all the
+                 requests are done
+        """
+        return [result.result() for result in
+                self.map_requests(self.show_server, server_ids)]
+
+    def delete_servers(self, server_ids):
+        """Delete several servers concurrently.
+
+        All the deletions are attempted even if some of them fail.
+
+        :param server_ids: the ids of the servers
+        :return: the delete_server response of each server, in the same order
+        :raises: the first error, in the order of server_ids, once all the
+                 requests are done
+        """
+        return [result.result() for result in
+                self.map_requests(self.delete_server, server_ids)]
+
     def list_servers(self, detail=False, **params):
         """List servers.
 
@@ -14,10 +14,10 @@
 
 import re
 
-from oslo_serialization import jsonutils as json
 from six.moves import urllib
 
 from tempest.lib.api_schema.response.compute.v2_1 import versions as schema
+from tempest.lib.common import jsonutils as json
 from tempest.lib.common import rest_client
 from tempest.lib.services.compute import base_compute_client
 
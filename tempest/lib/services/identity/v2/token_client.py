@@ -13,8 +13,8 @@
 #    under the License.
 
 from oslo_log import log as logging
-from oslo_serialization import jsonutils as json
 
+from tempest.lib.common import jsonutils as json
 from tempest.lib.common import rest_client
 from tempest.lib import exceptions
 
@@ -22,11 +22,11 @@ from tempest.lib import exceptions
 class TokenClient(rest_client.RestClient):
 
     def __init__(self, auth_url, disable_ssl_certificate_validation=None,
-                 ca_certs=None, trace_requests=None):
+                 ca_certs=None, trace_requests=None, **kwargs):
         dscv = disable_ssl_certificate_validation
         super(TokenClient, self).__init__(
             None, None, None, disable_ssl_certificate_validation=dscv,
-            ca_certs=ca_certs, trace_requests=trace_requests)
+            ca_certs=ca_certs, trace_requests=trace_requests, **kwargs)
 
         if auth_url is None:
             raise exceptions.IdentityError("Couldn't determine auth_url")
@@ -75,7 +75,7 @@ class TokenClient(rest_client.RestClient):
         return rest_client.ResponseBody(resp, body['access'])
 
     def request(self, method, url, extra_headers=False, headers=None,
-                body=None):
+                body=None, stream=False):
         """A simple HTTP request interface."""
         if headers is None:
             headers = self.get_headers(accept_type="json")
@@ -85,6 +85,8 @@ class TokenClient(rest_client.RestClient):
             except (ValueError, TypeError):
                 headers = self.get_headers(accept_type="json")
 
+        # NOTE: stream is ignored, token responses are always read in full
+        # to be parsed
         resp, resp_body = self.raw_request(url, method,
                                            headers=headers, body=body)
         self._log_request(method, url, resp, req_headers=headers,
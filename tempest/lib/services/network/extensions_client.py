@@ -15,6 +15,8 @@ from tempest.lib.services.network import base
 
 class ExtensionsClient(base.BaseNetworkClient):
 
+    cacheable_urls = (r'v2\.0/extensions(/|\?|$)',)
+
     def show_extension(self, ext_alias, **fields):
         uri = '/extensions/%s' % ext_alias
         return self.show_resource(uri, **fields)
@@ -17,6 +17,7 @@ from tempest.common import cred_provider
 from tempest import config
 from tempest import exceptions
 from tempest.lib import auth
+from tempest.lib.common import token_cache
 
 CONF = config.CONF
 
@@ -65,6 +66,9 @@ def get_auth_provider(credentials, pre_auth=False):
         'ca_certs': CONF.identity.ca_certificates_file,
         'trace_requests': CONF.debug.trace_requests
     }
+    if CONF.identity.token_cache_dir:
+        default_params['token_cache'] = token_cache.FileTokenCache(
+            CONF.identity.token_cache_dir)
     if credentials is None:
         raise exceptions.InvalidCredentials(
             'Credentials must be specified')
@@ -74,4 +78,6 @@ def get_auth_provider(credentials, pre_auth=False):
                                          **default_params)
     if pre_auth:
         _auth_provider.set_auth()
+    if CONF.identity.background_token_refresh:
+        auth.TOKEN_REFRESHER.register(_auth_provider)
     return _auth_provider
@@ -14,6 +14,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
 import subprocess
 
 import netaddr
@@ -27,6 +28,7 @@ from tempest.common.utils.linux import remote_client
 from tempest.common import waiters
 from tempest import config
 from tempest import exceptions
+from tempest.lib.common import teardown
 from tempest.lib.common.utils import misc as misc_utils
 from tempest.lib import exceptions as lib_exc
 from tempest.services.network import resources as net_resources
@@ -675,12 +677,34 @@ class NetworkScenarioTest(ScenarioTest):
 
     credentials = ['primary', 'admin']
 
+    # The kinds of network resources to delete before each kind
+    TEARDOWN_AFTER = {
+        'subnet': ('port',),
+        'network': ('subnet', 'port'),
+        'router': ('subnet', 'floating_ip'),
+        'security_group': ('port',),
+    }
+
     @classmethod
     def skip_checks(cls):
         super(NetworkScenarioTest, cls).skip_checks()
         if not CONF.service_available.neutron:
             raise cls.skipException('Neutron not available')
 
+    def setUp(self):
+        super(NetworkScenarioTest, self).setUp()
+        # The network resources are deleted together once the cleanups of
+        # the test are done, concurrently when they do not depend on each
+        # other
+        self.network_teardown = teardown.TeardownExecutor(
+            CONF.service_clients.teardown_max_workers)
+        self.addCleanup(self.network_teardown.run)
+
+    def _add_network_cleanup(self, kind, resource):
+        self.network_teardown.add(
+            kind, functools.partial(self.delete_wrapper, resource.delete),
+            after=self.TEARDOWN_AFTER.get(kind, ()))
+
     @classmethod
     def resource_setup(cls):
         super(NetworkScenarioTest, cls).resource_setup()
@@ -701,7 +725,7 @@ class NetworkScenarioTest(ScenarioTest):
             networks_client=networks_client, routers_client=routers_client,
             **result['network'])
         self.assertEqual(network.name, name)
-        self.addCleanup(self.delete_wrapper, network.delete)
+        self._add_network_cleanup('network', network)
         return network
 
     def _list_networks(self, *args, **kwargs):
@@ -794,7 +818,7 @@ class NetworkScenarioTest(ScenarioTest):
             subnets_client=subnets_client,
             routers_client=routers_client, **result['subnet'])
         self.assertEqual(subnet.cidr, str_cidr)
-        self.addCleanup(self.delete_wrapper, subnet.delete)
+        self._add_network_cleanup('subnet', subnet)
         return subnet
 
     def _create_port(self, network_id, client=None, namestart='port-quotatest',
@@ -809,7 +833,7 @@ class NetworkScenarioTest(ScenarioTest):
         self.assertIsNotNone(result, 'Unable to allocate port')
         port = net_resources.DeletablePort(ports_client=client,
                                            **result['port'])
-        self.addCleanup(self.delete_wrapper, port.delete)
+        self._add_network_cleanup('port', port)
         return port
 
     def _get_server_port_id_and_ip4(self, server, ip_addr=None):
@@ -860,7 +884,7 @@ class NetworkScenarioTest(ScenarioTest):
         floating_ip = net_resources.DeletableFloatingIp(
             client=client,
             **result['floatingip'])
-        self.addCleanup(self.delete_wrapper, floating_ip.delete)
+        self._add_network_cleanup('floating_ip', floating_ip)
         return floating_ip
 
     def _associate_floating_ip(self, floating_ip, server):
@@ -998,7 +1022,7 @@ class NetworkScenarioTest(ScenarioTest):
         self.assertEqual(secgroup.name, sg_name)
         self.assertEqual(tenant_id, secgroup.tenant_id)
         self.assertEqual(secgroup.description, sg_desc)
-        self.addCleanup(self.delete_wrapper, secgroup.delete)
+        self._add_network_cleanup('security_group', secgroup)
         return secgroup
 
     def _default_security_group(self, client=None, tenant_id=None):
@@ -1157,7 +1181,7 @@ class NetworkScenarioTest(ScenarioTest):
         router = net_resources.DeletableRouter(routers_client=client,
                                                **result['router'])
         self.assertEqual(router.name, name)
-        self.addCleanup(self.delete_wrapper, router.delete)
+        self._add_network_cleanup('router', router)
         return router
 
     def _update_router_admin_state(self, router, admin_state_up):
@@ -12,10 +12,10 @@
 
 import functools
 
-from oslo_serialization import jsonutils as json
 import six
 from six.moves.urllib import parse as urllib
 
+from tempest.lib.common import jsonutils as json
 from tempest.lib.common import rest_client
 
 
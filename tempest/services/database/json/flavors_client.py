@@ -13,9 +13,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-from oslo_serialization import jsonutils as json
 from six.moves import urllib
 
+from tempest.lib.common import jsonutils as json
 from tempest.lib.common import rest_client
 
 
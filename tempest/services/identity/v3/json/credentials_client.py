@@ -17,8 +17,7 @@
 http://developer.openstack.org/api-ref-identity-v3.html#credentials-v3
 """
 
-from oslo_serialization import jsonutils as json
-
+from tempest.lib.common import jsonutils as json
 from tempest.lib.common import rest_client
 
 
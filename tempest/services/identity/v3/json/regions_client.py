@@ -17,9 +17,9 @@
 http://developer.openstack.org/api-ref-identity-v3.html#regions-v3
 """
 
-from oslo_serialization import jsonutils as json
 from six.moves.urllib import parse as urllib
 
+from tempest.lib.common import jsonutils as json
 from tempest.lib.common import rest_client
 
 
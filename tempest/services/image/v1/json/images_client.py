@@ -19,12 +19,12 @@ import os
 import time
 
 from oslo_log import log as logging
-from oslo_serialization import jsonutils as json
 import six
 from six.moves.urllib import parse as urllib
 
 from tempest.common import glance_http
 from tempest import exceptions
+from tempest.lib.common import jsonutils as json
 from tempest.lib.common import rest_client
 from tempest.lib.common.utils import misc as misc_utils
 from tempest.lib import exceptions as lib_exc
@@ -205,9 +205,14 @@ class ImagesClient(rest_client.RestClient):
         body = self._image_meta_from_headers(resp)
         return rest_client.ResponseBody(resp, body)
 
-    def show_image(self, image_id):
+    def show_image(self, image_id, stream=False):
+        """Download the image data
+
+        With stream set to true the data is a http.StreamingBody to be read
+        in chunks, instead of the whole image loaded in memory.
+        """
         url = 'v1/images/%s' % image_id
-        resp, body = self.get(url)
+        resp, body = self.get(url, stream=stream)
         self.expected_success(200, resp.status)
         return rest_client.ResponseBodyData(resp, body)
 
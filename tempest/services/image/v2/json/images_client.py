@@ -13,10 +13,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-from oslo_serialization import jsonutils as json
 from six.moves.urllib import parse as urllib
 
 from tempest.common import glance_http
+from tempest.lib.common import jsonutils as json
 from tempest.lib.common import rest_client
 from tempest.lib import exceptions as lib_exc
 
@@ -124,9 +124,14 @@ class ImagesClientV2(rest_client.RestClient):
         self.expected_success(204, resp.status)
         return rest_client.ResponseBody(resp, body)
 
-    def show_image_file(self, image_id):
+    def show_image_file(self, image_id, stream=False):
+        """Download the image data
+
+        With stream set to true the data is a http.StreamingBody to be read
+        in chunks, instead of the whole image loaded in memory.
+        """
         url = 'v2/images/%s/file' % image_id
-        resp, body = self.get(url)
+        resp, body = self.get(url, stream=stream)
         self.expected_success(200, resp.status)
         return rest_client.ResponseBodyData(resp, body)
 
@@ -77,8 +77,13 @@ class ObjectClient(rest_client.RestClient):
         self.expected_success(200, resp.status)
         return resp, body
 
-    def get_object(self, container, object_name, metadata=None):
-        """Retrieve object's data."""
+    def get_object(self, container, object_name, metadata=None,
+                   stream=False):
+        """Retrieve object's data.
+
+        With stream set to true the data is returned as a http.StreamingBody
+        to be read in chunks, instead of being loaded in memory.
+        """
 
         headers = {}
         if metadata:
@@ -86,7 +91,7 @@ class ObjectClient(rest_client.RestClient):
                 headers[str(key)] = metadata[key]
 
         url = "{0}/{1}".format(container, object_name)
-        resp, body = self.get(url, headers=headers)
+        resp, body = self.get(url, headers=headers, stream=stream)
         self.expected_success([200, 206], resp.status)
         return resp, body
 
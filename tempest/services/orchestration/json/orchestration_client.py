@@ -14,13 +14,14 @@
 #    under the License.
 
 import re
-import time
 
-from oslo_serialization import jsonutils as json
 from six.moves.urllib import parse as urllib
 
 from tempest import exceptions
+from tempest.lib.common import jsonutils as json
+from tempest.lib.common import polling
 from tempest.lib.common import rest_client
+from tempest.lib.common import transitions
 from tempest.lib import exceptions as lib_exc
 
 
@@ -154,32 +155,39 @@ class OrchestrationClient(rest_client.RestClient):
     def wait_for_stack_status(self, stack_identifier, status,
                               failure_pattern='^.*_FAILED$'):
         """Waits for a Stack to reach a given status."""
-        start = int(time.time())
         fail_regexp = re.compile(failure_pattern)
+        tracker = transitions.TransitionTracker('stack', stack_identifier)
 
-        while True:
+        def _fetch():
             try:
                 body = self.show_stack(stack_identifier)['stack']
             except lib_exc.NotFound:
                 if status == 'DELETE_COMPLETE':
-                    return
-            stack_name = body['stack_name']
-            stack_status = body['stack_status']
-            if stack_status == status:
-                return body
-            if fail_regexp.search(stack_status):
+                    tracker.observe(transitions.DELETED)
+                    return None
+                raise
+            tracker.observe(body['stack_status'])
+            if (body['stack_status'] != status and
+                    fail_regexp.search(body['stack_status'])):
                 raise exceptions.StackBuildErrorException(
                     stack_identifier=stack_identifier,
-                    stack_status=stack_status,
+                    stack_status=body['stack_status'],
                     stack_status_reason=body['stack_status_reason'])
+            return body
 
-            if int(time.time()) - start >= self.build_timeout:
-                message = ('Stack %s failed to reach %s status (current: %s) '
-                           'within the required time (%s s).' %
-                           (stack_name, status, stack_status,
-                            self.build_timeout))
-                raise exceptions.TimeoutException(message)
-            time.sleep(self.build_interval)
+        def _on_timeout(body):
+            message = ('Stack %s failed to reach %s status (current: %s) '
+                       'within the required time (%s s).' %
+                       (body['stack_name'], status, body['stack_status'],
+                        self.build_timeout))
+            raise exceptions.TimeoutException(message)
+
+        def _done(body):
+            return body is None or body['stack_status'] == status
+
+        return polling.wait_until(_fetch, _done, self.build_timeout,
+                                  self.build_interval,
+                                  on_timeout=_on_timeout)
 
     def show_resource_metadata(self, stack_identifier, resource_name):
         """Returns the resource's metadata."""
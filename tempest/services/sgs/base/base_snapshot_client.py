@@ -10,10 +10,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-from oslo_serialization import jsonutils as json
 import six
 from six.moves.urllib import parse as urllib
 from tempest.common.utils import data_utils
+from tempest.lib.common import jsonutils as json
 from tempest.lib.common import rest_client
 from tempest import config
 CONF = config.CONF
@@ -13,12 +13,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import time
-
-from oslo_serialization import jsonutils as json
-
 from tempest import exceptions
+from tempest.lib.common import jsonutils as json
+from tempest.lib.common import polling
 from tempest.lib.common import rest_client
+from tempest.lib.common import transitions
 from tempest.lib import exceptions as lib_exc
 
 
@@ -83,32 +82,41 @@ class BaseBackupsClient(rest_client.RestClient):
 
     def wait_for_backup_status(self, backup_id, status):
         """Waits for a Backup to reach a given status."""
-        body = self.show_backup(backup_id)['backup']
-        backup_status = body['status']
-        start = int(time.time())
+        tracker = transitions.TransitionTracker('backup', backup_id)
 
-        while backup_status != status:
-            time.sleep(self.build_interval)
+        def _fetch():
             body = self.show_backup(backup_id)['backup']
-            backup_status = body['status']
-            if backup_status == 'error':
+            tracker.observe(body['status'], {'size': body.get('size')})
+            return body
+
+        def _check(body):
+            if body['status'] == 'error':
                 raise exceptions.VolumeBackupException(backup_id=backup_id)
 
-            if int(time.time()) - start >= self.build_timeout:
-                message = ('Volume backup %s failed to reach %s status '
-                           '(current %s) within the required time (%s s).' %
-                           (backup_id, status, backup_status,
-                            self.build_timeout))
-                raise exceptions.TimeoutException(message)
+        def _on_timeout(body):
+            message = ('Volume backup %s failed to reach %s status '
+                       '(current %s) within the required time (%s s).' %
+                       (backup_id, status, body['status'],
+                        self.build_timeout))
+            raise exceptions.TimeoutException(message)
+
+        polling.wait_until(_fetch,
+                           lambda body: body['status'] == status,
+                           self.build_timeout, self.build_interval,
+                           check=_check, on_timeout=_on_timeout)
 
     def wait_for_backup_deletion(self, backup_id):
         """Waits for backup deletion"""
-        start_time = int(time.time())
-        while True:
+        def _deleted():
             try:
                 self.show_backup(backup_id)
             except lib_exc.NotFound:
-                return
-            if int(time.time()) - start_time >= self.build_timeout:
-                raise exceptions.TimeoutException
-            time.sleep(self.build_interval)
+                return True
+            return False
+
+        def _on_timeout(deleted):
+            raise exceptions.TimeoutException
+
+        polling.wait_until(_deleted, bool,
+                           self.build_timeout, self.build_interval,
+                           on_timeout=_on_timeout)
@@ -12,11 +12,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import time
-
-from oslo_serialization import jsonutils as json
-
 from tempest import exceptions
+from tempest.lib.common import jsonutils as json
+from tempest.lib.common import polling
 from tempest.lib.common import rest_client
 from tempest.lib import exceptions as lib_exc
 
@@ -45,27 +43,26 @@ class BaseQosSpecsClient(rest_client.RestClient):
         args = volume-type-id disassociated when operation = 'disassociate'
         args = None when operation = 'disassociate-all'
         """
-        start_time = int(time.time())
-        while True:
+        def _completed():
             if operation == 'qos-key-unset':
                 body = self.show_qos(qos_id)['qos_specs']
-                if not any(key in body['specs'] for key in args):
-                    return
+                return not any(key in body['specs'] for key in args)
             elif operation == 'disassociate':
                 body = self.show_association_qos(qos_id)['qos_associations']
-                if not any(args in body[i]['id'] for i in range(0, len(body))):
-                    return
+                return not any(args in body[i]['id']
+                               for i in range(0, len(body)))
             elif operation == 'disassociate-all':
                 body = self.show_association_qos(qos_id)['qos_associations']
-                if not body:
-                    return
+                return not body
             else:
                 msg = (" operation value is either not defined or incorrect.")
                 raise lib_exc.UnprocessableEntity(msg)
 
-            if int(time.time()) - start_time >= self.build_timeout:
-                raise exceptions.TimeoutException
-            time.sleep(self.build_interval)
+        def _on_timeout(completed):
+            raise exceptions.TimeoutException
+
+        polling.wait_until(_completed, bool, self.build_timeout,
+                           self.build_interval, on_timeout=_on_timeout)
 
     def create_qos(self, **kwargs):
         """Create a QoS Specification.
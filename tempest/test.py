@@ -18,7 +18,6 @@ import functools
 import os
 import re
 import sys
-import time
 import uuid
 
 import fixtures
@@ -38,6 +37,9 @@ import tempest.common.generator.valid_generator as valid
 import tempest.common.validation_resources as vresources
 from tempest import config
 from tempest import exceptions
+from tempest.lib import base as lib_base
+from tempest.lib.common import polling
+from tempest.lib.common.utils import misc as misc_utils
 from tempest.lib import decorators
 
 LOG = logging.getLogger(__name__)
@@ -207,7 +209,8 @@ def validate_tearDownClass():
 atexit.register(validate_tearDownClass)
 
 
-class BaseTestCase(testtools.testcase.WithAttributes,
+class BaseTestCase(lib_base.TestCallerMixin,
+                   testtools.testcase.WithAttributes,
                    testtools.TestCase):
     """The test base class defines Tempest framework for class level fixtures.
 
@@ -253,6 +256,7 @@ class BaseTestCase(testtools.testcase.WithAttributes,
     TIMEOUT_SCALING_FACTOR = 1
 
     @classmethod
+    @misc_utils.class_test_caller
     def setUpClass(cls):
         # It should never be overridden by descendants
         if hasattr(super(BaseTestCase, cls), 'setUpClass'):
@@ -282,6 +286,7 @@ class BaseTestCase(testtools.testcase.WithAttributes,
                 del trace  # to avoid circular refs
 
     @classmethod
+    @misc_utils.class_test_caller
     def tearDownClass(cls):
         at_exit_set.discard(cls)
         # It should never be overridden by descendants
@@ -880,11 +885,7 @@ def call_until_true(func, duration, sleep_for):
     :param sleep_for: The number of seconds to sleep after an unsuccessful
                       invocation of the function.
     """
-    now = time.time()
-    timeout = now + duration
-    while now < timeout:
-        if func():
-            return True
-        time.sleep(sleep_for)
-        now = time.time()
-    return False
+    if duration <= 0:
+        return False
+    return bool(polling.wait_until(func, bool, duration, sleep_for,
+                                   on_timeout=lambda result: False))
@@ -0,0 +1,29 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from tempest.cmd import fake_cloud
+from tempest.tests.lib import base
+
+
+class TestFakeCloudCommand(base.TestCase):
+
+    def test_parse_delay(self):
+        self.assertEqual(('server:BUILD', 2.5),
+                         fake_cloud.parse_delay('server:BUILD=2.5'))
+
+    def test_parse_invalid_delay(self):
+        self.assertRaises(ValueError, fake_cloud.parse_delay, 'server=2')
+        self.assertRaises(ValueError, fake_cloud.parse_delay,
+                          'server:BUILD=soon')
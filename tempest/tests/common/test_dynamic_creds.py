@@ -16,6 +16,7 @@ import mock
 from oslo_config import cfg
 from oslotest import mockpatch
 
+from tempest.common import cred_provider
 from tempest.common import credentials_factory as credentials
 from tempest.common import dynamic_creds
 from tempest import config
@@ -586,3 +587,298 @@ class TestDynamicCredentialProvider(base.TestCase):
         self._mock_tenant_create('1234', 'fake_prim_tenant')
         self.assertRaises(exceptions.InvalidConfiguration,
                           creds.get_primary_creds)
+
+    def _fake_pooled_creds(self, id):
+        creds = credentials.get_credentials(
+            fill_in=False, identity_version='v2',
+            username='fake_pool_user', password='fake_password',
+            tenant_name='fake_pool_tenant', user_id=id, tenant_id=id)
+        return cred_provider.TestResources(creds)
+
+    @mock.patch('tempest.lib.common.rest_client.RestClient')
+    def test_primary_creds_from_pool(self, MockRestClient):
+        cfg.CONF.set_default('neutron', False, 'service_available')
+        pool = mock.Mock()
+        pool.get.return_value = self._fake_pooled_creds('1234')
+        creds = dynamic_creds.DynamicCredentialProvider(pool=pool,
+                                                        **self.fixed_params)
+        with mock.patch.object(creds, '_create_creds') as create_mock:
+            primary_creds = creds.get_primary_creds()
+        self.assertFalse(create_mock.called)
+        self.assertEqual('fake_pool_user', primary_creds.username)
+        self.assertIs(primary_creds, creds.get_primary_creds())
+        pool.get.assert_called_once_with(admin=False, roles=None)
+
+    @mock.patch('tempest.lib.common.rest_client.RestClient')
+    def test_admin_creds_from_pool(self, MockRestClient):
+        cfg.CONF.set_default('neutron', False, 'service_available')
+        pool = mock.Mock()
+        pool.get.return_value = self._fake_pooled_creds('1234')
+        creds = dynamic_creds.DynamicCredentialProvider(pool=pool,
+                                                        **self.fixed_params)
+        with mock.patch.object(json_roles_client.RolesClient,
+                               'assign_user_role') as user_mock:
+            admin_creds = creds.get_admin_creds()
+        # The admin credentials of the pool already have the admin role
+        self.assertFalse(user_mock.called)
+        pool.get.assert_called_once_with(admin=True, roles=None)
+        self.assertEqual('1234', admin_creds.user_id)
+
+    @mock.patch('tempest.lib.common.rest_client.RestClient')
+    def test_role_creds_from_pool(self, MockRestClient):
+        cfg.CONF.set_default('neutron', False, 'service_available')
+        pool = mock.Mock()
+        pool.get.return_value = self._fake_pooled_creds('1234')
+        creds = dynamic_creds.DynamicCredentialProvider(pool=pool,
+                                                        **self.fixed_params)
+        role_creds = creds.get_creds_by_roles(['role1', 'role2'])
+        self.assertEqual('1234', role_creds.user_id)
+        pool.get.assert_called_once_with(admin=False, roles=mock.ANY)
+        self.assertEqual(['role1', 'role2'],
+                         sorted(pool.get.call_args[1]['roles']))
+
+    @mock.patch('tempest.lib.common.rest_client.RestClient')
+    def test_empty_pool(self, MockRestClient):
+        cfg.CONF.set_default('neutron', False, 'service_available')
+        pool = mock.Mock()
+        pool.get.return_value = None
+        creds = dynamic_creds.DynamicCredentialProvider(pool=pool,
+                                                        **self.fixed_params)
+        self._mock_assign_user_role()
+        self._mock_list_role()
+        self._mock_tenant_create('1234', 'fake_prim_tenant')
+        self._mock_user_create('1234', 'fake_prim_user')
+        primary_creds = creds.get_primary_creds()
+        self.assertEqual('fake_prim_user', primary_creds.username)
+
+    @mock.patch('tempest.lib.common.rest_client.RestClient')
+    def test_recycle_creds(self, MockRestClient):
+        cfg.CONF.set_default('neutron', False, 'service_available')
+        pool = mock.Mock(recycle=True)
+        pool.get.side_effect = [self._fake_pooled_creds('1234'),
+                                self._fake_pooled_creds('12345')]
+        # The pool only has room for the first set
+        pool.wants.return_value = True
+        pool.put.side_effect = [True, False]
+        creds = dynamic_creds.DynamicCredentialProvider(pool=pool,
+                                                        **self.fixed_params)
+        primary_creds = creds.get_primary_creds()
+        alt_creds = creds.get_alt_creds()
+        self.useFixture(mockpatch.PatchObject(
+            creds, '_leftover_resources', return_value=[]))
+        user_mock = self.patch(
+            'tempest.services.identity.v2.json.users_client.'
+            'UsersClient.delete_user')
+        self.patch('tempest.services.identity.v2.json.tenants_client.'
+                   'TenantsClient.delete_tenant')
+        creds.clear_creds()
+        pool.put.assert_has_calls([mock.call(primary_creds),
+                                   mock.call(alt_creds)])
+        pool.discard.assert_called_once_with()
+        user_mock.assert_called_once_with('12345')
+
+    @mock.patch('tempest.lib.common.rest_client.RestClient')
+    def test_full_pool_not_scrubbed(self, MockRestClient):
+        cfg.CONF.set_default('neutron', False, 'service_available')
+        pool = mock.Mock(recycle=True)
+        pool.get.return_value = self._fake_pooled_creds('1234')
+        pool.wants.return_value = False
+        creds = dynamic_creds.DynamicCredentialProvider(pool=pool,
+                                                        **self.fixed_params)
+        creds.get_primary_creds()
+        leftovers_mock = self.useFixture(mockpatch.PatchObject(
+            creds, '_leftover_resources', return_value=[])).mock
+        user_mock = self.patch(
+            'tempest.services.identity.v2.json.users_client.'
+            'UsersClient.delete_user')
+        self.patch('tempest.services.identity.v2.json.tenants_client.'
+                   'TenantsClient.delete_tenant')
+        creds.clear_creds()
+        self.assertFalse(leftovers_mock.called)
+        self.assertFalse(pool.put.called)
+        pool.discard.assert_called_once_with()
+        user_mock.assert_called_once_with('1234')
+
+    @mock.patch('tempest.lib.common.rest_client.RestClient')
+    def test_leftovers_not_recycled(self, MockRestClient):
+        cfg.CONF.set_default('neutron', False, 'service_available')
+        pool = mock.Mock(recycle=True)
+        pool.get.return_value = self._fake_pooled_creds('1234')
+        pool.wants.return_value = True
+        creds = dynamic_creds.DynamicCredentialProvider(pool=pool,
+                                                        **self.fixed_params)
+        creds.get_primary_creds()
+        self.useFixture(mockpatch.PatchObject(
+            creds, '_leftover_resources', return_value=['volume 42']))
+        user_mock = self.patch(
+            'tempest.services.identity.v2.json.users_client.'
+            'UsersClient.delete_user')
+        self.patch('tempest.services.identity.v2.json.tenants_client.'
+                   'TenantsClient.delete_tenant')
+        creds.clear_creds()
+        self.assertFalse(pool.put.called)
+        pool.discard.assert_called_once_with()
+        user_mock.assert_called_once_with('1234')
+
+    @mock.patch('tempest.lib.common.rest_client.RestClient')
+    def test_leftover_resources(self, MockRestClient):
+        cfg.CONF.set_default('neutron', True, 'service_available')
+        for service in ('nova', 'cinder', 'glance'):
+            cfg.CONF.set_default(service, True, 'service_available')
+        creds = dynamic_creds.DynamicCredentialProvider(**self.fixed_params)
+        creds.ports_admin_client = mock.Mock()
+        creds.ports_admin_client.list_ports.return_value = {'ports': [
+            {'id': 'router-port', 'device_owner': 'network:router_interface'},
+            {'id': 'dhcp-port', 'device_owner': 'network:dhcp'},
+            {'id': 'vip-port', 'device_owner': ''}]}
+        manager_mock = self.patch('tempest.clients.Manager')
+        os = manager_mock.return_value
+        os.servers_client.list_servers.return_value = {'servers': []}
+        os.keypairs_client.list_keypairs.return_value = {
+            'keypairs': [{'keypair': {'name': 'key'}}]}
+        os.volumes_v2_client.list_volumes.return_value = {
+            'volumes': [{'id': 'vol'}]}
+        os.snapshots_v2_client.list_snapshots.return_value = {
+            'snapshots': []}
+        os.image_client_v2.list_images.return_value = {
+            'images': [{'id': 'img'}]}
+        pooled = self._fake_pooled_creds('1234')
+        self.assertEqual(['port vip-port', 'keypair key', 'volume vol',
+                          'image img'], creds._leftover_resources(pooled))
+        manager_mock.assert_called_once_with(pooled.credentials)
+        os.image_client_v2.list_images.assert_called_once_with(
+            params={'owner': '1234'})
+
+
+class TestDynamicCredentialPool(base.TestCase):
+
+    def setUp(self):
+        super(TestDynamicCredentialPool, self).setUp()
+        self.provider = mock.Mock()
+        self.provider.identity_admin_client.map_requests.side_effect = (
+            lambda func, items: [func(item) for item in items])
+        self.created = []
+
+        def provision(admin=False, roles=None):
+            name = 'creds-%s' % len(self.created)
+            if admin:
+                name = 'admin-' + name
+            if roles:
+                name = '-'.join(roles) + '-' + name
+            self.created.append(name)
+            return self.created[-1]
+
+        self.provider._provision_creds.side_effect = provision
+
+    def _wait(self, pool):
+        with pool._cond:
+            while any(pool._pending.values()):
+                pool._cond.wait()
+
+    def _ready(self, pool, admin=False, roles=None):
+        return list(pool._ready[pool._kind(admin, roles)])
+
+    def test_fill(self):
+        pool = dynamic_creds.DynamicCredentialPool(self.provider, 3)
+        pool.fill()
+        self._wait(pool)
+        self.assertEqual(['creds-0', 'creds-1', 'creds-2'],
+                         self._ready(pool))
+        pool.fill()
+        self._wait(pool)
+        self.assertEqual(3, len(self.created))
+
+    def test_get_refills(self):
+        pool = dynamic_creds.DynamicCredentialPool(self.provider, 2)
+        pool.fill()
+        self.assertEqual('creds-0', pool.get())
+        self._wait(pool)
+        self.assertEqual(['creds-1', 'creds-2'], self._ready(pool))
+
+    def test_kinds_kept_apart(self):
+        pool = dynamic_creds.DynamicCredentialPool(self.provider, 1)
+        pool.fill()
+        self._wait(pool)
+        # The first request of a kind starts filling it
+        self.assertIsNone(pool.get(roles=['b', 'a']))
+        self._wait(pool)
+        self.assertIsNone(pool.get(admin=True))
+        self._wait(pool)
+        self.assertEqual('a-b-creds-1', pool.get(roles=['a', 'b']))
+        self.assertEqual('admin-creds-2', pool.get(admin=True))
+        self.assertEqual('creds-0', pool.get())
+        self.provider._provision_creds.assert_any_call(
+            admin=False, roles=['a', 'b'])
+
+    def test_put_primary_only(self):
+        pool = dynamic_creds.DynamicCredentialPool(self.provider, 1)
+        self.assertTrue(pool.put('recycled'))
+        self.assertIsNone(pool.get(admin=True))
+        self._wait(pool)
+        self.assertEqual('recycled', pool.get())
+
+    def test_get_provisioning_failure(self):
+        self.provider._provision_creds.side_effect = Exception('boom')
+        pool = dynamic_creds.DynamicCredentialPool(self.provider, 1)
+        pool.fill()
+        self.assertIsNone(pool.get())
+
+    def test_put(self):
+        pool = dynamic_creds.DynamicCredentialPool(self.provider, 1)
+        self.assertTrue(pool.put('recycled'))
+        self.assertFalse(pool.put('other'))
+        self.assertEqual('recycled', pool.get())
+
+    def test_recycle(self):
+        pool = dynamic_creds.DynamicCredentialPool(self.provider, 2,
+                                                   recycle=True)
+        pool.fill()
+        self._wait(pool)
+        self.assertEqual('creds-0', pool.get())
+        self._wait(pool)
+        # The set taken is expected back rather than replaced
+        self.assertEqual(['creds-1'], self._ready(pool))
+        self.assertTrue(pool.wants())
+        self.assertTrue(pool.put('creds-0'))
+        self.assertEqual(['creds-1', 'creds-0'], self._ready(pool))
+        self.assertFalse(pool.wants())
+        self.assertFalse(pool.put('other'))
+        self.assertEqual(['creds-0', 'creds-1'], self.created)
+
+    def test_recycle_discard(self):
+        pool = dynamic_creds.DynamicCredentialPool(self.provider, 1,
+                                                   recycle=True)
+        pool.fill()
+        self._wait(pool)
+        self.assertEqual('creds-0', pool.get())
+        self._wait(pool)
+        self.assertEqual([], self._ready(pool))
+        pool.discard()
+        self._wait(pool)
+        self.assertEqual(['creds-1'], self._ready(pool))
+        self.assertFalse(pool.wants())
+
+    def test_drain(self):
+        pool = dynamic_creds.DynamicCredentialPool(self.provider, 2)
+        pool.fill()
+        self._wait(pool)
+        pool.drain()
+        self.provider._delete_creds.assert_has_calls([
+            mock.call('creds-0'), mock.call('creds-1')])
+        self.assertIsNone(pool.get())
+        self.assertFalse(pool.put('recycled'))
+
+    @mock.patch('atexit.register')
+    @mock.patch.object(dynamic_creds.DynamicCredentialPool, 'fill')
+    @mock.patch.object(dynamic_creds, 'DynamicCredentialProvider')
+    def test_get_pool(self, provider_mock, fill_mock, register_mock):
+        self.useFixture(mockpatch.PatchObject(dynamic_creds, '_pools', {}))
+        admin_creds = mock.Mock(username='admin', project_name='admin')
+        pool = dynamic_creds.get_pool('v3', admin_creds, 2,
+                                      network_resources={'router': False})
+        self.assertIs(pool, dynamic_creds.get_pool(
+            'v3', admin_creds, 2, network_resources={'router': False}))
+        self.assertIsNot(pool, dynamic_creds.get_pool('v3', admin_creds, 2))
+        self.assertEqual(2, provider_mock.call_count)
+        self.assertEqual(2, fill_mock.call_count)
+        register_mock.assert_any_call(pool.drain)
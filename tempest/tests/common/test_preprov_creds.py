@@ -12,9 +12,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import copy
+import errno
+import fcntl
 import hashlib
 import os
+import socket
+import stat
 
+import fixtures
 import mock
 from oslo_concurrency.fixture import lockutils as lockutils_fixtures
 from oslo_config import cfg
@@ -117,92 +123,138 @@ class TestPreProvisionedCredentials(base.TestCase):
             self.assertIn(hash, hash_dict['creds'].keys())
             self.assertIn(hash_dict['creds'][hash], self.test_accounts)
 
+    def _lock_dir_provider(self):
+        lock_dir = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                'test_accounts')
+        params = dict(self.fixed_params, accounts_lock_dir=lock_dir)
+        return preprov_creds.PreProvisionedCredentialProvider(**params)
+
+    def _lock(self, lock_dir, hash, content):
+        if not os.path.isdir(lock_dir):
+            os.mkdir(lock_dir)
+        with open(os.path.join(lock_dir, hash), 'w') as lock_file:
+            lock_file.write(content)
+
     def test_create_hash_file_previous_file(self):
-        # Emulate the lock existing on the filesystem
-        self.useFixture(mockpatch.Patch('os.path.isfile', return_value=True))
-        with mock.patch('six.moves.builtins.open', mock.mock_open(),
-                        create=True):
-            test_account_class = (
-                preprov_creds.PreProvisionedCredentialProvider(
-                    **self.fixed_params))
-            res = test_account_class._create_hash_file('12345')
+        test_account_class = self._lock_dir_provider()
+        self._lock(test_account_class.accounts_dir, '12345', 'other class')
+        res = test_account_class._create_hash_file('12345')
         self.assertFalse(res, "_create_hash_file should return False if the "
                          "pseudo-lock file already exists")
 
     def test_create_hash_file_no_previous_file(self):
-        # Emulate the lock not existing on the filesystem
-        self.useFixture(mockpatch.Patch('os.path.isfile', return_value=False))
-        with mock.patch('six.moves.builtins.open', mock.mock_open(),
-                        create=True):
-            test_account_class = (
-                preprov_creds.PreProvisionedCredentialProvider(
-                    **self.fixed_params))
-            res = test_account_class._create_hash_file('12345')
+        test_account_class = self._lock_dir_provider()
+        res = test_account_class._create_hash_file('12345')
         self.assertTrue(res, "_create_hash_file should return True if the "
                         "pseudo-lock doesn't already exist")
+        self.assertEqual(
+            ('test class', os.getpid(), socket.gethostname()),
+            test_account_class._read_hash_file('12345'))
 
-    @mock.patch('oslo_concurrency.lockutils.lock')
-    def test_get_free_hash_no_previous_accounts(self, lock_mock):
-        # Emulate no pre-existing lock
-        self.useFixture(mockpatch.Patch('os.path.isdir', return_value=False))
+    def test_get_free_hash_no_previous_accounts(self):
         hash_list = self._get_hash_list(self.test_accounts)
-        mkdir_mock = self.useFixture(mockpatch.Patch('os.mkdir'))
-        self.useFixture(mockpatch.Patch('os.path.isfile', return_value=False))
-        test_account_class = preprov_creds.PreProvisionedCredentialProvider(
-            **self.fixed_params)
-        with mock.patch('six.moves.builtins.open', mock.mock_open(),
-                        create=True) as open_mock:
-            test_account_class._get_free_hash(hash_list)
-            lock_path = os.path.join(self.fixed_params['accounts_lock_dir'],
-                                     hash_list[0])
-            open_mock.assert_called_once_with(lock_path, 'w')
-        mkdir_path = os.path.join(self.fixed_params['accounts_lock_dir'])
-        mkdir_mock.mock.assert_called_once_with(mkdir_path)
-
-    @mock.patch('oslo_concurrency.lockutils.lock')
-    def test_get_free_hash_no_free_accounts(self, lock_mock):
+        test_account_class = self._lock_dir_provider()
+        free_hash = test_account_class._get_free_hash(hash_list)
+        self.assertIn(free_hash, hash_list)
+        self.assertEqual([free_hash],
+                         os.listdir(test_account_class.accounts_dir))
+
+    def test_get_free_hash_no_free_accounts(self):
         hash_list = self._get_hash_list(self.test_accounts)
-        # Emulate pre-existing lock dir
-        self.useFixture(mockpatch.Patch('os.path.isdir', return_value=True))
-        # Emulate all lcoks in list are in use
-        self.useFixture(mockpatch.Patch('os.path.isfile', return_value=True))
-        test_account_class = preprov_creds.PreProvisionedCredentialProvider(
-            **self.fixed_params)
-        with mock.patch('six.moves.builtins.open', mock.mock_open(),
-                        create=True):
-            self.assertRaises(lib_exc.InvalidCredentials,
-                              test_account_class._get_free_hash, hash_list)
-
-    @mock.patch('oslo_concurrency.lockutils.lock')
-    def test_get_free_hash_some_in_use_accounts(self, lock_mock):
-        # Emulate no pre-existing lock
-        self.useFixture(mockpatch.Patch('os.path.isdir', return_value=True))
+        test_account_class = self._lock_dir_provider()
+        # Emulate all locks in list are in use by a live process
+        for hash in hash_list:
+            self._lock(test_account_class.accounts_dir, hash,
+                       'other class\n%d\n%s\n' % (os.getpid(),
+                                                  socket.gethostname()))
+        self.assertRaises(lib_exc.InvalidCredentials,
+                          test_account_class._get_free_hash, hash_list)
+
+    def test_get_free_hash_some_in_use_accounts(self):
         hash_list = self._get_hash_list(self.test_accounts)
-        test_account_class = preprov_creds.PreProvisionedCredentialProvider(
-            **self.fixed_params)
+        test_account_class = self._lock_dir_provider()
+        for hash in hash_list:
+            if hash != hash_list[3]:
+                self._lock(test_account_class.accounts_dir, hash,
+                           'other class')
+        self.assertEqual(hash_list[3],
+                         test_account_class._get_free_hash(hash_list))
+
+    def test_get_free_hash_stale_lock(self):
+        hash_list = self._get_hash_list(self.test_accounts)[:2]
+        test_account_class = self._lock_dir_provider()
+        lock_dir = test_account_class.accounts_dir
+        self._lock(lock_dir, hash_list[0], 'dead class\n12345\n%s\n' %
+                   socket.gethostname())
+        self._lock(lock_dir, hash_list[1], 'remote class\n12345\nremote\n')
+        with mock.patch.object(
+                os, 'kill',
+                side_effect=OSError(errno.ESRCH, 'No such process')):
+            free_hash = test_account_class._get_free_hash(hash_list)
+        self.assertEqual(hash_list[0], free_hash)
+        self.assertEqual('test class',
+                         test_account_class._read_hash_file(free_hash)[0])
+        self.assertEqual(sorted(hash_list), sorted(os.listdir(lock_dir)))
+        # The lock dir is still removed with the last lock file
+        for _hash in hash_list:
+            test_account_class.remove_hash(_hash)
+        self.assertFalse(os.path.isdir(lock_dir))
+
+    def _stale_lock_provider(self):
+        test_account_class = self._lock_dir_provider()
+        self._lock(test_account_class.accounts_dir, '12345',
+                   'dead class\n12345\n%s\n' % socket.gethostname())
+        self.useFixture(mockpatch.Patch(
+            'os.kill', side_effect=OSError(errno.ESRCH, 'No such process')))
+        return test_account_class
+
+    def test_break_stale_lock_left_break_file(self):
+        # A process died while breaking the lock
+        test_account_class = self._stale_lock_provider()
+        os.makedirs(test_account_class._break_dir)
+        self._lock(test_account_class._break_dir, '12345', '')
+        self.assertTrue(test_account_class._break_stale_lock('12345'))
+        self.assertTrue(test_account_class._create_hash_file('12345'))
 
-        def _fake_is_file(path):
-            # Fake isfile() to return that the path exists unless a specific
-            # hash is in the path
-            if hash_list[3] in path:
-                return False
-            return True
-
-        self.stubs.Set(os.path, 'isfile', _fake_is_file)
-        with mock.patch('six.moves.builtins.open', mock.mock_open(),
-                        create=True) as open_mock:
-            test_account_class._get_free_hash(hash_list)
-            lock_path = os.path.join(self.fixed_params['accounts_lock_dir'],
-                                     hash_list[3])
-            open_mock.assert_has_calls([mock.call(lock_path, 'w')])
-
-    @mock.patch('oslo_concurrency.lockutils.lock')
-    def test_remove_hash_last_account(self, lock_mock):
+    def test_break_stale_lock_being_broken(self):
+        test_account_class = self._stale_lock_provider()
+        os.makedirs(test_account_class._break_dir)
+        break_path = os.path.join(test_account_class._break_dir, '12345')
+        with open(break_path, 'w') as break_file:
+            fcntl.flock(break_file, fcntl.LOCK_EX)
+            self.assertFalse(test_account_class._break_stale_lock('12345'))
+        self.assertTrue(test_account_class._break_stale_lock('12345'))
+
+    def test_break_stale_lock_without_flock(self):
+        test_account_class = self._stale_lock_provider()
+        with mock.patch.object(preprov_creds, 'fcntl', None):
+            self.assertFalse(test_account_class._break_stale_lock('12345'))
+        self.assertFalse(test_account_class._create_hash_file('12345'))
+
+    def test_create_hash_file_lock_dir_removed_again(self):
+        test_account_class = self._lock_dir_provider()
+        real_open = os.open
+        failures = [OSError(errno.ENOENT, 'No such file or directory')] * 2
+
+        def racing_open(*args):
+            if failures:
+                raise failures.pop()
+            return real_open(*args)
+
+        self.useFixture(mockpatch.Patch('os.open', side_effect=racing_open))
+        self.assertTrue(test_account_class._create_hash_file('12345'))
+        self.assertEqual(['12345'],
+                         os.listdir(test_account_class.accounts_dir))
+
+    def test_remove_hash_missing_lock_dir(self):
+        test_account_class = self._lock_dir_provider()
+        test_account_class._create_hash_file('12345')
+        test_account_class.remove_hash('12345')
+        self.assertFalse(os.path.isdir(test_account_class.accounts_dir))
+        self.assertTrue(test_account_class._create_hash_file('12345'))
+
+    def test_remove_hash_last_account(self):
         hash_list = self._get_hash_list(self.test_accounts)
-        # Pretend the pseudo-lock is there
-        self.useFixture(mockpatch.Patch('os.path.isfile', return_value=True))
-        # Pretend the lock dir is empty
-        self.useFixture(mockpatch.Patch('os.listdir', return_value=[]))
         test_account_class = preprov_creds.PreProvisionedCredentialProvider(
             **self.fixed_params)
         remove_mock = self.useFixture(mockpatch.Patch('os.remove'))
@@ -214,23 +266,19 @@ class TestPreProvisionedCredentials(base.TestCase):
         remove_mock.mock.assert_called_once_with(hash_path)
         rmdir_mock.mock.assert_called_once_with(lock_path)
 
-    @mock.patch('oslo_concurrency.lockutils.lock')
-    def test_remove_hash_not_last_account(self, lock_mock):
+    def test_remove_hash_not_last_account(self):
         hash_list = self._get_hash_list(self.test_accounts)
-        # Pretend the pseudo-lock is there
-        self.useFixture(mockpatch.Patch('os.path.isfile', return_value=True))
-        # Pretend the lock dir is empty
-        self.useFixture(mockpatch.Patch('os.listdir', return_value=[
-            hash_list[1], hash_list[4]]))
         test_account_class = preprov_creds.PreProvisionedCredentialProvider(
             **self.fixed_params)
         remove_mock = self.useFixture(mockpatch.Patch('os.remove'))
-        rmdir_mock = self.useFixture(mockpatch.Patch('os.rmdir'))
+        # Pretend the lock dir is not empty
+        self.useFixture(mockpatch.Patch(
+            'os.rmdir', side_effect=OSError(errno.ENOTEMPTY,
+                                            'Directory not empty')))
         test_account_class.remove_hash(hash_list[2])
         hash_path = os.path.join(self.fixed_params['accounts_lock_dir'],
                                  hash_list[2])
         remove_mock.mock.assert_called_once_with(hash_path)
-        rmdir_mock.mock.assert_not_called()
 
     def test_is_multi_user(self):
         test_accounts_class = preprov_creds.PreProvisionedCredentialProvider(
@@ -305,6 +353,57 @@ class TestPreProvisionedCredentials(base.TestCase):
         for i in admin_hashes:
             self.assertNotIn(i, args)
 
+    def _cached_provider_params(self):
+        tmp_dir = self.useFixture(fixtures.TempDir()).path
+        accounts_file = os.path.join(tmp_dir, 'accounts.yaml')
+        with open(accounts_file, 'w') as yaml_file:
+            yaml_file.write('- username: test_user1\n')
+        # get_hash_dict pops the roles out of the accounts
+        self.accounts_mock.mock.side_effect = (
+            lambda path: copy.deepcopy(self.test_accounts))
+        return dict(self.fixed_params, test_accounts_file=accounts_file,
+                    accounts_cache_dir=os.path.join(tmp_dir, 'cache'))
+
+    def test_accounts_cache(self):
+        params = self._cached_provider_params()
+        first = preprov_creds.PreProvisionedCredentialProvider(**params)
+        second = preprov_creds.PreProvisionedCredentialProvider(**params)
+        self.assertEqual(1, self.accounts_mock.mock.call_count)
+        self.assertEqual(first.hash_dict, second.hash_dict)
+        cache_files = os.listdir(params['accounts_cache_dir'])
+        self.assertEqual(1, len(cache_files))
+        mode = os.stat(os.path.join(params['accounts_cache_dir'],
+                                    cache_files[0])).st_mode
+        self.assertEqual(0o600, stat.S_IMODE(mode))
+
+    def test_accounts_cache_file_changed(self):
+        params = self._cached_provider_params()
+        preprov_creds.PreProvisionedCredentialProvider(**params)
+        with open(params['test_accounts_file'], 'a') as yaml_file:
+            yaml_file.write('- username: test_user2\n')
+        preprov_creds.PreProvisionedCredentialProvider(**params)
+        self.assertEqual(2, self.accounts_mock.mock.call_count)
+
+    def test_accounts_cache_roles_changed(self):
+        params = self._cached_provider_params()
+        preprov_creds.PreProvisionedCredentialProvider(**params)
+        params['object_storage_operator_role'] = 'other_operator'
+        preprov_creds.PreProvisionedCredentialProvider(**params)
+        self.assertEqual(2, self.accounts_mock.mock.call_count)
+
+    def test_get_match_hash_list_cached(self):
+        test_accounts_class = preprov_creds.PreProvisionedCredentialProvider(
+            **self.fixed_params)
+        hash_list = self._get_hash_list(self.test_accounts)
+        hashes = test_accounts_class._get_match_hash_list(['role1', 'role2'])
+        self.assertEqual(set([hash_list[5], hash_list[8], hash_list[9]]),
+                         set(hashes))
+        self.assertIs(hashes, test_accounts_class._get_match_hash_list(
+            ['role2', 'role1']))
+        self.assertRaises(lib_exc.InvalidCredentials,
+                          test_accounts_class._get_match_hash_list,
+                          ['role1', 'unknown'])
+
     def test_networks_returned_with_creds(self):
         test_accounts = [
             {'username': 'test_user13', 'tenant_name': 'test_tenant13',
@@ -18,6 +18,8 @@ import mock
 
 from tempest.common import waiters
 from tempest import exceptions
+from tempest.lib.common import transitions
+from tempest.lib import exceptions as lib_exc
 from tempest.services.volume.base import base_volumes_client
 from tempest.tests.lib import base
 import tempest.tests.utils as utils
@@ -62,7 +64,7 @@ class TestImageWaiters(base.TestCase):
         # Tests that the wait method raises VolumeRestoreErrorException if
         # the volume status is 'error_restoring'.
         client = mock.Mock(spec=base_volumes_client.BaseVolumesClient,
-                           build_interval=1)
+                           build_interval=1, build_timeout=1)
         volume1 = {'volume': {'status': 'restoring-backup'}}
         volume2 = {'volume': {'status': 'error_restoring'}}
         mock_show = mock.Mock(side_effect=(volume1, volume2))
@@ -74,3 +76,208 @@ class TestImageWaiters(base.TestCase):
         mock_show.assert_has_calls([mock.call(volume_id),
                                     mock.call(volume_id)])
         mock_sleep.assert_called_once_with(1)
+
+
+class TestBatchedWaiters(base.TestCase):
+    def setUp(self):
+        super(TestBatchedWaiters, self).setUp()
+        self.client = mock.MagicMock()
+        self.client.build_timeout = 10
+        self.client.build_interval = 1
+        self.client.show_server.side_effect = lib_exc.NotFound
+        self.client.show_volume.side_effect = lib_exc.NotFound
+        self.sleep = self.patch('time.sleep')
+
+    def _server(self, server_id, status, updated='2016-01-01T00:00:00Z'):
+        return {'id': server_id, 'status': status, 'updated': updated,
+                'OS-EXT-STS:task_state': None}
+
+    def test_wait_for_servers_status(self):
+        self.client.list_servers.side_effect = [
+            {'servers': [self._server('a', 'BUILD'),
+                         self._server('b', 'BUILD'),
+                         self._server('c', 'ACTIVE')]},
+            {'servers': [self._server('a', 'ACTIVE',
+                                      '2016-01-01T00:00:05Z')]},
+            {'servers': [self._server('b', 'ACTIVE',
+                                      '2016-01-01T00:00:07Z')]}]
+        servers = waiters.wait_for_servers_status(self.client, ['a', 'b'],
+                                                  'ACTIVE', ready_wait=False)
+        self.assertEqual(['ACTIVE', 'ACTIVE'],
+                         [servers[s]['status'] for s in ('a', 'b')])
+        self.assertEqual(
+            [mock.call(detail=True),
+             mock.call(detail=True, **{'changes-since':
+                                       '2016-01-01T00:00:00Z'}),
+             mock.call(detail=True, **{'changes-since':
+                                       '2016-01-01T00:00:05Z'})],
+            self.client.list_servers.call_args_list)
+        self.assertEqual(2, self.sleep.call_count)
+
+    def test_wait_for_servers_status_paginated(self):
+        next_link = [{'rel': 'next',
+                      'href': 'http://nova/v2.1/servers/detail?marker=a'}]
+        self.client.list_servers.side_effect = [
+            {'servers': [self._server('a', 'ACTIVE')],
+             'servers_links': next_link},
+            {'servers': [self._server('b', 'ACTIVE')]}]
+        servers = waiters.wait_for_servers_status(self.client, ['a', 'b'],
+                                                  'ACTIVE', ready_wait=False)
+        self.assertEqual(set(['a', 'b']), set(servers))
+        self.assertEqual(
+            [mock.call(detail=True), mock.call(detail=True, marker='a')],
+            self.client.list_servers.call_args_list)
+        self.assertFalse(self.client.show_server.called)
+
+    def test_wait_for_servers_status_not_listed(self):
+        self.client.list_servers.return_value = {
+            'servers': [self._server('a', 'ACTIVE')]}
+        self.client.show_server.side_effect = None
+        self.client.show_server.return_value = {
+            'server': self._server('b', 'ACTIVE')}
+        servers = waiters.wait_for_servers_status(self.client, ['a', 'b'],
+                                                  'ACTIVE', ready_wait=False)
+        self.assertEqual('ACTIVE', servers['b']['status'])
+        self.client.show_server.assert_called_once_with('b')
+
+    def test_wait_for_servers_status_not_found(self):
+        self.client.list_servers.return_value = {
+            'servers': [self._server('a', 'ACTIVE')]}
+        self.assertRaises(lib_exc.NotFound, waiters.wait_for_servers_status,
+                          self.client, ['a', 'b'], 'ACTIVE')
+        self.client.show_server.assert_called_once_with('b')
+
+    def test_wait_for_servers_status_error(self):
+        self.client.list_servers.return_value = {
+            'servers': [self._server('a', 'BUILD'),
+                        self._server('b', 'ERROR')]}
+        self.assertRaises(exceptions.BuildErrorException,
+                          waiters.wait_for_servers_status,
+                          self.client, ['a', 'b'], 'ACTIVE')
+        self.assertFalse(self.sleep.called)
+
+    def test_wait_for_servers_termination(self):
+        self.client.list_servers.side_effect = [
+            {'servers': [self._server('a', 'ACTIVE'),
+                         self._server('b', 'ACTIVE')]},
+            {'servers': [self._server('a', 'DELETED',
+                                      '2016-01-01T00:00:05Z')]},
+            {'servers': []},
+            {'servers': [self._server('b', 'DELETED',
+                                      '2016-01-01T00:00:09Z')]}]
+        waiters.wait_for_servers_termination(self.client, ['a', 'b', 'c'])
+        self.assertEqual(4, self.client.list_servers.call_count)
+        # Only the server never listed is shown, once
+        self.client.show_server.assert_called_once_with('c')
+
+    def test_wait_for_servers_termination_timeout(self):
+        time_mock = self.patch('time.time')
+        time_mock.side_effect = utils.generate_timeout_series(5)
+        self.client.list_servers.return_value = {
+            'servers': [self._server('a', 'ACTIVE')]}
+        self.assertRaises(exceptions.TimeoutException,
+                          waiters.wait_for_servers_termination,
+                          self.client, ['a', 'b'])
+
+    def test_wait_for_volumes_status(self):
+        self.client.list_volumes.side_effect = [
+            {'volumes': [{'id': 'a', 'status': 'creating'},
+                         {'id': 'b', 'status': 'available'}]},
+            {'volumes': [{'id': 'a', 'status': 'available'},
+                         {'id': 'b', 'status': 'available'}]}]
+        volumes = waiters.wait_for_volumes_status(self.client, ['a', 'b'],
+                                                  'available')
+        self.assertEqual(set(['a', 'b']), set(volumes))
+        self.client.list_volumes.assert_called_with(detail=True, params={})
+        self.sleep.assert_called_once_with(1)
+
+    def test_wait_for_volumes_status_error(self):
+        self.client.list_volumes.return_value = {
+            'volumes': [{'id': 'a', 'status': 'error'}]}
+        self.assertRaises(exceptions.VolumeBuildErrorException,
+                          waiters.wait_for_volumes_status,
+                          self.client, ['a'], 'available')
+
+    def test_wait_for_volumes_deletion(self):
+        self.client.list_volumes.side_effect = [
+            {'volumes': [{'id': 'a', 'status': 'deleting'},
+                         {'id': 'b', 'status': 'deleting'}]},
+            {'volumes': [{'id': 'b', 'status': 'deleting'}]},
+            {'volumes': [{'id': 'c', 'status': 'available'}]}]
+        waiters.wait_for_volumes_deletion(self.client, ['a', 'b'])
+        self.assertEqual(3, self.client.list_volumes.call_count)
+        self.assertEqual([mock.call('a'), mock.call('b')],
+                         self.client.show_volume.call_args_list)
+
+    def test_wait_for_volumes_deletion_not_listed(self):
+        self.client.list_volumes.side_effect = [
+            {'volumes': []},
+            {'volumes': []}]
+        self.client.show_volume.side_effect = [
+            {'volume': {'id': 'a', 'status': 'deleting'}},
+            lib_exc.NotFound]
+        waiters.wait_for_volumes_deletion(self.client, ['a'])
+        self.assertEqual(2, self.client.show_volume.call_count)
+
+    def test_wait_for_volumes_status_paginated(self):
+        next_link = [{'rel': 'next',
+                      'href': 'http://cinder/v2/volumes/detail?marker=a'}]
+        self.client.list_volumes.side_effect = [
+            {'volumes': [{'id': 'a', 'status': 'available'}],
+             'volumes_links': next_link},
+            {'volumes': [{'id': 'b', 'status': 'available'}]}]
+        volumes = waiters.wait_for_volumes_status(self.client, ['a', 'b'],
+                                                  'available')
+        self.assertEqual(set(['a', 'b']), set(volumes))
+        self.client.list_volumes.assert_called_with(
+            detail=True, params={'marker': 'a'})
+        self.assertFalse(self.client.show_volume.called)
+
+    def test_nothing_to_wait_for(self):
+        waiters.wait_for_servers_termination(self.client, [])
+        waiters.wait_for_volumes_deletion(self.client, [])
+        self.assertFalse(self.client.list_servers.called)
+        self.assertFalse(self.client.list_volumes.called)
+
+
+class TestWaiterTransitions(base.TestCase):
+    def setUp(self):
+        super(TestWaiterTransitions, self).setUp()
+        self.client = mock.MagicMock()
+        self.client.build_timeout = 10
+        self.client.build_interval = 1
+        self.patch('time.sleep')
+        self.hook = mock.Mock()
+        transitions.register_hook(self.hook)
+        self.addCleanup(transitions.unregister_hook, self.hook)
+
+    def _transitions(self):
+        return [(r.resource_type, r.resource_id, r.from_state, r.to_state)
+                for r in (c[0][0] for c in self.hook.call_args_list)]
+
+    def test_server_status(self):
+        server = {'id': '42', 'flavor': {'id': '1'}, 'image': '',
+                  'OS-EXT-AZ:availability_zone': 'nova'}
+        self.client.show_server.side_effect = [
+            {'server': dict(server, status='BUILD',
+                            **{'OS-EXT-STS:task_state': 'scheduling'})},
+            {'server': dict(server, status='BUILD',
+                            **{'OS-EXT-STS:task_state': 'spawning'})},
+            {'server': dict(server, status='ACTIVE')}]
+        waiters.wait_for_server_status(self.client, '42', 'ACTIVE',
+                                       ready_wait=False)
+        self.assertEqual(
+            [('server', '42', 'BUILD/scheduling', 'BUILD/spawning'),
+             ('server', '42', 'BUILD/spawning', 'ACTIVE/None')],
+            self._transitions())
+        self.assertEqual({'flavor': '1', 'OS-EXT-AZ:availability_zone':
+                          'nova'}, self.hook.call_args[0][0].attributes)
+
+    def test_volumes_deletion(self):
+        self.client.list_volumes.side_effect = [
+            {'volumes': [{'id': 'a', 'status': 'deleting', 'size': 1}]},
+            {'volumes': []}]
+        self.client.show_volume.side_effect = lib_exc.NotFound
+        waiters.wait_for_volumes_deletion(self.client, ['a'])
+        self.assertEqual([('volume', 'a', 'deleting', 'DELETED')],
+                         self._transitions())
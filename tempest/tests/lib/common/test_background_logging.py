@@ -0,0 +1,82 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import logging
+import threading
+
+from tempest.lib.common import background_logging
+from tempest.tests.lib import base
+
+
+class _RecordingHandler(logging.Handler):
+
+    def __init__(self, level=logging.NOTSET):
+        super(_RecordingHandler, self).__init__(level)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((threading.current_thread().name,
+                             self.format(record)))
+
+
+class TestBackgroundLogging(base.TestCase):
+
+    def setUp(self):
+        super(TestBackgroundLogging, self).setUp()
+        self.logger = logging.getLogger('tempest.tests.background_logging')
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.propagate = False
+        self.handler = _RecordingHandler()
+        self.logger.addHandler(self.handler)
+        self.addCleanup(self._remove_handlers)
+        self.patch('atexit.register')
+
+    def _remove_handlers(self):
+        for handler in list(self.logger.handlers):
+            self.logger.removeHandler(handler)
+
+    def test_records_written_in_background(self):
+        listener = background_logging.enable(self.logger)
+        self.assertEqual(1, len(self.logger.handlers))
+        self.assertIsInstance(self.logger.handlers[0],
+                              background_logging.QueueHandler)
+        args = {'status': 200}
+        self.logger.info('Request: %(status)s', args)
+        # Changing the arguments later must not change the message
+        args['status'] = 500
+        listener.stop()
+        self.assertEqual([('tempest-log-writer', 'Request: 200')],
+                         self.handler.records)
+
+    def test_handler_level(self):
+        info_handler = _RecordingHandler(logging.INFO)
+        self.logger.addHandler(info_handler)
+        listener = background_logging.enable(self.logger)
+        self.logger.debug('debug')
+        self.logger.info('info')
+        listener.stop()
+        self.assertEqual(2, len(self.handler.records))
+        self.assertEqual(['info'], [msg for _, msg in info_handler.records])
+
+    def test_exception(self):
+        listener = background_logging.enable(self.logger)
+        try:
+            raise ValueError('fake error')
+        except ValueError:
+            self.logger.exception('failed')
+        listener.stop()
+        message = self.handler.records[0][1]
+        self.assertIn('failed', message)
+        self.assertIn('ValueError: fake error', message)
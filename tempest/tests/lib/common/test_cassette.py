@@ -0,0 +1,210 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+import gzip
+import io
+import json
+import os
+
+import fixtures
+import urllib3
+
+from tempest.lib.common import cassette
+from tempest.lib.common import http
+from tempest.lib import exceptions
+from tempest.tests.lib import base
+
+
+def _response(body, status=200):
+    return urllib3.response.HTTPResponse(
+        body=io.BytesIO(body),
+        headers={'Content-Type': 'application/json',
+                 'Content-Length': str(len(body))},
+        status=status, reason='OK', version=11)
+
+
+class TestNormalizeUrl(base.TestCase):
+
+    def test_scheme_dropped(self):
+        self.assertEqual(
+            'nova.example.com:8774/v2.1/servers/42',
+            cassette.normalize_url('https://nova.example.com:8774/v2.1/'
+                                   'servers/42'))
+
+    def test_host_kept(self):
+        self.assertNotEqual(cassette.normalize_url('http://h:9696/v2.0/'),
+                            cassette.normalize_url('http://h:5000/v2.0/'))
+
+    def test_query_sorted(self):
+        self.assertEqual(
+            'h/servers?limit=2&name=a',
+            cassette.normalize_url('http://h/servers?name=a&limit=2'))
+
+    def test_slashes_merged(self):
+        self.assertEqual('h/v2/images',
+                         cassette.normalize_url('http://h//v2/images/'))
+
+
+class TestRenewToken(base.TestCase):
+
+    def _expiry(self, data):
+        return datetime.datetime.strptime(data, '%Y-%m-%dT%H:%M:%S.%fZ')
+
+    def test_v3(self):
+        body = {'token': {'expires_at': '2016-01-01T00:00:00.000000Z',
+                          'catalog': []}}
+        renewed = json.loads(cassette.renew_token(
+            json.dumps(body).encode('utf-8')).decode('utf-8'))
+        self.assertEqual([], renewed['token']['catalog'])
+        self.assertGreater(self._expiry(renewed['token']['expires_at']),
+                           datetime.datetime.utcnow())
+
+    def test_v2(self):
+        body = {'access': {'token': {'id': 'x',
+                                     'expires': '2016-01-01T00:00:00Z'}}}
+        renewed = json.loads(cassette.renew_token(
+            json.dumps(body).encode('utf-8')).decode('utf-8'))
+        self.assertGreater(
+            self._expiry(renewed['access']['token']['expires']),
+            datetime.datetime.utcnow())
+
+    def test_other_bodies_unchanged(self):
+        for data in (b'{"servers": []}', b'[]', b'\xff', b''):
+            self.assertEqual(data, cassette.renew_token(data))
+
+
+class TestCassette(base.TestCase):
+
+    def setUp(self):
+        super(TestCassette, self).setUp()
+        self.path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                 'cassette.json')
+        self.urlopen = self.patch(
+            'tempest.lib.common.http.ClosingHttp._urlopen')
+
+    def _record(self, *responses):
+        self.urlopen.side_effect = [_response(b) for b in responses]
+        recorder = cassette.Cassette(self.path, cassette.RECORD)
+        self.addCleanup(recorder.close)
+        http_obj = http.ClosingHttp(cassette=recorder)
+        for _ in responses:
+            http_obj.request('http://h:5000/v3/auth/tokens?b=1&a=2', 'GET')
+        self.urlopen.reset_mock()
+
+    def test_invalid_mode(self):
+        self.assertRaises(ValueError, cassette.Cassette, self.path, 'rewind')
+
+    def test_replay(self):
+        self._record(b'{"token": 1}')
+        http_obj = http.ClosingHttp(
+            cassette=cassette.Cassette(self.path))
+        resp, body = http_obj.request(
+            'https://h:5000/v3/auth/tokens?a=2&b=1', 'GET')
+        self.assertEqual(200, resp.status)
+        self.assertEqual('application/json', resp['content-type'])
+        self.assertEqual(b'{"token": 1}', body)
+        self.assertFalse(self.urlopen.called)
+        self.assertEqual(12, http_obj.stats.bytes_received)
+
+    def test_replay_other_host(self):
+        self._record(b'{}')
+        http_obj = http.ClosingHttp(cassette=cassette.Cassette(self.path))
+        self.assertRaises(exceptions.CassetteMiss, http_obj.request,
+                          'http://h:9696/v3/auth/tokens?a=2&b=1', 'GET')
+
+    def test_replay_renewed_token(self):
+        body = b'{"token": {"expires_at": "2016-01-01T00:00:00.000000Z"}}'
+        self.urlopen.side_effect = [_response(body)]
+        recorder = cassette.Cassette(self.path, cassette.RECORD)
+        http.ClosingHttp(cassette=recorder).request(
+            'http://h:5000/v3/auth/tokens', 'POST', body='{}')
+        recorder.close()
+        resp, replayed = http.ClosingHttp(
+            cassette=cassette.Cassette(self.path)).request(
+                'http://h:5000/v3/auth/tokens', 'POST', body='{}')
+        self.assertNotEqual(body, replayed)
+        self.assertEqual(str(len(replayed)), resp['content-length'])
+        self.assertNotIn('2016', json.loads(
+            replayed.decode('utf-8'))['token']['expires_at'])
+
+    def test_replay_in_recorded_order(self):
+        self._record(b'1', b'2')
+        player = cassette.Cassette(self.path)
+        self.assertEqual(2, len(player))
+        http_obj = http.ClosingHttp(cassette=player)
+        url = 'http://h:5000/v3/auth/tokens?a=2&b=1'
+        bodies = [http_obj.request(url, 'GET')[1] for _ in range(3)]
+        self.assertEqual([b'1', b'2', b'2'], bodies)
+        player.rewind()
+        self.assertEqual(b'1', http_obj.request(url, 'GET')[1])
+
+    def test_replay_binary_body(self):
+        self._record(b'\xff\xfe\x00')
+        http_obj = http.ClosingHttp(cassette=cassette.Cassette(self.path))
+        body = http_obj.request('http://h:5000/v3/auth/tokens?a=2&b=1',
+                                'GET')[1]
+        self.assertEqual(b'\xff\xfe\x00', body)
+
+    def test_replay_compressed(self):
+        body = b'{"servers": []}'
+        compressed = io.BytesIO()
+        with gzip.GzipFile(fileobj=compressed, mode='wb') as gzip_file:
+            gzip_file.write(body)
+        compressed = compressed.getvalue()
+        self.urlopen.side_effect = [urllib3.response.HTTPResponse(
+            body=io.BytesIO(compressed),
+            headers={'Content-Type': 'application/json',
+                     'Content-Encoding': 'gzip',
+                     'Content-Length': str(len(compressed))},
+            status=200, reason='OK', version=11)]
+        recorder = cassette.Cassette(self.path, cassette.RECORD)
+        url = 'http://h:8774/v2.1/servers'
+        http.ClosingHttp(cassette=recorder).request(url, 'GET')
+        recorder.close()
+        resp, replayed = http.ClosingHttp(
+            cassette=cassette.Cassette(self.path)).request(url, 'GET')
+        self.assertEqual(body, replayed)
+        self.assertNotIn('content-encoding', resp)
+        self.assertEqual(str(len(body)), resp['content-length'])
+
+    def test_replay_stream(self):
+        self._record(b'x' * 100)
+        http_obj = http.ClosingHttp(cassette=cassette.Cassette(self.path))
+        resp, body = http_obj.request('http://h:5000/v3/auth/tokens?a=2&b=1',
+                                      'GET', stream=True)
+        self.assertIsInstance(body, http.StreamingBody)
+        self.assertEqual(b'x' * 100, body.read())
+
+    def test_replay_miss(self):
+        self._record(b'{}')
+        http_obj = http.ClosingHttp(cassette=cassette.Cassette(self.path))
+        self.assertRaises(exceptions.CassetteMiss, http_obj.request,
+                          'http://h:5000/v3/auth/tokens?a=2&b=1', 'POST')
+        self.assertFalse(self.urlopen.called)
+
+    def test_record_appends(self):
+        self._record(b'1')
+        self._record(b'2')
+        self.assertEqual(2, len(cassette.Cassette(self.path)))
+
+    def test_default_cassette(self):
+        self._record(b'{}')
+        self.addCleanup(http.use_cassette, None)
+        http.use_cassette(cassette.Cassette(self.path))
+        body = http.ClosingHttp().request(
+            'http://h:5000/v3/auth/tokens?a=2&b=1', 'GET')[1]
+        self.assertEqual(b'{}', body)
+        self.assertFalse(self.urlopen.called)
@@ -0,0 +1,220 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import threading
+import time
+
+from tempest.lib import auth
+from tempest.lib.common import fake_cloud
+from tempest.lib.common import http
+from tempest.lib import exceptions
+from tempest.lib.services.compute import servers_client
+from tempest.lib.services.network import networks_client
+from tempest.lib.services.network import subnets_client
+from tempest.tests.lib import base
+
+URL = 'http://fake-cloud:8080'
+
+
+class TestFakeCloud(base.TestCase):
+
+    def setUp(self):
+        super(TestFakeCloud, self).setUp()
+        self.now = time.time()
+        time_mock = self.patch('tempest.lib.common.fake_cloud.time')
+        time_mock.time.side_effect = lambda: self.now
+        self.app = fake_cloud.FakeCloud(
+            URL, delays={'server:BUILD': 5, 'volume:DELETE': 2})
+        self.transport = fake_cloud.WSGITransport(self.app)
+
+    def _request(self, method, path, body=None, token=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['X-Auth-Token'] = token
+        resp, data = self.transport.request(
+            URL + path, method, headers=headers,
+            body=json.dumps(body) if body is not None else None)
+        return resp, json.loads(data.decode('utf-8')) if data else None
+
+    def _provider(self, version):
+        if version == 'v3':
+            credentials = auth.KeystoneV3Credentials(
+                username='user', password='pass', project_name='project',
+                user_domain_name='Default', project_domain_name='Default')
+            provider = auth.KeystoneV3AuthProvider(
+                credentials, URL + '/identity/v3')
+        else:
+            credentials = auth.KeystoneV2Credentials(
+                username='user', password='pass', tenant_name='project')
+            provider = auth.KeystoneV2AuthProvider(
+                credentials, URL + '/identity/v2.0')
+        provider.auth_client.http_obj = self.transport
+        return provider
+
+    def _client(self, client_class, service, version='v3'):
+        client = client_class(self._provider(version), service, 'RegionOne')
+        client.http_obj = self.transport
+        return client
+
+    def test_v2_token(self):
+        provider = self._provider('v2')
+        self.assertEqual(URL + '/compute/v2.1', provider.base_url(
+            {'service': 'compute', 'endpoint_type': 'publicURL'}))
+        self.assertEqual('project', provider.credentials.tenant_name)
+
+    def test_v3_token(self):
+        provider = self._provider('v3')
+        project_id = provider.auth_data[1]['project']['id']
+        self.assertEqual(
+            '%s/volume/v2/%s' % (URL, project_id),
+            provider.base_url({'service': 'volumev2',
+                               'endpoint_type': 'public'}))
+
+    def test_server_transitions(self):
+        client = self._client(servers_client.ServersClient, 'compute')
+        server = client.create_server(name='vm', imageRef='image',
+                                      flavorRef='1')['server']
+        self.assertEqual('BUILD',
+                         client.show_server(server['id'])['server']['status'])
+        self.now += 5
+        body = client.show_server(server['id'])['server']
+        self.assertEqual('ACTIVE', body['status'])
+        self.assertEqual('1', body['flavor']['id'])
+        servers = client.list_servers()['servers']
+        self.assertEqual([{'id': server['id'], 'name': 'vm',
+                           'links': body['links']}], servers)
+        client.delete_server(server['id'])
+        self.assertRaises(exceptions.NotFound, client.show_server,
+                          server['id'])
+
+    def test_list_filters(self):
+        client = self._client(servers_client.ServersClient, 'compute')
+        client.create_server(name='a', imageRef='image', flavorRef='1')
+        self.now += 10
+        client.create_server(name='b', imageRef='image', flavorRef='1')
+        self.assertEqual(['b'], [s['name'] for s in client.list_servers(
+            status='BUILD')['servers']])
+        changes_since = fake_cloud._isotime(self.now - 1)
+        self.assertEqual(['b'], [s['name'] for s in client.list_servers(
+            detail=True, **{'changes-since': changes_since})['servers']])
+
+    def test_deleted_servers_changes_since(self):
+        client = self._client(servers_client.ServersClient, 'compute')
+        server = client.create_server(name='vm', imageRef='image',
+                                      flavorRef='1')['server']
+        changes_since = fake_cloud._isotime(self.now)
+        client.delete_server(server['id'])
+        self.assertEqual([], client.list_servers(detail=True)['servers'])
+        servers = client.list_servers(
+            detail=True, **{'changes-since': changes_since})['servers']
+        self.assertEqual([(server['id'], 'DELETED')],
+                         [(s['id'], s['status']) for s in servers])
+
+    def test_volume_deletion_delay(self):
+        token = self._provider('v3').get_token()
+        path = '/volume/v2/project/volumes'
+        resp, body = self._request('POST', path, {'volume': {'size': 1}},
+                                   token)
+        self.assertEqual(202, resp.status)
+        volume_path = '%s/%s' % (path, body['volume']['id'])
+        self.assertEqual('available',
+                         self._request('GET', volume_path)[1]['volume'][
+                             'status'])
+        self.assertEqual(202, self._request('DELETE', volume_path)[0].status)
+        self.assertEqual('deleting',
+                         self._request('GET', volume_path)[1]['volume'][
+                             'status'])
+        self.now += 2
+        self.assertEqual(404, self._request('GET', volume_path)[0].status)
+        self.assertEqual([], self._request('GET', path + '/detail')[1][
+            'volumes'])
+
+    def test_image_upload(self):
+        resp, image = self._request('POST', '/image/v2/images',
+                                    {'name': 'image'})
+        self.assertEqual(201, resp.status)
+        self.assertEqual('queued', image['status'])
+        resp, _ = self.transport.request(
+            URL + '/image/v2/images/%s/file' % image['id'], 'PUT',
+            headers={'Content-Type': 'application/octet-stream'},
+            body=b'data')
+        self.assertEqual(204, resp.status)
+        image = self._request('GET', '/image/v2/images/' + image['id'])[1]
+        self.assertEqual('active', image['status'])
+        self.assertEqual(4, image['size'])
+
+    def test_network_resources(self):
+        networks = self._client(networks_client.NetworksClient, 'network')
+        subnets = self._client(subnets_client.SubnetsClient, 'network')
+        network = networks.create_network(name='net')['network']
+        subnet = subnets.create_subnet(network_id=network['id'],
+                                       cidr='10.0.0.0/24',
+                                       ip_version=4)['subnet']
+        self.assertEqual([subnet['id']], networks.show_network(
+            network['id'])['network']['subnets'])
+        _, router = self._request('POST', '/network/v2.0/routers',
+                                  {'router': {'name': 'router'}})
+        interface_path = '/network/v2.0/routers/%s/%%s_router_interface' % (
+            router['router']['id'])
+        _, interface = self._request('PUT', interface_path % 'add',
+                                     {'subnet_id': subnet['id']})
+        ports = self._request('GET', '/network/v2.0/ports?device_id=%s' %
+                              router['router']['id'])[1]['ports']
+        self.assertEqual([interface['port_id']], [p['id'] for p in ports])
+        self._request('PUT', interface_path % 'remove',
+                      {'subnet_id': subnet['id']})
+        self.assertEqual([], self._request('GET', '/network/v2.0/ports')[1][
+            'ports'])
+
+    def test_role_grants(self):
+        _, role = self._request('POST', '/identity/v3/roles',
+                                {'role': {'name': 'admin'}})
+        provider = self._provider('v3')
+        user_id = provider.auth_data[1]['user']['id']
+        project_id = provider.auth_data[1]['project']['id']
+        resp, _ = self._request('PUT', '/identity/v3/projects/%s/users/%s/'
+                                'roles/%s' % (project_id, user_id,
+                                              role['role']['id']))
+        self.assertEqual(204, resp.status)
+        provider.clear_auth()
+        self.assertEqual(['admin'], [
+            r['name'] for r in provider.auth_data[1]['roles']])
+
+    def test_not_found(self):
+        resp, body = self._request('GET', '/compute/v2.1/os-unknown')
+        self.assertEqual(404, resp.status)
+        resp, _ = self._request('POST', '/compute/v2.1/servers/42')
+        self.assertEqual(405, resp.status)
+
+
+class TestFakeCloudServer(base.TestCase):
+
+    def test_serve(self):
+        app = fake_cloud.FakeCloud()
+        server = fake_cloud.make_server(app, port=0)
+        thread = threading.Thread(target=server.serve_forever,
+                                  kwargs={'poll_interval': 0.01})
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.assertEqual('http://127.0.0.1:%s' % server.server_address[1],
+                         app.url)
+        resp, body = http.ClosingHttp().request(
+            app.url + '/compute/v2.1/flavors/1', 'GET')
+        self.assertEqual(200, resp.status)
+        self.assertEqual('m1.tiny',
+                         json.loads(body.decode('utf-8'))['flavor']['name'])
@@ -0,0 +1,320 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import errno
+import socket
+import threading
+
+import mock
+import six
+from six.moves import BaseHTTPServer
+from six.moves import http_client
+from six.moves import socketserver
+import urllib3
+
+from tempest.lib.common import http
+from tempest.lib.common import rest_client
+from tempest.tests.lib import base
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self):
+        length = int(self.headers.get('content-length') or 0)
+        if length:
+            self.rfile.read(length)
+        body = b'{"fake": "body"}'
+        if self.path == '/large':
+            body = b'x' * 200000
+        self.send_response(200)
+        self.send_header('content-type', 'application/json')
+        self.send_header('content-length', str(len(body)))
+        if self.headers.get('connection') == 'close':
+            self.send_header('connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class TestClosingHttp(base.TestCase):
+
+    def setUp(self):
+        super(TestClosingHttp, self).setUp()
+        self.server = _Server(('127.0.0.1', 0), _Handler)
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  kwargs={'poll_interval': 0.01})
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = 'http://127.0.0.1:%s/' % self.server.server_address[1]
+
+    def test_keep_alive_reuses_connection(self):
+        http_obj = http.ClosingHttp()
+        for _ in range(3):
+            resp, body = http_obj.request(self.url, 'GET')
+            self.assertEqual(200, resp.status)
+            self.assertEqual(b'{"fake": "body"}', body)
+        stats = http_obj.stats.as_dict()
+        self.assertEqual(3, stats['requests'])
+        self.assertEqual(1, stats['handshakes'])
+        self.assertEqual(2, stats['reused'])
+
+    def test_close_connections(self):
+        http_obj = http.ClosingHttp(close_connections=True)
+        for _ in range(3):
+            http_obj.request(self.url, 'GET')
+        stats = http_obj.stats.as_dict()
+        self.assertEqual(3, stats['handshakes'])
+        self.assertEqual(0, stats['reused'])
+
+    def test_idle_connection_reaped(self):
+        http_obj = http.ClosingHttp(idle_timeout=30)
+        http_obj.request(self.url, 'GET')
+        with mock.patch.object(http, 'time') as time_mock:
+            time_mock.time.return_value = 2 ** 40
+            http_obj.request(self.url, 'GET')
+        stats = http_obj.stats.as_dict()
+        self.assertEqual(1, stats['reaped'])
+        self.assertEqual(2, stats['handshakes'])
+
+    def test_endpoint_stats(self):
+        http_obj = http.ClosingHttp()
+        http_obj.request(self.url, 'POST', body='{"a": 1}')
+        http_obj.request(self.url, 'GET')
+        port = self.server.server_address[1]
+        stats = http_obj.endpoint_stats()[('http', '127.0.0.1', port)]
+        self.assertEqual(2, stats['requests'])
+        self.assertEqual(0, stats['in_use'])
+        self.assertEqual(1, stats['open_sockets'])
+        self.assertEqual(8, stats['bytes_sent'])
+        self.assertEqual(32, stats['bytes_received'])
+        self.assertEqual(32, http_obj.stats.bytes_received)
+
+    def test_pool_block_counts_waits(self):
+        http_obj = http.ClosingHttp(pool_maxsize=1, pool_block=True)
+        pool = http_obj.connection_from_url(self.url)
+        conn = pool._get_conn()
+        self.addCleanup(pool._put_conn, conn)
+        self.assertRaises(urllib3.exceptions.EmptyPoolError,
+                          pool._get_conn, timeout=0.01)
+        self.assertEqual(1, pool.stats.waits)
+
+    def test_stream(self):
+        http_obj = http.ClosingHttp()
+        resp, body = http_obj.request(self.url + 'large', 'GET', stream=True)
+        self.assertEqual(200, resp.status)
+        self.assertIsInstance(body, http.StreamingBody)
+        self.assertEqual(1, http_obj.stats.in_use)
+        self.assertEqual(b'xxx', body.peek(3))
+        chunks = list(body.iter_chunks(chunk_size=65536))
+        self.assertEqual(4, len(chunks))
+        self.assertEqual(200000, sum(len(chunk) for chunk in chunks))
+        self.assertTrue(body.closed)
+        self.assertEqual(0, http_obj.stats.in_use)
+        self.assertEqual(200000, http_obj.stats.bytes_received)
+        http_obj.request(self.url, 'GET')
+        self.assertEqual(1, http_obj.stats.reused)
+
+    def test_stream_closed_early(self):
+        http_obj = http.ClosingHttp()
+        resp, body = http_obj.request(self.url + 'large', 'GET', stream=True)
+        with body:
+            self.assertEqual(b'x' * 10, body.read(10))
+        self.assertTrue(body.closed)
+        self.assertEqual(b'', body.read())
+        self.assertEqual(0, http_obj.stats.in_use)
+        http_obj.request(self.url, 'GET')
+        self.assertEqual(0, http_obj.stats.reused)
+        self.assertEqual(2, http_obj.stats.handshakes)
+
+
+class TestTransportRegistry(base.TestCase):
+
+    def setUp(self):
+        super(TestTransportRegistry, self).setUp()
+        self.registry = http.TransportRegistry()
+        self.addCleanup(self.registry.clear)
+
+    def test_same_settings_share_transport(self):
+        first = self.registry.get(ca_certs=None, pool_maxsize_by_host={})
+        second = self.registry.get(ca_certs=None, pool_maxsize_by_host={})
+        self.assertIs(first, second)
+
+    def test_different_tls_settings(self):
+        first = self.registry.get(disable_ssl_certificate_validation=False)
+        second = self.registry.get(disable_ssl_certificate_validation=True)
+        self.assertIsNot(first, second)
+
+    def test_stats(self):
+        transport = self.registry.get(disable_ssl_certificate_validation=True)
+        transport.connection_from_host('nova.example.com', 8774)
+        transport._get_endpoint_stats('http', 'nova.example.com',
+                                      8774).incr('bytes_received', 10)
+        stats = self.registry.stats()
+        self.assertEqual(1, len(stats))
+        self.assertEqual('nova.example.com', stats[0]['host'])
+        self.assertEqual(8774, stats[0]['port'])
+        self.assertEqual(10, stats[0]['bytes_received'])
+        self.assertEqual(0, stats[0]['open_sockets'])
+        self.assertTrue(
+            stats[0]['tls']['disable_ssl_certificate_validation'])
+
+    def test_rest_clients_share_transport(self):
+        first = rest_client.RestClient(None, 'compute', 'RegionOne')
+        second = rest_client.RestClient(None, 'network', 'RegionOne')
+        self.assertIs(first.http_obj, second.http_obj)
+
+
+class TestStreamingBody(base.TestCase):
+
+    def setUp(self):
+        super(TestStreamingBody, self).setUp()
+        self.response = mock.Mock()
+        self.response.read.side_effect = [b'abc', b'def', b'']
+        self.body = http.StreamingBody(self.response)
+
+    def test_peek_does_not_consume(self):
+        self.assertEqual(b'abcd', self.body.peek(4))
+        self.assertEqual(b'ab', self.body.read(2))
+        self.assertEqual(b'cdef', self.body.read())
+        self.response.release_conn.assert_called_once_with()
+
+    def test_bool(self):
+        self.assertTrue(self.body)
+        self.assertEqual(b'abcdef', b''.join(self.body))
+
+    def test_empty_body(self):
+        self.response.read.side_effect = [b'']
+        self.assertFalse(self.body)
+        self.assertTrue(self.body.closed)
+
+    def test_close(self):
+        self.body.read(1)
+        self.body.close()
+        self.response.close.assert_called_once_with()
+        self.response.release_conn.assert_called_once_with()
+
+
+class TestClosingHttpPools(base.TestCase):
+
+    def test_pool_maxsize(self):
+        http_obj = http.ClosingHttp(pool_maxsize=3)
+        pool = http_obj.connection_from_host('example.com', 80)
+        self.assertIsInstance(pool, http.KeepAliveHTTPConnectionPool)
+        self.assertEqual(3, pool.pool.maxsize)
+
+    def test_pool_maxsize_by_host(self):
+        http_obj = http.ClosingHttp(
+            pool_maxsize=3, pool_maxsize_by_host={'nova.example.com': 7})
+        pool = http_obj.connection_from_host('nova.example.com', 443,
+                                             scheme='https')
+        self.assertIsInstance(pool, http.KeepAliveHTTPSConnectionPool)
+        self.assertEqual(7, pool.pool.maxsize)
+        self.assertIs(http_obj.stats, pool.stats.parent)
+
+    def _stale_error(self):
+        return urllib3.exceptions.ProtocolError(
+            'Connection aborted.',
+            http_client.BadStatusLine('Remote end closed connection'))
+
+    def _fake_request(self, errors, reused):
+        calls = []
+
+        def fake_request(method, url, *args, **kwargs):
+            calls.append(method)
+            http._checkout.reused = reused
+            if errors:
+                raise errors.pop(0)
+            return mock.Mock(status=200, reason='OK', version=11, data='',
+                             getheaders=lambda: {})
+
+        return calls, fake_request
+
+    def test_stale_socket_retried_once(self):
+        http_obj = http.ClosingHttp()
+        calls, fake_request = self._fake_request([self._stale_error()], True)
+        with mock.patch.object(urllib3.poolmanager.PoolManager, 'request',
+                               side_effect=fake_request):
+            resp, _ = http_obj.request('http://example.com/', 'POST',
+                                       body='{}')
+        self.assertEqual(200, resp.status)
+        self.assertEqual(['POST', 'POST'], calls)
+        self.assertEqual(1, http_obj.stats.stale_retries)
+
+    def test_stale_socket_file_body_rewound(self):
+        http_obj = http.ClosingHttp()
+        body = six.BytesIO(b'data')
+        sent = []
+
+        def fake_request(method, url, *args, **kwargs):
+            sent.append(kwargs['body'].read())
+            http._checkout.reused = True
+            if len(sent) == 1:
+                raise self._stale_error()
+            return mock.Mock(status=200, reason='OK', version=11, data='',
+                             getheaders=lambda: {})
+
+        with mock.patch.object(urllib3.poolmanager.PoolManager, 'request',
+                               side_effect=fake_request):
+            http_obj.request('http://example.com/', 'PUT', body=body)
+        self.assertEqual([b'data', b'data'], sent)
+
+    def test_stale_socket_generator_body_not_retried(self):
+        http_obj = http.ClosingHttp()
+        calls, fake_request = self._fake_request([self._stale_error()], True)
+        body = (chunk for chunk in [b'da', b'ta'])
+        with mock.patch.object(urllib3.poolmanager.PoolManager, 'request',
+                               side_effect=fake_request):
+            self.assertRaises(urllib3.exceptions.ProtocolError,
+                              http_obj.request, 'http://example.com/', 'PUT',
+                              body=body)
+        self.assertEqual(['PUT'], calls)
+
+    def test_new_connection_not_retried(self):
+        http_obj = http.ClosingHttp()
+        calls, fake_request = self._fake_request([self._stale_error()], False)
+        with mock.patch.object(urllib3.poolmanager.PoolManager, 'request',
+                               side_effect=fake_request):
+            self.assertRaises(urllib3.exceptions.ProtocolError,
+                              http_obj.request, 'http://example.com/', 'POST')
+        self.assertEqual(['POST'], calls)
+
+    def test_retry_stale_disabled(self):
+        http_obj = http.ClosingHttp(retry_stale=False)
+        calls, fake_request = self._fake_request([self._stale_error()], True)
+        with mock.patch.object(urllib3.poolmanager.PoolManager, 'request',
+                               side_effect=fake_request):
+            self.assertRaises(urllib3.exceptions.ProtocolError,
+                              http_obj.request, 'http://example.com/', 'POST')
+
+    def test_is_stale_socket_error(self):
+        reset = socket.error(errno.ECONNRESET, 'reset')
+        refused = socket.error(errno.ECONNREFUSED, 'refused')
+        self.assertTrue(http._is_stale_socket_error(
+            urllib3.exceptions.ProtocolError('aborted', reset)))
+        self.assertFalse(http._is_stale_socket_error(
+            urllib3.exceptions.ProtocolError('aborted', refused)))
+        self.assertFalse(http._is_stale_socket_error(
+            urllib3.exceptions.ProtocolError('aborted')))
@@ -0,0 +1,143 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import os
+import shutil
+import tempfile
+
+import mock
+
+from tempest.lib.common import instrumentation
+from tempest.tests.lib import base
+
+
+def _record(latency, status=200, url_template='/v2.1/servers/{id}'):
+    return instrumentation.RequestRecord(
+        service='compute', method='GET', url_template=url_template,
+        status=status, latency=latency, request_bytes=0, response_bytes=10,
+        request_id='req-1')
+
+
+class TestNormalizeUrl(base.TestCase):
+
+    def test_uuids_and_integers(self):
+        url = ('https://nova.example.com:8774/v2.1/'
+               '8a8ba9a1d0d54ae7a6e0f8b9d5e6a7b8/servers/'
+               'a8e41b2c-9a3f-4a7e-b3fe-0a4f8b5c6d7e/os-volume_attachments/'
+               '42?all_tenants=1')
+        self.assertEqual(
+            '/v2.1/{id}/servers/{id}/os-volume_attachments/{id}',
+            instrumentation.normalize_url(url))
+
+    def test_names_kept(self):
+        self.assertEqual('/v2/images/detail',
+                         instrumentation.normalize_url('/v2/images/detail'))
+
+
+class TestHooks(base.TestCase):
+
+    def test_emit(self):
+        hook = mock.Mock()
+        instrumentation.register_hook(hook)
+        self.addCleanup(instrumentation.unregister_hook, hook)
+        instrumentation.register_hook(hook)
+        self.assertTrue(instrumentation.has_hooks())
+        record = _record(0.1)
+        instrumentation.emit(record)
+        hook.assert_called_once_with(record)
+
+    def test_failing_hook_does_not_raise(self):
+        failing = mock.Mock(side_effect=ValueError)
+        hook = mock.Mock()
+        for callback in (failing, hook):
+            instrumentation.register_hook(callback)
+            self.addCleanup(instrumentation.unregister_hook, callback)
+        instrumentation.emit(_record(0.1))
+        self.assertEqual(1, hook.call_count)
+
+    def test_unregister(self):
+        hook = mock.Mock()
+        instrumentation.register_hook(hook)
+        instrumentation.unregister_hook(hook)
+        instrumentation.emit(_record(0.1))
+        self.assertFalse(hook.called)
+
+
+class TestLatencyHistogram(base.TestCase):
+
+    def test_percentiles(self):
+        histogram = instrumentation.LatencyHistogram()
+        for i in range(1, 101):
+            histogram.add(i / 100.0)
+        stats = histogram.as_dict()
+        self.assertEqual(100, stats['count'])
+        self.assertEqual(0.01, stats['min'])
+        self.assertEqual(1.0, stats['max'])
+        self.assertAlmostEqual(0.505, stats['mean'])
+        # Percentiles are accurate within the bucket growth factor
+        for percent, expected in ((50, 0.5), (90, 0.9), (99, 0.99)):
+            value = stats['p%s' % percent]
+            self.assertTrue(expected <= value <= expected * 1.1,
+                            '%s not close to %s' % (value, expected))
+
+    def test_empty(self):
+        stats = instrumentation.LatencyHistogram().as_dict()
+        self.assertEqual(0, stats['count'])
+        self.assertIsNone(stats['p99'])
+
+    def test_bounded_buckets(self):
+        histogram = instrumentation.LatencyHistogram()
+        for i in range(10000):
+            histogram.add(i / 1000.0)
+        self.assertTrue(len(histogram.buckets) < 200)
+
+
+class TestLatencyCollector(base.TestCase):
+
+    def test_report(self):
+        collector = instrumentation.LatencyCollector()
+        collector(_record(0.1))
+        collector(_record(0.2, status=404))
+        collector(_record(2.0, url_template='/v2.1/servers'))
+        report = collector.report()
+        self.assertEqual(2, len(report))
+        self.assertEqual('/v2.1/servers', report[0]['url_template'])
+        self.assertEqual(2, report[1]['count'])
+        self.assertEqual({'200': 1, '404': 1}, report[1]['statuses'])
+
+    def test_write_report(self):
+        report_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, report_dir)
+        collector = instrumentation.LatencyCollector()
+        collector(_record(0.1))
+        path = os.path.join(report_dir, 'report.json')
+        collector.write_report(path)
+        with open(path) as report_file:
+            report = json.load(report_file)
+        self.assertEqual('compute', report[0]['service'])
+        self.assertEqual(1, report[0]['count'])
+
+    def test_enable_latency_report(self):
+        self.patch('tempest.lib.common.instrumentation._latency_collector',
+                   new=None)
+        register = self.patch('atexit.register')
+        collector = instrumentation.enable_latency_report('/tmp')
+        self.addCleanup(instrumentation.unregister_hook, collector)
+        self.assertIs(collector,
+                      instrumentation.enable_latency_report('/tmp'))
+        register.assert_called_once_with(
+            instrumentation._write_latency_report, collector,
+            '/tmp/latency-%s.json' % os.getpid())
@@ -0,0 +1,72 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+
+import mock
+
+from tempest.lib.common import jsonutils
+from tempest.tests.lib import base
+
+
+class TestJsonutils(base.TestCase):
+
+    def setUp(self):
+        super(TestJsonutils, self).setUp()
+        self.addCleanup(jsonutils.set_backend, jsonutils.get_backend())
+
+    def test_set_backend_stdlib(self):
+        self.assertEqual('stdlib', jsonutils.set_backend('stdlib'))
+        self.assertEqual('stdlib', jsonutils.get_backend())
+        self.assertEqual({'a': [1, 2]}, jsonutils.loads('{"a": [1, 2]}'))
+
+    def test_set_backend_auto(self):
+        with mock.patch.object(jsonutils.importutils, 'try_import',
+                               return_value=None):
+            self.assertEqual('stdlib', jsonutils.set_backend('auto'))
+
+    def test_set_backend_not_installed(self):
+        with mock.patch.object(jsonutils.importutils, 'try_import',
+                               return_value=None):
+            self.assertRaises(ValueError, jsonutils.set_backend, 'orjson')
+        self.assertRaises(ValueError, jsonutils.set_backend, 'pickle')
+
+    def test_loads_all_backends(self):
+        document = {'servers': [{'id': 'a', 'name': u'é', 'size': 1.5,
+                                 'big': 2 ** 70, 'ok': True, 'none': None}]}
+        text = json.dumps(document)
+        for name in jsonutils.AUTO_BACKENDS:
+            try:
+                jsonutils.set_backend(name)
+            except ValueError:
+                continue
+            self.assertEqual(document, jsonutils.loads(text), name)
+            self.assertEqual(document,
+                             jsonutils.loads(text.encode('utf-8')), name)
+
+    def test_loads_invalid(self):
+        self.assertRaises(ValueError, jsonutils.loads, '<html></html>')
+
+    def test_loads_encoding(self):
+        self.assertEqual(u'é', jsonutils.loads(
+            u'"é"'.encode('latin-1'), encoding='latin-1'))
+
+    def test_loads_kwargs(self):
+        self.assertEqual([('a', 1)], jsonutils.loads(
+            '{"a": 1}', object_pairs_hook=lambda pairs: pairs))
+
+    def test_dumps(self):
+        self.assertEqual('{"a": 1, "b": 2}',
+                         jsonutils.dumps({'b': 2, 'a': 1}, sort_keys=True))
@@ -0,0 +1,113 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from tempest.lib.common import polling
+from tempest.lib import exceptions
+from tempest.tests.lib import base
+
+
+class TestPollingPolicy(base.TestCase):
+
+    def _delays(self, policy, interval, elapsed, timeout=1000):
+        schedule = policy.schedule(interval)
+        return [schedule.next_delay(e, timeout) for e in elapsed]
+
+    def test_fixed_interval(self):
+        self.assertEqual([2, 2, 2], self._delays(polling.PollingPolicy(), 2,
+                                                 [0, 10, 100]))
+
+    def test_backoff(self):
+        policy = polling.PollingPolicy(backoff=2, max_interval=10)
+        self.assertEqual([1, 2, 4, 8, 10, 10],
+                         self._delays(policy, 1, [0] * 6))
+
+    def test_max_interval_keeps_the_interval(self):
+        policy = polling.PollingPolicy(backoff=2, max_interval=1)
+        self.assertEqual([3, 3], self._delays(policy, 3, [0, 0]))
+
+    def test_fast_start(self):
+        policy = polling.PollingPolicy(backoff=2, fast_start=5,
+                                       fast_interval=0.5)
+        self.assertEqual([0.5, 0.5, 3, 6],
+                         self._delays(policy, 3, [0, 4, 5, 8]))
+
+    def test_jitter(self):
+        policy = polling.PollingPolicy(jitter=0.5)
+        for delay in self._delays(policy, 4, [0] * 20):
+            self.assertTrue(2 <= delay <= 6)
+
+    def test_cut_at_timeout(self):
+        self.assertEqual([3, 0], self._delays(polling.PollingPolicy(), 5,
+                                              [7, 12], timeout=10))
+
+
+class TestWaitUntil(base.TestCase):
+
+    def setUp(self):
+        super(TestWaitUntil, self).setUp()
+        self.now = 1000.0
+        time_mock = self.patch('tempest.lib.common.polling.time')
+        time_mock.time.side_effect = lambda: self.now
+        self.sleep = time_mock.sleep
+        self.sleep.side_effect = self._sleep
+        self.addCleanup(polling.set_default_policy,
+                        polling.get_default_policy())
+
+    def _sleep(self, seconds):
+        self.now += seconds
+
+    def test_already_done(self):
+        fetch = mock.Mock(return_value='ACTIVE')
+        self.assertEqual('ACTIVE', polling.wait_until(
+            fetch, lambda s: s == 'ACTIVE', 10, 1))
+        self.assertFalse(self.sleep.called)
+
+    def test_polls_until_done(self):
+        fetch = mock.Mock(side_effect=['BUILD', 'BUILD', 'ACTIVE'])
+        check = mock.Mock()
+        self.assertEqual('ACTIVE', polling.wait_until(
+            fetch, lambda s: s == 'ACTIVE', 10, 1, check=check))
+        self.assertEqual([mock.call(1), mock.call(1)],
+                         self.sleep.call_args_list)
+        self.assertEqual([mock.call('BUILD'), mock.call('ACTIVE')],
+                         check.call_args_list)
+
+    def test_check_raises(self):
+        def check(state):
+            raise ValueError(state)
+        fetch = mock.Mock(side_effect=['BUILD', 'ERROR'])
+        self.assertRaises(ValueError, polling.wait_until, fetch,
+                          lambda s: False, 10, 1, check=check)
+
+    def test_timeout(self):
+        fetch = mock.Mock(return_value='BUILD')
+        self.assertRaises(exceptions.TimeoutException, polling.wait_until,
+                          fetch, lambda s: False, 10, 3)
+        self.assertEqual([3, 3, 3, 1],
+                         [c[0][0] for c in self.sleep.call_args_list])
+
+    def test_on_timeout(self):
+        fetch = mock.Mock(return_value='BUILD')
+        self.assertEqual('BUILD!', polling.wait_until(
+            fetch, lambda s: False, 4, 2, on_timeout=lambda s: s + '!'))
+
+    def test_default_policy(self):
+        polling.set_default_policy(polling.PollingPolicy(backoff=2))
+        fetch = mock.Mock(side_effect=['BUILD'] * 4 + ['ACTIVE'])
+        polling.wait_until(fetch, lambda s: s == 'ACTIVE', 100, 1)
+        self.assertEqual([1, 2, 4, 8],
+                         [c[0][0] for c in self.sleep.call_args_list])
@@ -0,0 +1,98 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from tempest.lib.common import response_cache
+from tempest.tests.lib import base
+from tempest.tests.lib import fake_http
+
+
+class TestResourceCollection(base.TestCase):
+
+    def test_resource_collection(self):
+        for url, collection in (
+                ('flavors', 'flavors'),
+                ('flavors/42/os-extra_specs?foo=bar', 'flavors'),
+                ('/v2.0/extensions', 'extensions'),
+                ('v2/images/detail', 'images'),
+                ('flavors?minDisk=1', 'flavors'),
+                ('/', '')):
+            self.assertEqual(collection,
+                             response_cache.resource_collection(url))
+
+
+class TestResponseCache(base.TestCase):
+
+    def setUp(self):
+        super(TestResponseCache, self).setUp()
+        self.cache = response_cache.ResponseCache(ttl=60, maxsize=2)
+        self.now = 1000.0
+        self.patch('time.time', new=lambda: self.now)
+
+    def _store(self, key, collection='flavors', etag=None):
+        headers = {'etag': etag} if etag else {}
+        return self.cache.store(key, collection,
+                                fake_http.fake_http_response(headers),
+                                key + ' body')
+
+    def test_get(self):
+        self.assertEqual((None, False), self.cache.get('a'))
+        self._store('a')
+        entry, fresh = self.cache.get('a')
+        self.assertTrue(fresh)
+        self.assertEqual('a body', entry.body)
+
+    def test_expiry_and_refresh(self):
+        self._store('a', etag='"1"')
+        self.now += 61
+        entry, fresh = self.cache.get('a')
+        self.assertFalse(fresh)
+        self.assertEqual('"1"', entry.etag)
+        self.cache.refresh('a')
+        self.assertTrue(self.cache.get('a')[1])
+        self.assertEqual(1, self.cache.stats()['revalidations'])
+
+    def test_lru_eviction(self):
+        self._store('a')
+        self._store('b')
+        self.cache.get('a')
+        self._store('c')
+        self.assertIsNone(self.cache.get('b')[0])
+        self.assertIsNotNone(self.cache.get('a')[0])
+        self.assertEqual(1, self.cache.stats()['evictions'])
+        self.assertEqual(2, len(self.cache))
+
+    def test_invalidate(self):
+        self._store('a', collection='flavors')
+        self._store('b', collection='extensions')
+        self.cache.invalidate('flavors')
+        self.cache.invalidate('servers')
+        self.assertIsNone(self.cache.get('a')[0])
+        self.assertIsNotNone(self.cache.get('b')[0])
+        self.assertEqual(1, self.cache.stats()['invalidations'])
+
+    def test_stats(self):
+        self._store('a')
+        self.cache.incr('hits')
+        self.cache.incr('misses')
+        self.assertEqual(dict(hits=1, misses=1, revalidations=0,
+                              evictions=0, invalidations=0, size=1),
+                         self.cache.stats())
+
+    def test_clear(self):
+        self._store('a')
+        self.cache.clear()
+        self.assertEqual(0, self.cache.stats()['size'])
+        self.cache.invalidate('flavors')
+        self.assertEqual(0, self.cache.stats()['invalidations'])
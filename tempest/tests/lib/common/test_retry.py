@@ -0,0 +1,101 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import socket
+
+import urllib3
+
+from tempest.lib.common import retry
+from tempest.tests.lib import base
+from tempest.tests.lib import fake_http
+
+
+class TestRetryPolicy(base.TestCase):
+
+    def setUp(self):
+        super(TestRetryPolicy, self).setUp()
+        self.stats = retry.RetryStats()
+        self.policy = retry.RetryPolicy(max_retries=3, backoff=1,
+                                        max_backoff=5, stats=self.stats)
+
+    def _resp(self, status, headers=None):
+        return fake_http.fake_http_response(headers or {}, status=status)
+
+    def test_backoff(self):
+        for attempt, (low, high) in enumerate([(0.5, 1), (1, 2), (2, 4)]):
+            delay = self.policy.retry_delay('GET', attempt,
+                                            resp=self._resp(503))
+            self.assertTrue(low <= delay <= high)
+        self.assertIsNone(self.policy.retry_delay('GET', 3,
+                                                  resp=self._resp(503)))
+        self.assertTrue(2.5 <= self.policy.backoff_delay(10) <= 5)
+
+    def test_retry_after(self):
+        self.assertEqual(2, self.policy.retry_delay(
+            'GET', 0, resp=self._resp(429, {'retry-after': '2'})))
+        self.assertEqual(5, self.policy.retry_delay(
+            'GET', 0, resp=self._resp(429, {'retry-after': '3600'})))
+
+    def test_not_retried(self):
+        self.assertIsNone(self.policy.retry_delay('GET', 0,
+                                                  resp=self._resp(500)))
+        self.assertIsNone(self.policy.retry_delay('POST', 0,
+                                                  resp=self._resp(503)))
+        self.assertIsNone(self.policy.retry_delay('GET', 0,
+                                                  error=ValueError()))
+        self.assertEqual(0, self.stats.retries)
+
+    def test_connection_errors(self):
+        for error in (socket.error(), urllib3.exceptions.ProtocolError()):
+            self.assertIsNotNone(self.policy.retry_delay('DELETE', 0,
+                                                         error=error))
+        self.assertEqual(2, self.stats.retried_errors)
+        self.assertEqual(2, self.stats.retries)
+
+
+class TestThrottle(base.TestCase):
+
+    def setUp(self):
+        super(TestThrottle, self).setUp()
+        self.now = 1000.0
+        self.sleeps = []
+        self.patch('time.time', new=lambda: self.now)
+        self.patch('time.sleep', new=self.sleeps.append)
+        self.stats = retry.RetryStats()
+        self.throttle = retry.Throttle(2, burst=2, stats=self.stats)
+
+    def test_burst_then_rate(self):
+        url = 'https://nova.example.com:8774/v2.1/servers'
+        self.assertEqual([0, 0, 0.5, 1.0],
+                         [self.throttle.wait(url) for _ in range(4)])
+        self.assertEqual([0.5, 1.0], self.sleeps)
+        self.assertEqual(2, self.stats.throttled)
+        self.assertEqual(1.5, self.stats.throttle_delay)
+
+    def test_refill(self):
+        url = 'https://nova.example.com:8774/v2.1/servers'
+        self.throttle.wait(url)
+        self.throttle.wait(url)
+        self.now += 10
+        self.assertEqual(0, self.throttle.wait(url))
+        self.assertEqual(0, self.throttle.wait(url))
+        self.assertEqual(0.5, self.throttle.wait(url))
+
+    def test_per_endpoint(self):
+        self.throttle.wait('https://nova.example.com:8774/v2.1/servers')
+        self.throttle.wait('https://nova.example.com:8774/v2.1/flavors')
+        self.assertEqual(
+            0, self.throttle.wait('https://cinder.example.com:8776/v2'))
+        self.assertEqual([], self.sleeps)
@@ -0,0 +1,79 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+import time
+
+from tempest.lib.common import single_flight
+from tempest.tests.lib import base
+
+
+class TestSingleFlight(base.TestCase):
+
+    def setUp(self):
+        super(TestSingleFlight, self).setUp()
+        self.group = single_flight.SingleFlight()
+        self.release = threading.Event()
+        self.calls = []
+
+    def _func(self, value):
+        def func():
+            self.calls.append(value)
+            self.release.wait(5)
+            if isinstance(value, Exception):
+                raise value
+            return value
+        return func
+
+    def _run_concurrently(self, key, func, count):
+        results = []
+
+        def run():
+            try:
+                results.append(self.group.do(key, func))
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=run) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        # wait for all the threads to be waiting on the first one
+        for _ in range(500):
+            if self.group.stats()['coalesced'] == count - 1:
+                break
+            time.sleep(0.01)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_coalesced(self):
+        results = self._run_concurrently('a', self._func('value'), 5)
+        self.assertEqual(['value'] * 5, results)
+        self.assertEqual(['value'], self.calls)
+        self.assertEqual(dict(calls=1, coalesced=4), self.group.stats())
+
+    def test_exception_shared(self):
+        error = ValueError('boom')
+        results = self._run_concurrently('a', self._func(error), 3)
+        self.assertEqual([error] * 3, results)
+        self.assertEqual(1, len(self.calls))
+
+    def test_sequential_calls_not_cached(self):
+        self.release.set()
+        self.assertEqual(1, self.group.do('a', self._func(1)))
+        self.assertEqual(2, self.group.do('a', self._func(2)))
+        self.assertEqual(3, self.group.do('b', self._func(3)))
+        self.assertEqual([1, 2, 3], self.calls)
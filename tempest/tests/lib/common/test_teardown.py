@@ -0,0 +1,83 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+
+from tempest.lib.common import teardown
+from tempest.tests.lib import base
+
+
+class TestTeardownExecutor(base.TestCase):
+
+    def setUp(self):
+        super(TestTeardownExecutor, self).setUp()
+        self.calls = []
+
+    def _task(self, name, error=None):
+        def task():
+            self.calls.append(name)
+            if error:
+                raise error
+        return task
+
+    def test_dependencies(self):
+        executor = teardown.TeardownExecutor(max_workers=1)
+        executor.add('volumes', self._task('volumes'), after=['servers'])
+        executor.add('servers', self._task('server-1'))
+        executor.add('servers', self._task('server-2'))
+        executor.add('keypairs', self._task('keypairs'))
+        executor.add('plans', self._task('plans'),
+                     after=['volumes', 'networks'])
+        results = executor.run()
+        self.assertEqual(['server-1', 'server-2', 'volumes', 'keypairs',
+                          'plans'], self.calls)
+        self.assertEqual(['volumes', 'servers', 'servers', 'keypairs',
+                          'plans'], [result.item for result in results])
+        self.assertEqual(0, len(executor))
+
+    def test_concurrent(self):
+        started = threading.Event()
+        executor = teardown.TeardownExecutor(max_workers=2)
+
+        def wait():
+            # only returns in time if the other task runs at the same time
+            self.assertTrue(started.wait(10))
+            self.calls.append('wait')
+
+        executor.add('a', wait)
+        executor.add('b', started.set)
+        executor.add('c', self._task('c'), after=['a', 'b'])
+        executor.run()
+        self.assertEqual(['wait', 'c'], self.calls)
+
+    def test_failures(self):
+        executor = teardown.TeardownExecutor()
+        executor.add('servers', self._task('servers', ValueError('boom')))
+        executor.add('volumes', self._task('volumes'), after=['servers'])
+        executor.add('keypairs', self._task('keypairs', KeyError('x')),
+                     after=['volumes'])
+        self.assertRaises(ValueError, executor.run)
+        self.assertEqual(['servers', 'volumes', 'keypairs'], self.calls)
+
+    def test_cycle(self):
+        executor = teardown.TeardownExecutor()
+        executor.add('a', self._task('a'), after=['b'])
+        executor.add('b', self._task('b'), after=['a'])
+        executor.add('c', self._task('c'))
+        self.assertRaises(ValueError, executor.run)
+        self.assertEqual([], self.calls)
+
+    def test_nothing_to_run(self):
+        self.assertEqual([], teardown.TeardownExecutor().run())
@@ -0,0 +1,108 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import stat
+import threading
+import time
+
+import fixtures
+
+from tempest.lib.common import token_cache
+from tempest.tests.lib import base
+
+AUTH_URL = 'http://keystone:5000/v3/auth/tokens'
+
+
+class TestFileTokenCache(base.TestCase):
+
+    def setUp(self):
+        super(TestFileTokenCache, self).setUp()
+        self.path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                 'tokens')
+        self.cache = token_cache.FileTokenCache(self.path)
+        self.key = self.cache.key(AUTH_URL, dict(username='user',
+                                                 password='secret'))
+
+    def test_directory_created(self):
+        self.assertTrue(os.path.isdir(self.path))
+        # an existing directory is fine
+        token_cache.FileTokenCache(self.path)
+
+    def test_key(self):
+        params = dict(username='user', password='secret')
+        self.assertEqual(self.key, self.cache.key(AUTH_URL, dict(params)))
+        self.assertNotEqual(self.key, self.cache.key(
+            AUTH_URL, dict(params, password='other')))
+        self.assertNotEqual(self.key, self.cache.key(
+            'http://other:5000/v3/auth/tokens', params))
+        self.assertNotIn('secret', self.key)
+
+    def test_set_and_get(self):
+        self.assertIsNone(self.cache.get(self.key))
+        auth_data = ('token', {'expires_at': '2016-01-01T00:00:00Z'})
+        self.cache.set(self.key, auth_data)
+        self.assertEqual(auth_data, self.cache.get(self.key))
+        path = os.path.join(self.path, self.key + '.json')
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(path).st_mode))
+        self.assertEqual([self.key + '.json'], os.listdir(self.path))
+
+    def test_invalidate(self):
+        self.cache.set(self.key, ('token', {}))
+        self.cache.invalidate(self.key, 'other_token')
+        self.assertEqual(('token', {}), self.cache.get(self.key))
+        self.cache.invalidate(self.key, 'token')
+        self.assertIsNone(self.cache.get(self.key))
+        # a missing token is fine
+        self.cache.invalidate(self.key, 'token')
+
+    def test_set_concurrently(self):
+        threads = [threading.Thread(target=self.cache.set,
+                                    args=(self.key, ('token-%d' % i, {})))
+                   for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertIn(self.cache.get(self.key)[0],
+                      ['token-%d' % i for i in range(10)])
+        self.assertEqual([self.key + '.json'], os.listdir(self.path))
+
+    def test_lock_excludes_threads(self):
+        holders = []
+        overlaps = []
+
+        def hold_lock():
+            with self.cache.lock(self.key):
+                holders.append(None)
+                overlaps.append(len(holders))
+                time.sleep(0.01)
+                holders.pop()
+
+        threads = [threading.Thread(target=hold_lock) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([1] * 4, overlaps)
+
+    def test_get_corrupted_file(self):
+        with open(os.path.join(self.path, self.key + '.json'), 'w') as f:
+            f.write('["token", {')
+        self.assertIsNone(self.cache.get(self.key))
+
+    def test_lock(self):
+        with self.cache.lock(self.key):
+            self.assertIn('token-%s' % self.key, os.listdir(self.path))
@@ -0,0 +1,114 @@
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import os
+import shutil
+import tempfile
+
+import mock
+
+from tempest.lib.common import transitions
+from tempest.tests.lib import base
+
+
+def _record(from_state, to_state, elapsed, resource_type='server'):
+    return transitions.TransitionRecord(
+        resource_type=resource_type, resource_id='42',
+        from_state=from_state, to_state=to_state, elapsed=elapsed,
+        timestamp=1000.0, attributes={'flavor': '1'})
+
+
+class TestTransitionTracker(base.TestCase):
+
+    def setUp(self):
+        super(TestTransitionTracker, self).setUp()
+        self.now = 1000.0
+        time_mock = self.patch('tempest.lib.common.transitions.time')
+        time_mock.time.side_effect = lambda: self.now
+        self.hook = mock.Mock()
+        transitions.register_hook(self.hook)
+        self.addCleanup(transitions.unregister_hook, self.hook)
+
+    def test_observe(self):
+        tracker = transitions.TransitionTracker('server', '42')
+        self.assertIsNone(tracker.observe('BUILD/scheduling'))
+        self.now += 2
+        self.assertIsNone(tracker.observe('BUILD/scheduling'))
+        self.now += 3
+        record = tracker.observe('BUILD/spawning', {'flavor': '1'})
+        self.assertEqual(('server', '42', 'BUILD/scheduling',
+                          'BUILD/spawning', 5, 1005.0, {'flavor': '1'}),
+                         record)
+        self.now += 10
+        tracker.observe(transitions.DELETED)
+        self.assertEqual([mock.call(record), mock.call(mock.ANY)],
+                         self.hook.call_args_list)
+        last = self.hook.call_args[0][0]
+        self.assertEqual(('BUILD/spawning', 'DELETED', 10, {}),
+                         (last.from_state, last.to_state, last.elapsed,
+                          last.attributes))
+
+    def test_failing_hook_does_not_raise(self):
+        failing = mock.Mock(side_effect=ValueError)
+        transitions.register_hook(failing)
+        self.addCleanup(transitions.unregister_hook, failing)
+        tracker = transitions.TransitionTracker('volume', '42')
+        tracker.observe('creating')
+        tracker.observe('available')
+        self.assertEqual(1, self.hook.call_count)
+
+
+class TestTimelineCollector(base.TestCase):
+
+    def test_report(self):
+        collector = transitions.TimelineCollector()
+        collector(_record('BUILD/spawning', 'ACTIVE/None', 10))
+        collector(_record('BUILD/spawning', 'ACTIVE/None', 30))
+        collector(_record('creating', 'available', 2,
+                          resource_type='volume'))
+        report = collector.report()
+        self.assertEqual(2, len(report['transitions']))
+        slowest = report['transitions'][0]
+        self.assertEqual(('server', 'BUILD/spawning', 'ACTIVE/None', 2),
+                         (slowest['resource_type'], slowest['from_state'],
+                          slowest['to_state'], slowest['count']))
+        self.assertEqual(30, slowest['max'])
+        self.assertEqual(3, len(report['events']))
+        self.assertEqual({'flavor': '1'}, report['events'][0]['attributes'])
+
+    def test_write_report(self):
+        report_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, report_dir)
+        collector = transitions.TimelineCollector()
+        collector(_record('creating', 'available', 2,
+                          resource_type='volume'))
+        path = os.path.join(report_dir, 'report.json')
+        collector.write_report(path)
+        with open(path) as report_file:
+            report = json.load(report_file)
+        self.assertEqual('volume', report['transitions'][0]['resource_type'])
+        self.assertEqual('42', report['events'][0]['resource_id'])
+
+    def test_enable_timeline_report(self):
+        self.patch('tempest.lib.common.transitions._timeline_collector',
+                   new=None)
+        register = self.patch('atexit.register')
+        collector = transitions.enable_timeline_report('/tmp')
+        self.addCleanup(transitions.unregister_hook, collector)
+        self.assertIs(collector, transitions.enable_timeline_report('/tmp'))
+        register.assert_called_once_with(
+            transitions._write_timeline_report, collector,
+            '/tmp/transitions-%s.json' % os.getpid())
@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import threading
 
 from tempest.lib.common.utils import misc
 from tempest.tests.lib import base
@@ -86,3 +87,40 @@ class TestMisc(base.TestCase):
             return misc.find_test_caller()
         self.assertEqual('TestMisc:tearDownClass',
                          tearDownClass(self.__class__))
+
+    def test_find_test_caller_context(self):
+        with misc.test_caller_context('TestFoo:test_bar'):
+            self.assertEqual('TestFoo:test_bar', misc.find_test_caller())
+            with misc.test_caller_context('TestFoo:_run_cleanups'):
+                self.assertEqual('TestFoo:_run_cleanups',
+                                 misc.find_test_caller())
+            self.assertEqual('TestFoo:test_bar', misc.find_test_caller())
+        self.assertEqual('TestMisc:test_find_test_caller_context',
+                         misc.find_test_caller())
+
+    def test_set_test_caller(self):
+        self.assertIsNone(misc.set_test_caller('TestFoo:setUp'))
+        self.addCleanup(misc.set_test_caller, None)
+        self.assertEqual('TestFoo:setUp', misc.set_test_caller(None))
+        self.assertEqual('TestMisc:test_set_test_caller',
+                         misc.find_test_caller())
+
+    def test_set_test_caller_per_thread(self):
+        result = []
+        misc.set_test_caller('TestFoo:test_bar')
+        self.addCleanup(misc.set_test_caller, None)
+        thread = threading.Thread(
+            target=lambda: result.append(misc.find_test_caller()))
+        thread.start()
+        thread.join()
+        self.assertNotEqual(['TestFoo:test_bar'], result)
+
+    def test_class_test_caller(self):
+        class TestFoo(object):
+            @classmethod
+            @misc.class_test_caller
+            def resource_setup(cls):
+                return misc.find_test_caller()
+        self.assertEqual('TestFoo:resource_setup', TestFoo.resource_setup())
+        self.assertEqual('TestMisc:test_class_test_caller',
+                         misc.find_test_caller())
@@ -91,6 +91,28 @@ class TestSchemaVersionsNone(base.BaseComputeServiceTest):
                          self.client.return_selected_schema())
 
 
+class TestSchemaVersionsCache(TestSchemaVersionsNone):
+    api_microversion = '2.5'
+    expected_schema = 'schemav22'
+
+    def test_schema_selected_once(self):
+        self.patch('tempest.lib.services.compute.base_compute_client.'
+                   '_selected_schemas', new={})
+        client_class = base_compute_client.BaseComputeClient
+        with mock.patch.object(
+                client_class, '_select_schema',
+                wraps=client_class._select_schema) as select_schema:
+            self.test_schema()
+            self.test_schema()
+        select_schema.assert_called_once_with(
+            DummyServiceClient1.schema_versions_info)
+
+    def test_schema_per_microversion(self):
+        self.test_schema()
+        base_compute_client.COMPUTE_MICROVERSION = '2.10'
+        self.assertEqual('schemav210', self.client.return_selected_schema())
+
+
 class TestSchemaVersionsV21(TestSchemaVersionsNone):
     api_microversion = '2.1'
     expected_schema = 'schemav21'
@@ -14,6 +14,9 @@
 
 import copy
 
+from oslotest import mockpatch
+
+from tempest.lib import exceptions as lib_exc
 from tempest.lib.services.compute import servers_client
 from tempest.tests.lib import fake_auth_provider
 from tempest.tests.lib.services.compute import base
@@ -224,6 +227,31 @@ class TestServersClient(base.BaseComputeServiceTest):
             server_id=self.server_id
             )
 
+    def test_show_servers(self):
+        ids = ['id-%s' % i for i in range(5)]
+        self.useFixture(mockpatch.Patch(
+            'tempest.lib.common.rest_client.RestClient.get',
+            return_value=self.create_response(self.FAKE_SERVER_GET)))
+        bodies = self.client.show_servers(ids)
+        self.assertEqual([self.FAKE_SERVER_GET] * 5, bodies)
+
+    def test_delete_servers(self):
+        deleted = []
+
+        def fake_delete(url):
+            deleted.append(url)
+            if url == 'servers/id-1':
+                raise lib_exc.NotFound()
+            return self.create_response({}, status=204)
+
+        self.useFixture(mockpatch.Patch(
+            'tempest.lib.common.rest_client.RestClient.delete',
+            side_effect=fake_delete))
+        self.assertRaises(lib_exc.NotFound, self.client.delete_servers,
+                          ['id-0', 'id-1', 'id-2'])
+        self.assertEqual(['servers/id-0', 'servers/id-1', 'servers/id-2'],
+                         sorted(deleted))
+
     def test_create_server_with_str_body(self):
         self._test_create_server()
 
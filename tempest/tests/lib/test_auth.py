@@ -15,10 +15,14 @@
 
 import copy
 import datetime
+import threading
+import time
 
+import fixtures
 from oslotest import mockpatch
 
 from tempest.lib import auth
+from tempest.lib.common import token_cache
 from tempest.lib import exceptions
 from tempest.lib.services.identity.v2 import token_client as v2_client
 from tempest.lib.services.identity.v3 import token_client as v3_client
@@ -405,6 +409,58 @@ class TestKeystoneV2AuthProvider(BaseAuthTestsSetUp):
         expected = 'http://fake_url/v2.0'
         self._test_base_url_helper(expected, filters, ('token', auth_data))
 
+    def _spy_base_url(self):
+        return self.useFixture(mockpatch.PatchObject(
+            self.auth_provider, '_base_url',
+            wraps=self.auth_provider._base_url)).mock
+
+    def _cached_auth_data(self):
+        # The fake tokens are expired, so that getting the auth data would
+        # replace the cached ones
+        self.auth_provider.set_auth()
+        return self.auth_provider.cache
+
+    def test_base_url_cached(self):
+        auth_data = self._cached_auth_data()
+        spy = self._spy_base_url()
+        filters = {'service': 'compute', 'region': 'FakeRegion'}
+        url = self.auth_provider.base_url(filters, auth_data)
+        self.assertEqual(url, self.auth_provider.base_url(dict(filters),
+                                                          auth_data))
+        self.assertEqual(1, spy.call_count)
+        self.auth_provider.base_url(dict(filters, skip_path=True), auth_data)
+        self.assertEqual(2, spy.call_count)
+
+    def test_base_url_cache_reset_with_auth(self):
+        spy = self._spy_base_url()
+        filters = {'service': 'compute', 'region': 'FakeRegion'}
+        self.auth_provider.base_url(filters, self._cached_auth_data())
+        self.auth_provider.base_url(filters, self._cached_auth_data())
+        self.assertEqual(2, spy.call_count)
+
+    def test_base_url_alt_auth_data_not_cached(self):
+        auth_data = self._cached_auth_data()
+        alt_auth_data = copy.deepcopy(auth_data)
+        spy = self._spy_base_url()
+        filters = {'service': 'compute', 'region': 'FakeRegion'}
+        url = self.auth_provider.base_url(filters, auth_data)
+        self.auth_provider.set_alt_auth_data('url', alt_auth_data)
+        self.assertEqual(url, self.auth_provider.base_url(
+            filters, auth_data=alt_auth_data))
+        self.auth_provider.base_url(filters, auth_data=alt_auth_data)
+        self.assertEqual(3, spy.call_count)
+        self.auth_provider.base_url(filters, auth_data)
+        self.assertEqual(3, spy.call_count)
+
+    def test_base_url_errors_not_cached(self):
+        auth_data = self._cached_auth_data()
+        spy = self._spy_base_url()
+        filters = {'service': 'BAD_SERVICE', 'region': 'FakeRegion'}
+        for _ in range(2):
+            self.assertRaises(exceptions.EndpointNotFound,
+                              self.auth_provider.base_url, filters, auth_data)
+        self.assertEqual(2, spy.call_count)
+
     def test_token_not_expired(self):
         expiry_data = datetime.datetime.utcnow() + datetime.timedelta(days=1)
         self._verify_expiry(expiry_data=expiry_data, should_be_expired=False)
@@ -425,6 +481,118 @@ class TestKeystoneV2AuthProvider(BaseAuthTestsSetUp):
             self.assertEqual(self.auth_provider.is_expired(auth_data),
                              should_be_expired)
 
+    def _valid_auth_data(self, delta=datetime.timedelta(days=1)):
+        expiry = datetime.datetime.utcnow() + delta
+        return self._auth_data_with_expiry(
+            expiry.strftime(auth.ISO8601_INT_SECONDS))
+
+    def test_expiry_parsed_once(self):
+        self.auth_provider.cache = self._valid_auth_data()
+        spy = self.useFixture(mockpatch.PatchObject(
+            self.auth_provider, '_parse_expiry_time',
+            wraps=self.auth_provider._parse_expiry_time)).mock
+        for _ in range(3):
+            self.auth_provider.get_auth()
+        self.assertEqual(1, spy.call_count)
+
+    def test_token_expired_with_margin(self):
+        auth_data = self._valid_auth_data(datetime.timedelta(minutes=5))
+        self.assertFalse(self.auth_provider.is_expired(auth_data))
+        self.assertTrue(self.auth_provider.is_expired(
+            auth_data, margin=datetime.timedelta(minutes=5)))
+
+    def test_concurrent_refresh(self):
+        valid_auth_data = self._valid_auth_data()
+        self.auth_provider.cache = self._valid_auth_data(
+            -datetime.timedelta(hours=1))
+        calls = []
+
+        def get_auth():
+            calls.append(None)
+            time.sleep(0.1)
+            return valid_auth_data
+
+        self.useFixture(mockpatch.PatchObject(
+            self.auth_provider, '_get_auth', side_effect=get_auth))
+        results = []
+        threads = [threading.Thread(
+            target=lambda: results.append(self.auth_provider.get_auth()))
+            for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, len(calls))
+        self.assertEqual([valid_auth_data] * 5, results)
+
+    def test_refresh_auth(self):
+        self.assertFalse(self.auth_provider.refresh_auth())
+        auth_data = self._valid_auth_data(datetime.timedelta(minutes=5))
+        self.auth_provider.cache = auth_data
+        set_auth = self.useFixture(mockpatch.PatchObject(
+            self.auth_provider, 'set_auth')).mock
+        self.assertFalse(self.auth_provider.refresh_auth())
+        self.assertTrue(self.auth_provider.refresh_auth(
+            margin=datetime.timedelta(minutes=5)))
+        set_auth.assert_called_once_with()
+
+    def _shared_auth_provider(self):
+        path = self.useFixture(fixtures.TempDir()).path
+        provider = self._auth(self.credentials, fake_identity.FAKE_AUTH_URL,
+                              token_cache=token_cache.FileTokenCache(path))
+        get_token = self.useFixture(mockpatch.PatchObject(
+            provider.auth_client, 'get_token',
+            return_value=self._valid_auth_data())).mock
+        return provider, get_token
+
+    def test_token_shared_between_providers(self):
+        provider, get_token = self._shared_auth_provider()
+        other_provider = self._auth(self.credentials,
+                                    fake_identity.FAKE_AUTH_URL,
+                                    token_cache=provider.token_cache)
+        self.assertEqual(get_token.return_value, provider._get_auth())
+        self.assertEqual(list(get_token.return_value),
+                         list(other_provider._get_auth()))
+        self.assertEqual(1, get_token.call_count)
+
+    def test_shared_token_expired(self):
+        provider, get_token = self._shared_auth_provider()
+        key = provider.token_cache.key(provider.auth_client.auth_url,
+                                       provider._auth_params())
+        provider.token_cache.set(key, self._valid_auth_data(
+            -datetime.timedelta(hours=1)))
+        self.assertEqual(get_token.return_value, provider._get_auth())
+        self.assertEqual(1, get_token.call_count)
+
+    def test_shared_token_renewed(self):
+        provider, get_token = self._shared_auth_provider()
+        provider.cache = provider._get_auth()
+        provider._get_auth()
+        self.assertEqual(2, get_token.call_count)
+
+    def test_shared_token_not_reused_after_clear_auth(self):
+        provider, get_token = self._shared_auth_provider()
+        old_auth_data = self._valid_auth_data()
+        get_token.side_effect = [old_auth_data,
+                                 ('new_token', old_auth_data[1])]
+        provider.set_auth()
+        key, token = provider._shared_token
+        self.assertEqual(old_auth_data[0], token)
+        provider.clear_auth()
+        # Other providers do not get the dropped token either
+        self.assertIsNone(provider.token_cache.get(key))
+        self.assertEqual('new_token', provider.get_auth()[0])
+
+    def test_token_refresher(self):
+        refresher = auth.TokenRefresher(interval=3600)
+        self.addCleanup(refresher.stop)
+        refresh_auth = self.useFixture(mockpatch.PatchObject(
+            self.auth_provider, 'refresh_auth',
+            side_effect=exceptions.IdentityError)).mock
+        refresher.register(self.auth_provider)
+        refresher.refresh()
+        refresh_auth.assert_called_once_with(datetime.timedelta(hours=2))
+
 
 class TestKeystoneV3AuthProvider(TestKeystoneV2AuthProvider):
     _endpoints = fake_identity.IDENTITY_V3_RESPONSE['token']['catalog']
@@ -16,6 +16,7 @@
 import testtools
 
 from tempest.lib import base
+from tempest.lib.common.utils import misc
 from tempest.lib import exceptions
 
 
@@ -62,3 +63,26 @@ class TestSetUpClass(base.BaseTestCase):
 
     def test_setup_class_raises_runtime_error(self):
         """No-op test just to call setUp."""
+
+
+class TestTestCaller(base.BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestTestCaller, cls).setUpClass()
+        cls.class_caller = misc.find_test_caller()
+
+    def setUp(self):
+        super(TestTestCaller, self).setUp()
+        self.setup_caller = misc.find_test_caller()
+        self.addCleanup(self._check_cleanup_caller)
+
+    def _check_cleanup_caller(self):
+        self.assertEqual('TestTestCaller:_run_cleanups',
+                         misc.find_test_caller())
+
+    def test_caller(self):
+        self.assertEqual('TestTestCaller:setUpClass', self.class_caller)
+        self.assertEqual('TestTestCaller:setUp', self.setup_caller)
+        self.assertEqual('TestTestCaller:test_caller',
+                         misc._test_context.caller_name)
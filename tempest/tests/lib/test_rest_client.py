@@ -14,13 +14,22 @@
 
 import copy
 import json
+import socket
+import threading
+import time
 
 import jsonschema
+import mock
 from oslotest import mockpatch
 import six
 
 from tempest.lib.common import http
+from tempest.lib.common import instrumentation
+from tempest.lib.common import response_cache
 from tempest.lib.common import rest_client
+from tempest.lib.common import retry
+from tempest.lib.common import single_flight
+from tempest.lib.common.utils import misc as misc_utils
 from tempest.lib import exceptions
 from tempest.tests.lib import base
 from tempest.tests.lib import fake_auth_provider
@@ -137,6 +146,428 @@ class TestRestClientHeadersJSON(TestRestClientHTTPMethods):
         self._verify_headers(resp)
 
 
+class TestRestClientStream(base.TestCase):
+
+    def setUp(self):
+        super(TestRestClientStream, self).setUp()
+        self.rest_client = rest_client.RestClient(
+            fake_auth_provider.FakeAuthProvider(), None, None)
+        self.useFixture(mockpatch.PatchObject(self.rest_client,
+                                              '_log_request'))
+        self.fake_response = mock.Mock()
+        self.fake_response.read.side_effect = [b'{"fake": "body"}', b'']
+        self.streamed_body = http.StreamingBody(self.fake_response)
+
+    def _set_response(self, status):
+        resp = fake_http.fake_http_response(
+            {'content-type': 'application/json'}, status=status)
+        self.http_request = self.patch(
+            'tempest.lib.common.http.ClosingHttp.request',
+            return_value=(resp, self.streamed_body))
+
+    def test_get_stream(self):
+        self._set_response(200)
+        resp, body = self.rest_client.get('fake_url', stream=True)
+        self.assertIs(self.streamed_body, body)
+        self.assertTrue(self.http_request.call_args[1]['stream'])
+        self.assertEqual(b'{"fake": "body"}', body.read())
+
+    def test_get_stream_error(self):
+        self._set_response(404)
+        e = self.assertRaises(exceptions.NotFound, self.rest_client.get,
+                              'fake_url', stream=True)
+        self.assertEqual({'fake': 'body'}, e.resp_body)
+        self.assertTrue(self.streamed_body.closed)
+
+    def test_safe_body_stream(self):
+        body = self.rest_client._safe_body(self.streamed_body, maxlen=5)
+        self.assertIsInstance(body, six.text_type)
+        self.assertEqual(b'{"fake": "body"}', self.streamed_body.read())
+
+
+class TestRestClientInstrumentation(base.TestCase):
+
+    def setUp(self):
+        super(TestRestClientInstrumentation, self).setUp()
+        self.rest_client = rest_client.RestClient(
+            fake_auth_provider.FakeAuthProvider(), 'compute', None)
+        self.useFixture(mockpatch.PatchObject(self.rest_client,
+                                              '_log_request'))
+        self.hook = mock.Mock()
+        instrumentation.register_hook(self.hook)
+        self.addCleanup(instrumentation.unregister_hook, self.hook)
+
+    def _set_response(self, status, body):
+        resp = fake_http.fake_http_response(
+            {'content-type': 'application/json',
+             'x-openstack-request-id': 'req-1'}, status=status)
+        self.patch('tempest.lib.common.http.ClosingHttp.request',
+                   return_value=(resp, body))
+
+    def test_request_record(self):
+        self._set_response(202, '{"fake": "body"}')
+        self.rest_client.post(
+            'https://example.com/v2.1/servers/'
+            'a8e41b2c-9a3f-4a7e-b3fe-0a4f8b5c6d7e/action',
+            '{"reboot": {}}')
+        record = self.hook.call_args[0][0]
+        self.assertEqual('compute', record.service)
+        self.assertEqual('POST', record.method)
+        self.assertEqual('/v2.1/servers/{id}/action', record.url_template)
+        self.assertEqual(202, record.status)
+        self.assertEqual(14, record.request_bytes)
+        self.assertEqual(16, record.response_bytes)
+        self.assertEqual('req-1', record.request_id)
+        self.assertTrue(record.latency >= 0)
+
+    def test_request_record_on_error(self):
+        self._set_response(404, '{"fake": "body"}')
+        self.assertRaises(exceptions.NotFound, self.rest_client.get,
+                          'https://example.com/v2.1/servers/42')
+        record = self.hook.call_args[0][0]
+        self.assertEqual(404, record.status)
+        self.assertEqual('/v2.1/servers/{id}', record.url_template)
+
+
+class TestRestClientLogging(base.TestCase):
+
+    def setUp(self):
+        super(TestRestClientLogging, self).setUp()
+        self.rest_client = rest_client.RestClient(
+            fake_auth_provider.FakeAuthProvider(), None, None)
+        self.log = mock.Mock()
+        self.rest_client.LOG = self.log
+        self.resp = fake_http.fake_http_response(
+            {'x-openstack-request-id': 'req-1'}, status=200)
+
+    def test_log_request_level_disabled(self):
+        self.log.isEnabledFor.return_value = False
+        find_test_caller = self.patch(
+            'tempest.lib.common.utils.misc.find_test_caller')
+        self.rest_client._log_request('GET', 'fake_url', self.resp)
+        self.assertFalse(find_test_caller.called)
+        self.assertFalse(self.log.info.called)
+
+    def test_log_request_full(self):
+        self.log.isEnabledFor.return_value = True
+        headers = {'X-Auth-Token': 'secret', 'Accept': 'application/json'}
+        self.rest_client._log_request('POST', 'fake_url', self.resp, secs=1,
+                                      req_headers=headers,
+                                      req_body='x' * 10000,
+                                      resp_body=b'y' * 10000)
+        self.assertEqual('secret', headers['X-Auth-Token'])
+        self.assertEqual('Request (%s): %s %s %s %.3fs',
+                         self.log.info.call_args[0][0])
+        log_args = self.log.debug.call_args[0][1:]
+        req_headers, req_body, resp_headers, resp_body = [
+            six.text_type(arg) for arg in log_args]
+        self.assertIn("'X-Auth-Token': '<omitted>'", req_headers)
+        self.assertNotIn('secret', req_headers)
+        self.assertIn("'x-openstack-request-id': 'req-1'", resp_headers)
+        self.assertEqual(4096, len(req_body))
+        self.assertEqual(4096, len(resp_body))
+
+    def test_safe_body_truncates_before_converting(self):
+        body = self.rest_client._safe_body(b'x' * 10000, maxlen=10)
+        self.assertEqual(10, len(body))
+        self.assertEqual('x' * 10, self.rest_client._safe_body('x' * 20,
+                                                               maxlen=10))
+
+
+class TestRestClientMapRequests(base.TestCase):
+
+    def setUp(self):
+        super(TestRestClientMapRequests, self).setUp()
+        self.rest_client = rest_client.RestClient(
+            fake_auth_provider.FakeAuthProvider(), None, None,
+            pool_maxsize=4)
+
+    def test_results_in_order(self):
+        results = self.rest_client.map_requests(lambda x: x * 2, range(20))
+        self.assertEqual(list(range(20)), [r.item for r in results])
+        self.assertEqual([x * 2 for x in range(20)],
+                         [r.result() for r in results])
+
+    def test_exceptions(self):
+        def func(item):
+            if item % 2:
+                raise exceptions.NotFound(item)
+            return item
+
+        results = self.rest_client.map_requests(func, range(4))
+        self.assertEqual([None, exceptions.NotFound, None,
+                          exceptions.NotFound],
+                         [type(r.exception) if r.exception else None
+                          for r in results])
+        self.assertEqual(2, results[2].result())
+        self.assertRaises(exceptions.NotFound, results[1].result)
+
+    def test_bounded_concurrency(self):
+        lock = threading.Lock()
+        running = []
+        peak = []
+        barrier = threading.Event()
+
+        def func(item):
+            with lock:
+                running.append(item)
+                peak.append(len(running))
+                if len(running) == 4:
+                    barrier.set()
+            barrier.wait(5)
+            with lock:
+                running.remove(item)
+
+        self.rest_client.map_requests(func, range(12))
+        self.assertEqual(4, max(peak))
+
+    def test_max_workers(self):
+        threads = set()
+
+        def func(item):
+            threads.add(threading.current_thread().name)
+
+        self.rest_client.map_requests(func, range(5), max_workers=1)
+        self.assertEqual(set([threading.current_thread().name]), threads)
+
+    def test_test_caller_propagated(self):
+        with misc_utils.test_caller_context('TestFoo:test_bar'):
+            results = self.rest_client.map_requests(
+                lambda _: misc_utils.find_test_caller(), range(3))
+        self.assertEqual(['TestFoo:test_bar'] * 3,
+                         [r.result() for r in results])
+
+    def test_empty(self):
+        self.assertEqual([], self.rest_client.map_requests(len, []))
+
+
+class CachingRestClient(rest_client.RestClient):
+
+    cacheable_urls = (r'flavors(/|\?|$)',)
+
+
+class TestRestClientResponseCache(base.TestCase):
+
+    def setUp(self):
+        super(TestRestClientResponseCache, self).setUp()
+        self.cache = response_cache.ResponseCache(ttl=60)
+        self.rest_client = CachingRestClient(
+            fake_auth_provider.FakeAuthProvider(), 'compute', 'RegionOne',
+            response_cache=self.cache)
+        self.useFixture(mockpatch.PatchObject(self.rest_client,
+                                              '_log_request'))
+        self.raw_request = self.useFixture(mockpatch.PatchObject(
+            self.rest_client, 'raw_request')).mock
+        self.respond()
+
+    def respond(self, status=200, body='{"flavors": []}', etag='"1"'):
+        headers = {'content-type': 'application/json'}
+        if etag:
+            headers['etag'] = etag
+        self.raw_request.return_value = (
+            fake_http.fake_http_response(headers, status=status),
+            body if status != 304 else '')
+
+    def test_hit(self):
+        first = self.rest_client.get('flavors/detail')
+        second = self.rest_client.get('flavors/detail')
+        self.assertEqual(1, self.raw_request.call_count)
+        self.assertEqual(first, second)
+        stats = self.cache.stats()
+        self.assertEqual((1, 1), (stats['hits'], stats['misses']))
+
+    def test_hit_returns_copies(self):
+        first, _ = self.rest_client.get('flavors/detail')
+        first['x-foo'] = 'bar'
+        second, _ = self.rest_client.get('flavors/detail')
+        second['x-bar'] = 'foo'
+        third, _ = self.rest_client.get('flavors/detail')
+        self.assertNotIn('x-foo', second)
+        self.assertNotIn('x-foo', third)
+        self.assertNotIn('x-bar', third)
+        self.assertIsNot(second, third)
+
+    def test_not_cacheable(self):
+        self.rest_client.get('servers/detail')
+        self.rest_client.get('servers/detail')
+        self.assertEqual(2, self.raw_request.call_count)
+        self.assertEqual(0, len(self.cache))
+
+    def test_errors_not_cached(self):
+        self.respond(status=404, body='{}')
+        self.assertRaises(exceptions.NotFound, self.rest_client.get,
+                          'flavors/42')
+        self.assertEqual(0, len(self.cache))
+
+    def test_keyed_by_headers(self):
+        self.rest_client.get('flavors', headers={'X-Version': '2.1'})
+        self.rest_client.get('flavors', headers={'X-Version': '2.2'})
+        self.assertEqual(2, self.raw_request.call_count)
+
+    def test_invalidated_by_writes(self):
+        self.rest_client.get('flavors/detail')
+        self.respond(status=202, body='')
+        self.rest_client.delete('flavors/42')
+        self.respond()
+        self.rest_client.get('flavors/detail')
+        self.assertEqual(3, self.raw_request.call_count)
+
+    def test_invalidated_by_failed_writes(self):
+        self.rest_client.get('flavors/detail')
+        self.respond(status=409, body='{}')
+        self.assertRaises(exceptions.Conflict, self.rest_client.post,
+                          'flavors', '{}')
+        self.assertEqual(0, len(self.cache))
+
+    def test_revalidation(self):
+        self.patch('time.time', new=lambda: 1000.0)
+        resp, body = self.rest_client.get('flavors')
+        self.patch('time.time', new=lambda: 1061.0)
+        self.respond(status=304)
+        self.assertEqual((resp, body), self.rest_client.get('flavors'))
+        headers = self.raw_request.call_args[1]['headers']
+        self.assertEqual('"1"', headers['If-None-Match'])
+        self.assertEqual(1, self.cache.stats()['revalidations'])
+        self.rest_client.get('flavors')
+        self.assertEqual(2, self.raw_request.call_count)
+
+    def test_stale_without_etag(self):
+        self.respond(etag=None)
+        self.patch('time.time', new=lambda: 1000.0)
+        self.rest_client.get('flavors')
+        self.patch('time.time', new=lambda: 1061.0)
+        self.rest_client.get('flavors')
+        headers = self.raw_request.call_args[1]['headers']
+        self.assertNotIn('If-None-Match', headers)
+        self.assertEqual(2, self.cache.stats()['misses'])
+
+
+class TestRestClientRetries(base.TestCase):
+
+    def setUp(self):
+        super(TestRestClientRetries, self).setUp()
+        self.sleeps = []
+        self.patch('time.sleep', new=self.sleeps.append)
+        self.stats = retry.RetryStats()
+        self.throttle = mock.Mock(wait=mock.Mock(return_value=0))
+        self.rest_client = rest_client.RestClient(
+            fake_auth_provider.FakeAuthProvider(), None, None,
+            retry_policy=retry.RetryPolicy(max_retries=2, backoff=1,
+                                           stats=self.stats),
+            throttle=self.throttle)
+        self.useFixture(mockpatch.PatchObject(self.rest_client,
+                                              '_log_request'))
+        self.raw_request = self.useFixture(mockpatch.PatchObject(
+            self.rest_client, 'raw_request')).mock
+
+    def _response(self, status, body='{}'):
+        return (fake_http.fake_http_response(
+            {'content-type': 'application/json', 'retry-after': '3'},
+            status=status), body)
+
+    def test_retried_until_success(self):
+        self.raw_request.side_effect = [
+            socket.error(), self._response(503), self._response(200)]
+        resp, _ = self.rest_client.get('https://example.com/servers')
+        self.assertEqual(200, resp.status)
+        self.assertEqual(3, self.raw_request.call_count)
+        self.assertEqual(3, self.throttle.wait.call_count)
+        self.assertEqual(3, self.sleeps[1])
+        self.assertEqual(2, self.stats.retries)
+
+    def test_retries_exhausted(self):
+        self.raw_request.return_value = self._response(503)
+        self.assertRaises(exceptions.UnexpectedResponseCode,
+                          self.rest_client.get,
+                          'https://example.com/servers')
+        self.assertEqual(3, self.raw_request.call_count)
+
+    def test_connection_error_reraised(self):
+        self.raw_request.side_effect = socket.error()
+        self.assertRaises(socket.error, self.rest_client.delete,
+                          'https://example.com/servers/1')
+        self.assertEqual(3, self.raw_request.call_count)
+
+    def test_post_not_retried(self):
+        self.raw_request.return_value = self._response(503)
+        self.assertRaises(exceptions.UnexpectedResponseCode,
+                          self.rest_client.post,
+                          'https://example.com/servers', '{}')
+        self.assertEqual(1, self.raw_request.call_count)
+        self.assertEqual([], self.sleeps)
+
+    def test_streamed_body_closed(self):
+        body = mock.Mock()
+        self.raw_request.side_effect = [
+            self._response(503, body), self._response(200, 'data')]
+        _, data = self.rest_client.get('https://example.com/file',
+                                       stream=True)
+        body.close.assert_called_once_with()
+        self.assertEqual('data', data)
+
+
+class TestRestClientSingleFlight(base.TestCase):
+
+    def setUp(self):
+        super(TestRestClientSingleFlight, self).setUp()
+        self.group = single_flight.SingleFlight()
+        self.rest_client = rest_client.RestClient(
+            fake_auth_provider.FakeAuthProvider(), None, None,
+            single_flight=self.group)
+        self.useFixture(mockpatch.PatchObject(self.rest_client,
+                                              '_log_request'))
+        self.release = threading.Event()
+
+        def raw_request(*args, **kwargs):
+            self.release.wait(5)
+            return (fake_http.fake_http_response(
+                {'content-type': 'application/json'}), '{"server": {}}')
+
+        self.raw_request = self.useFixture(mockpatch.PatchObject(
+            self.rest_client, 'raw_request', side_effect=raw_request)).mock
+
+    def _get_concurrently(self, urls):
+        results = [None] * len(urls)
+
+        def get(index):
+            results[index] = self.rest_client.get(urls[index])
+
+        threads = [threading.Thread(target=get, args=(i,))
+                   for i in range(len(urls))]
+        for thread in threads:
+            thread.start()
+        for _ in range(500):
+            stats = self.group.stats()
+            if stats['calls'] + stats['coalesced'] == len(urls):
+                break
+            time.sleep(0.01)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_coalesced(self):
+        url = 'https://example.com/servers/1'
+        results = self._get_concurrently([url] * 4)
+        self.assertEqual(1, self.raw_request.call_count)
+        self.assertEqual(set(['{"server": {}}']),
+                         set(body for _, body in results))
+        # each caller gets its own response headers
+        self.assertEqual(4, len(set(id(resp) for resp, _ in results)))
+        results[0][0]['x-foo'] = 'bar'
+        self.assertNotIn('x-foo', results[1][0])
+
+    def test_different_urls(self):
+        self._get_concurrently(['https://example.com/servers/1',
+                                'https://example.com/servers/2'])
+        self.assertEqual(2, self.raw_request.call_count)
+
+    def test_other_methods_not_coalesced(self):
+        self.release.set()
+        self.rest_client.delete('https://example.com/servers/1')
+        self.assertEqual(dict(calls=0, coalesced=0), self.group.stats())
+
+
 class TestRestClientUpdateHeaders(BaseRestClientTestClass):
     def setUp(self):
         self.fake_http = fake_http.fake_httplib2()
@@ -277,6 +708,18 @@ class TestRestClientParseRespJSON(BaseRestClientTestClass):
         body = self.rest_client._parse_resp(json.dumps(data))
         self.assertEqual(data, body)
 
+    def test_parse_resp_once(self):
+        resp = fake_http.fake_http_response({}, status=413)
+        body = json.dumps(self.dict_expected)
+        with mock.patch.object(self.rest_client, '_parse_resp',
+                               wraps=self.rest_client._parse_resp) as parse:
+            first = self.rest_client._parse_resp_once(resp, body)
+            second = self.rest_client._parse_resp_once(resp, body)
+            self.rest_client._parse_resp_once(resp, json.dumps({}))
+        self.assertIs(first, second)
+        self.assertEqual(self.dict_expected["body_dict"], first)
+        self.assertEqual(2, parse.call_count)
+
     def test_parse_nullable_dict(self):
         body = self.rest_client._parse_resp(json.dumps(self.null_dict))
         self.assertEqual(self.null_dict, body)
@@ -681,7 +1124,8 @@ class TestJSONSchemaValidationBase(base.TestCase):
         super(TestJSONSchemaValidationBase, self).setUp()
         self.fake_auth_provider = fake_auth_provider.FakeAuthProvider()
         self.rest_client = rest_client.RestClient(
-            self.fake_auth_provider, None, None)
+            self.fake_auth_provider, None, None,
+            response_validation_sample_rate=1)
 
     def _test_validate_pass(self, schema, resp_body, status=200):
         resp = self.Response()
@@ -1058,6 +1502,88 @@ class TestRestClientJSONSchemaFormatValidation(TestJSONSchemaValidationBase):
         self._test_validate_pass(schema, body)
 
 
+class TestRestClientJSONSchemaValidationSampling(
+        TestJSONSchemaValidationBase):
+
+    def setUp(self):
+        super(TestRestClientJSONSchemaValidationSampling, self).setUp()
+        # A new schema for each test, so it is not in the validators cache
+        self.schema = {
+            'status_code': [200],
+            'response_body': {
+                'type': 'object',
+                'properties': {'foo': {'type': 'integer'}}
+            }
+        }
+
+    def _count_validations(self, responses):
+        validate = self.patch('jsonschema.Draft4Validator.validate')
+        for _ in range(responses):
+            self._test_validate_pass(self.schema, {'foo': 1})
+        return validate.call_count
+
+    def test_validator_compiled_once(self):
+        check_schema = self.patch('jsonschema.Draft4Validator.check_schema')
+        for _ in range(3):
+            self._test_validate_pass(self.schema, {'foo': 1})
+        check_schema.assert_called_once_with(self.schema['response_body'])
+
+    def test_validate_all(self):
+        self.assertEqual(10, self._count_validations(10))
+
+    def test_validate_one_in_n(self):
+        self.rest_client.response_validation_sample_rate = 4
+        self.assertEqual(3, self._count_validations(10))
+
+    def test_validation_disabled(self):
+        self.rest_client.response_validation_sample_rate = 0
+        self.assertEqual(0, self._count_validations(10))
+        resp = self.Response()
+        resp.status = 201
+        self.rest_client.validate_response(self.schema, resp, {'foo': 1})
+
+    def test_disabled_by_default(self):
+        client = rest_client.RestClient(self.fake_auth_provider, None, None)
+        resp = self.Response()
+        resp.status = 200
+        client.validate_response(self.schema, resp, {'foo': 'bar'})
+
+    def test_rate_per_client(self):
+        other = rest_client.RestClient(self.fake_auth_provider, None, None,
+                                       response_validation_sample_rate=4)
+        self._test_validate_pass(self.schema, {'foo': 1})
+        self._test_validate_fail(self.schema, {'foo': 'bar'})
+        resp = self.Response()
+        resp.status = 200
+        # The third response of the schema is not sampled at 1 in 4
+        other.validate_response(self.schema, resp, {'foo': 'bar'})
+
+    def test_status_code_checked_when_not_sampled(self):
+        self.rest_client.response_validation_sample_rate = 4
+        self._test_validate_pass(self.schema, {'foo': 1})
+        resp = self.Response()
+        resp.status = 201
+        self.assertRaises(exceptions.InvalidHttpSuccessCode,
+                          self.rest_client.validate_response,
+                          self.schema, resp, {'foo': 1})
+
+    def test_sampling_thread_safe(self):
+        self.rest_client.response_validation_sample_rate = 4
+        validate = self.patch('jsonschema.Draft4Validator.validate')
+
+        def validate_responses():
+            for _ in range(100):
+                self._test_validate_pass(self.schema, {'foo': 1})
+
+        threads = [threading.Thread(target=validate_responses)
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(200, validate.call_count)
+
+
 class TestRestClientJSONSchemaValidatorVersion(TestJSONSchemaValidationBase):
 
     schema = {
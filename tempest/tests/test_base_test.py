@@ -108,3 +108,16 @@ class TestBaseTestCase(base.TestCase):
         mock_gprov.assert_called_once_with()
         mock_gtn.assert_called_once_with(mock_prov, net_client,
                                          self.fixed_network_name)
+
+
+class TestCallUntilTrue(base.TestCase):
+
+    def test_call_until_true(self):
+        func = mock.Mock(side_effect=[False, True])
+        self.assertTrue(test.call_until_true(func, 10, 0))
+        self.assertEqual(2, func.call_count)
+
+    def test_call_until_true_no_duration(self):
+        func = mock.Mock(return_value=True)
+        self.assertFalse(test.call_until_true(func, 0, 1))
+        self.assertFalse(func.called)
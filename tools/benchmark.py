@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Time the hot paths of the tempest client stack, without any cloud.
+
+Every case is timed several times and the best time per call is kept, the
+other runs being slowed down by the rest of the machine. The results can
+be saved as JSON and compared with the ones of another commit: the cases
+which got slower than the threshold are reported, and make the command
+exit with 1. The logs are disabled: their cost depends on the handlers
+configured rather than on tempest.
+
+    tox -e benchmark -- --output before.json
+    (change the code)
+    tox -e benchmark -- --compare before.json
+"""
+
+import argparse
+import atexit
+import collections
+import json
+import logging
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import timeit
+
+import benchmark_auth
+import benchmark_json
+
+from tempest.common import preprov_creds
+from tempest.lib.cli import output_parser
+from tempest.lib.common import rest_client
+from tempest.lib.common.utils import data_utils
+from tempest.lib.common.utils import misc
+
+# name: (setup function returning the callable to time, calls per run)
+CASES = collections.OrderedDict()
+
+
+def case(name, number):
+    def register(setup):
+        CASES[name] = (setup, number)
+        return setup
+    return register
+
+
+def _rest_client(body):
+    client = rest_client.RestClient(benchmark_json.FakeAuthProvider(),
+                                    'compute', 'region')
+    client.http_obj = benchmark_json.FakeTransport(body)
+    return client
+
+
+@case('rest_client.get', 5000)
+def rest_client_get():
+    client = _rest_client('{"server": {"id": "42", "status": "ACTIVE"}}')
+    return lambda: client.get('servers/42')
+
+
+@case('rest_client._parse_resp 2000 servers', 5)
+def rest_client_parse_resp():
+    client = _rest_client('')
+    body = json.dumps({'servers': [benchmark_json.fake_server(i)
+                                   for i in range(2000)]})
+    return lambda: client._parse_resp(body)
+
+
+def _v3_filters(services, regions):
+    return {'service': 'service-%s' % (services - 1),
+            'region': 'region-%s' % (regions - 1),
+            'endpoint_type': 'public'}
+
+
+@case('auth.auth_request v3', 10000)
+def auth_request():
+    provider = benchmark_auth.v3_provider(40, 3)
+    filters = _v3_filters(40, 3)
+    return lambda: provider.auth_request('GET', 'servers', filters=filters)
+
+
+@case('auth.base_url v3', 10000)
+def base_url():
+    provider = benchmark_auth.v3_provider(40, 3)
+    filters = _v3_filters(40, 3)
+    auth_data = provider.cache
+    return lambda: provider.base_url(filters, auth_data)
+
+
+def _nested(depth, func):
+    if depth:
+        return _nested(depth - 1, func)
+    return func()
+
+
+@case('misc.find_test_caller stack walk', 2000)
+def find_test_caller():
+    return lambda: _nested(40, misc.find_test_caller)
+
+
+@case('data_utils.rand_name', 20000)
+def rand_name():
+    return lambda: data_utils.rand_name('benchmark')
+
+
+@case('data_utils.rand_password', 20000)
+def rand_password():
+    return data_utils.rand_password
+
+
+@case('data_utils.rand_mac_address', 20000)
+def rand_mac_address():
+    return data_utils.rand_mac_address
+
+
+def cli_table(rows, columns):
+    widths = [12] * columns
+    delimiter = '+' + '+'.join('-' * (w + 2) for w in widths) + '+'
+
+    def line(cells):
+        return '|' + '|'.join(' %-*s ' % (w, c)
+                              for w, c in zip(widths, cells)) + '|'
+
+    lines = [delimiter, line(['Field%s' % c for c in range(columns)]),
+             delimiter]
+    lines.extend(line(['v%s-%s' % (r, c) for c in range(columns)])
+                 for r in range(rows))
+    lines.append(delimiter)
+    return '\n'.join(lines)
+
+
+@case('output_parser.table 5000 rows', 20)
+def table():
+    output = cli_table(5000, 8)
+    return lambda: output_parser.table(output)
+
+
+def accounts(number):
+    result = []
+    for index in range(number):
+        account = {'username': 'user-%s' % index,
+                   'project_name': 'project-%s' % index,
+                   'password': 'password-%s' % index,
+                   'roles': ['member', 'role-%s' % (index % 10)]}
+        if index % 50 == 0:
+            account['types'] = ['admin']
+        if index % 3 == 0:
+            account['resources'] = {'network': 'network-%s' % index}
+        result.append(account)
+    return result
+
+
+@case('preprov_creds.get_hash_dict 5000 accounts', 20)
+def get_hash_dict():
+    accounts_list = accounts(5000)
+    get = preprov_creds.PreProvisionedCredentialProvider.get_hash_dict
+    # get_hash_dict pops keys out of the accounts, hence the copies
+    return lambda: get([dict(a) for a in accounts_list], 'admin')
+
+
+def _cached_accounts_provider(number):
+    """A function creating a provider of number cached accounts"""
+    tmp_dir = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, tmp_dir, True)
+    accounts_file = os.path.join(tmp_dir, 'accounts.yaml')
+    # JSON is valid YAML, and much faster to write
+    with open(accounts_file, 'w') as yaml_file:
+        json.dump(accounts(number), yaml_file)
+
+    def provider():
+        return preprov_creds.PreProvisionedCredentialProvider(
+            identity_version='v2', test_accounts_file=accounts_file,
+            accounts_lock_dir=os.path.join(tmp_dir, 'test_accounts'),
+            name='benchmark', admin_role='admin',
+            accounts_cache_dir=os.path.join(tmp_dir, 'cache'))
+    # Fill the cache
+    provider()
+    return provider
+
+
+@case('preprov_creds provider 5000 accounts cached', 20)
+def accounts_provider():
+    return _cached_accounts_provider(5000)
+
+
+@case('preprov_creds._get_match_hash_list 2 roles 5000 accounts', 10000)
+def get_match_hash_list():
+    provider = _cached_accounts_provider(5000)()
+    return lambda: provider._get_match_hash_list(['member', 'role-3'])
+
+
+def _locked_accounts(number, in_use):
+    """A provider of number accounts, the first in_use of them locked
+
+    The accounts locked by the other workers are the first ones, as they
+    are when every worker probes the accounts in the same order.
+    """
+    lock_dir = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, lock_dir, True)
+    accounts_lock_dir = os.path.join(lock_dir, 'test_accounts')
+    os.mkdir(accounts_lock_dir)
+    provider = preprov_creds.PreProvisionedCredentialProvider(
+        identity_version='v2', test_accounts_file=None,
+        accounts_lock_dir=accounts_lock_dir, name='benchmark')
+    hashes = ['%032x' % index for index in range(number)]
+    for _hash in hashes[:in_use]:
+        provider._create_hash_file(_hash)
+    return provider, hashes
+
+
+@case('preprov_creds claim 2000 accounts 1500 locked', 200)
+def claim_account():
+    provider, hashes = _locked_accounts(2000, 1500)
+    return lambda: provider.remove_hash(provider._get_free_hash(hashes))
+
+
+@case('preprov_creds 32 workers claim 2000 accounts', 5)
+def claim_account_contention():
+    provider, hashes = _locked_accounts(2000, 1000)
+
+    def worker():
+        for _ in range(20):
+            provider.remove_hash(provider._get_free_hash(hashes))
+
+    def claim():
+        workers = [threading.Thread(target=worker) for _ in range(32)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+    return claim
+
+
+def run(names, repeat):
+    results = collections.OrderedDict()
+    for name in names:
+        setup, number = CASES[name]
+        func = setup()
+        best = min(timeit.repeat(func, number=number, repeat=repeat))
+        results[name] = {'us_per_call': best * 1e6 / number,
+                         'number': number, 'repeat': repeat}
+        print('%-45s %12.2f us per call' % (name,
+                                            results[name]['us_per_call']))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print the changes from a baseline and return the regressed cases"""
+    regressions = []
+    print('\n%-45s %12s %12s %8s' % ('case', 'baseline', 'current',
+                                     'change'))
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]['us_per_call']
+        after = result['us_per_call']
+        change = (after - before) / before if before else 0
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = ' REGRESSION'
+        print('%-45s %12.2f %12.2f %+7.1f%%%s' % (
+            name, before, after, change * 100, flag))
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            stderr=subprocess.STDOUT).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--filter', default='',
+                        help='Only run the cases matching this regex')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of timed runs of every case')
+    parser.add_argument('--output', help='Save the results in this file')
+    parser.add_argument('--compare',
+                        help='Compare with the results saved in this file')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Slowdown reported as a regression, 0.2 for '
+                             '20%%')
+    parser.add_argument('--list', action='store_true',
+                        help='List the cases and exit')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    names = [name for name in CASES if re.search(args.filter, name)]
+    if args.list:
+        print('\n'.join(names))
+        return 0
+    results = run(names, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'commit': _git_commit(),
+                       'python': platform.python_version(),
+                       'results': results}, output, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(results, json.load(baseline)['results'],
+                                  args.threshold)
+        if regressions:
+            print('\n%s case(s) slower by more than %d%%' % (
+                len(regressions), args.threshold * 100))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Time the catalog lookups of the keystone v2 and v3 auth providers, with
+and without the cache of base URLs, on a catalog with many services and
+regions. The catalog lookup is done by every API request.
+"""
+
+import argparse
+import datetime
+import timeit
+
+from tempest.lib import auth
+
+V2_INTERFACES = ('publicURL', 'internalURL', 'adminURL')
+V3_INTERFACES = ('public', 'internal', 'admin')
+
+
+def _expiry(date_format):
+    expiry = datetime.datetime.utcnow() + datetime.timedelta(days=1)
+    return expiry.strftime(date_format)
+
+
+def v2_provider(services, regions):
+    catalog = []
+    for service in range(services):
+        endpoints = []
+        for region in range(regions):
+            endpoint = {'region': 'region-%s' % region}
+            for interface in V2_INTERFACES:
+                endpoint[interface] = 'http://%s-%s.%s:80%02d/v2/tenant' % (
+                    interface, region, service, service)
+            endpoints.append(endpoint)
+        catalog.append({'type': 'service-%s' % service,
+                        'endpoints': endpoints})
+    provider = auth.KeystoneV2AuthProvider(
+        auth.KeystoneV2Credentials(username='user', password='pass',
+                                   tenant_name='tenant'),
+        'http://keystone:5000/v2.0')
+    provider.cache = ('token', {
+        'token': {'expires': _expiry(auth.ISO8601_INT_SECONDS)},
+        'serviceCatalog': catalog})
+    return provider
+
+
+def v3_provider(services, regions):
+    catalog = []
+    for service in range(services):
+        endpoints = []
+        for region in range(regions):
+            for interface in V3_INTERFACES:
+                endpoints.append({
+                    'region': 'region-%s' % region, 'interface': interface,
+                    'url': 'http://%s-%s.%s:80%02d/v3/project' % (
+                        interface, region, service, service)})
+        catalog.append({'type': 'service-%s' % service,
+                        'endpoints': endpoints})
+    provider = auth.KeystoneV3AuthProvider(
+        auth.KeystoneV3Credentials(username='user', password='pass',
+                                   project_name='project',
+                                   user_domain_name='default',
+                                   project_domain_name='default'),
+        'http://keystone:5000/v3')
+    provider.cache = ('token', {
+        'expires_at': _expiry(auth.ISO8601_FLOAT_SECONDS),
+        'catalog': catalog})
+    return provider
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--services', type=int, default=40,
+                        help='Services in the catalog')
+    parser.add_argument('--regions', type=int, default=3,
+                        help='Regions of every service')
+    parser.add_argument('--number', type=int, default=10000,
+                        help='Number of lookups to time')
+    args = parser.parse_args()
+
+    for version, provider, endpoint_type in (
+            ('v2', v2_provider(args.services, args.regions), 'publicURL'),
+            ('v3', v3_provider(args.services, args.regions), 'public')):
+        # The last service and region, the worst case of a catalog scan
+        filters = {'service': 'service-%s' % (args.services - 1),
+                   'region': 'region-%s' % (args.regions - 1),
+                   'endpoint_type': endpoint_type}
+        auth_data = provider.cache
+        cases = (
+            ('catalog scan', lambda: provider._base_url(filters, auth_data)),
+            ('base_url', lambda: provider.base_url(filters, auth_data)),
+            ('auth_request', lambda: provider.auth_request(
+                'GET', 'servers', filters=filters)),
+        )
+        for name, case in cases:
+            total = timeit.timeit(case, number=args.number)
+            print('%s %-14s %8.2f us per call' % (
+                version, name, total * 1e6 / args.number))
+
+
+if __name__ == '__main__':
+    main()
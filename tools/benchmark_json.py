@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Time the JSON backends of tempest.lib.common.jsonutils on large list
+responses, parsed directly and through list_servers(detail=True) and
+list_ports of the service clients over a fake HTTP transport.
+"""
+
+import argparse
+import json
+import timeit
+import uuid
+
+from tempest.lib.common import jsonutils
+from tempest.lib.services.compute import servers_client
+from tempest.lib.services.network import ports_client
+
+
+def fake_server(index):
+    server_id = str(uuid.uuid4())
+    return {
+        'id': server_id, 'name': 'server-%s' % index, 'status': 'ACTIVE',
+        'tenant_id': uuid.uuid4().hex, 'user_id': uuid.uuid4().hex,
+        'created': '2016-05-01T10:00:00Z', 'updated': '2016-05-01T10:01:00Z',
+        'hostId': uuid.uuid4().hex, 'accessIPv4': '', 'accessIPv6': '',
+        'progress': 0, 'metadata': {'index': str(index)},
+        'key_name': None, 'config_drive': '',
+        'image': {'id': str(uuid.uuid4()), 'links': []},
+        'flavor': {'id': '1', 'links': []},
+        'addresses': {'private': [
+            {'addr': '10.0.%s.%s' % (index // 250, index % 250 + 2),
+             'version': 4, 'OS-EXT-IPS:type': 'fixed',
+             'OS-EXT-IPS-MAC:mac_addr': 'fa:16:3e:00:00:01'}]},
+        'links': [{'rel': 'self',
+                   'href': 'http://nova/v2.1/servers/%s' % server_id}],
+        'security_groups': [{'name': 'default'}],
+    }
+
+
+def fake_port(index):
+    return {
+        'id': str(uuid.uuid4()), 'name': 'port-%s' % index,
+        'network_id': str(uuid.uuid4()), 'tenant_id': uuid.uuid4().hex,
+        'mac_address': 'fa:16:3e:00:00:01', 'admin_state_up': True,
+        'status': 'ACTIVE', 'device_id': str(uuid.uuid4()),
+        'device_owner': 'compute:nova',
+        'fixed_ips': [{'subnet_id': str(uuid.uuid4()),
+                       'ip_address': '10.0.0.%s' % (index % 250 + 2)}],
+        'allowed_address_pairs': [], 'extra_dhcp_opts': [],
+        'security_groups': [str(uuid.uuid4())], 'binding:vnic_type': 'normal',
+    }
+
+
+class FakeAuthProvider(object):
+
+    def auth_request(self, method, url, headers=None, body=None,
+                     filters=None):
+        return 'http://fake' + url, headers, body
+
+    def base_url(self, filters, auth_data=None):
+        return 'http://fake'
+
+
+class FakeResponse(dict):
+    status = 200
+    reason = 'OK'
+
+
+class FakeTransport(object):
+
+    def __init__(self, body):
+        self.body = body
+
+    def request(self, url, method, *args, **kwargs):
+        resp = FakeResponse({'status': '200',
+                             'content-type': 'application/json'})
+        return resp, self.body
+
+
+def client_call(client_class, body, method, **kwargs):
+    client = client_class(FakeAuthProvider(), 'fake', 'fake')
+    client.http_obj = FakeTransport(body)
+    # Only the JSON cost is measured here
+    client.validate_response = lambda *args: None
+    return lambda: getattr(client, method)(**kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--entries', type=int, default=5000,
+                        help='Servers and ports in the list responses')
+    parser.add_argument('--number', type=int, default=10,
+                        help='Number of times each response is parsed')
+    args = parser.parse_args()
+
+    servers = json.dumps(
+        {'servers': [fake_server(i) for i in range(args.entries)]})
+    ports = json.dumps({'ports': [fake_port(i) for i in range(args.entries)]})
+    cases = [
+        ('loads servers', lambda: jsonutils.loads(servers)),
+        ('loads ports', lambda: jsonutils.loads(ports)),
+        ('list_servers detail', client_call(
+            servers_client.ServersClient, servers, 'list_servers',
+            detail=True)),
+        ('list_ports', client_call(ports_client.PortsClient, ports,
+                                   'list_ports')),
+    ]
+    print('%s entries, %.1f MB of servers, %.1f MB of ports' % (
+        args.entries, len(servers) / 1e6, len(ports) / 1e6))
+    for backend in jsonutils.AUTO_BACKENDS:
+        try:
+            jsonutils.set_backend(backend)
+        except ValueError:
+            print('%-12s not installed' % backend)
+            continue
+        for name, case in cases:
+            total = timeit.timeit(case, number=args.number)
+            print('%-12s %-20s %8.2f ms' % (backend, name,
+                                            total * 1000 / args.number))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+# Copyright 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Compare the cost of find_test_caller when the test base classes have set
+the test caller with the cost of walking the stack to find it.
+
+Calls are made from a stack as deep as the one of a service client
+request made by a test (test method, client, rest_client, logging).
+"""
+
+import argparse
+import timeit
+
+from tempest.lib.common.utils import misc
+
+
+def _nested(depth, func):
+    if depth:
+        return _nested(depth - 1, func)
+    return func()
+
+
+def test_method(depth, number):
+    def run():
+        return timeit.timeit(misc.find_test_caller, number=number)
+    return _nested(depth, run)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--depth', type=int, default=40,
+                        help='Frames between the test method and the call')
+    parser.add_argument('--number', type=int, default=10000,
+                        help='Number of calls to time')
+    args = parser.parse_args()
+
+    stack_walk = test_method(args.depth, args.number)
+    with misc.test_caller_context('Benchmark:test_method'):
+        context = test_method(args.depth, args.number)
+    for name, total in (('stack walk', stack_walk),
+                        ('test caller context', context)):
+        print('%-20s %8.2f us per call' % (name,
+                                           total * 1e6 / args.number))
+    print('speedup: %.1fx' % (stack_walk / context))
+
+
+if __name__ == '__main__':
+    main()